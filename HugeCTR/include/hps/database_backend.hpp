@@ -305,6 +305,10 @@ struct VolatileBackendParams : public DatabaseBackendParams {
       DatabaseOverflowPolicy_t::EvictRandom};  // Policy to use in case an overflow has been
                                                // detected.
   double overflow_resolution_target{0.8};  // Target margin after applying overflow handling policy.
+  bool background_overflow_resolution{false};  // If supported by the backend, trim partitions in a
+                                               // background thread instead of during inserts.
+  double overflow_soft_watermark{0.9};  // Fraction of the overflow margin at which background
+                                        // overflow handling starts.
 
   inline size_t overflow_resolution_margin() const {
     const size_t margin = static_cast<size_t>(
@@ -312,6 +316,13 @@ struct VolatileBackendParams : public DatabaseBackendParams {
     HCTR_CHECK(margin <= overflow_margin);
     return margin;
   }
+
+  inline size_t overflow_soft_margin() const {
+    const size_t margin =
+        static_cast<size_t>(static_cast<double>(overflow_margin) * overflow_soft_watermark + 0.5);
+    HCTR_CHECK(margin >= overflow_resolution_margin() && margin <= overflow_margin);
+    return margin;
+  }
 };
 
 template <typename Key, typename Params>
@@ -335,6 +346,9 @@ class VolatileBackend : public DatabaseBackend<Key, Params> {
   }
 
  protected:
+  // Number of candidates that the sampled overflow policies inspect per evicted entry.
+  static constexpr size_t overflow_sample_factor_{4};
+
   const size_t overflow_resolution_margin_;
 };
 
@@ -17,11 +17,15 @@
 
 #include <parallel_hashmap/phmap.h>
 
+#include <atomic>
 #include <condition_variable>
 #include <core/memory.hpp>
 #include <deque>
 #include <functional>
 #include <hps/database_backend.hpp>
+#include <mutex>
+#include <optional>
+#include <set>
 #include <shared_mutex>
 #include <thread>
 #include <thread_pool.hpp>
@@ -59,6 +63,8 @@ class HashMapBackend final : public VolatileBackend<Key, HashMapBackendParams> {
    */
   HashMapBackend(const HashMapBackendParams& params);
 
+  virtual ~HashMapBackend();
+
   bool is_shared() const override final { return false; }
 
   const char* get_name() const override { return "HashMapBackend"; }
@@ -112,7 +118,7 @@ class HashMapBackend final : public VolatileBackend<Key, HashMapBackendParams> {
   struct Payload final {
     union {
       time_t last_access;
-      uint64_t access_count;
+      uint64_t access_count;  // Also serves as the reference bit for CLOCK eviction.
     };
     ValuePtr value;
   };
@@ -129,6 +135,13 @@ class HashMapBackend final : public VolatileBackend<Key, HashMapBackendParams> {
     // Key -> Payload map.
     phmap::flat_hash_map<Key, Payload> entries;
 
+    // Key at which the next CLOCK overflow resolution resumes walking `entries`.
+    std::optional<Key> eviction_cursor;
+
+    // Keys to draw random samples from for the sampled overflow policies. `entries` has no random
+    // access. Hence, inserted keys are appended here, and evicted keys are removed lazily.
+    std::vector<Key> sample_keys;
+
     Partition() = delete;
 
     Partition(const uint32_t value_size, const HashMapBackendParams& params)
@@ -143,7 +156,23 @@ class HashMapBackend final : public VolatileBackend<Key, HashMapBackendParams> {
   mutable std::shared_mutex read_write_guard_;
 
   // Overflow resolution.
-  size_t resolve_overflow_(const std::string& table_name, size_t part_index, Partition& part);
+  size_t resolve_overflow_(const std::string& table_name, size_t part_index, Partition& part,
+                           size_t target_size);
+
+  // Background overflow resolution.
+  const size_t overflow_soft_margin_;
+  std::set<std::pair<std::string, size_t>> overflow_queue_;
+  std::mutex overflow_queue_guard_;
+  std::condition_variable overflow_queue_cv_;
+  std::atomic<bool> overflow_resolver_stop_{false};
+  std::thread overflow_resolver_;
+
+  void queue_overflow_resolution_(const std::string& table_name, size_t part_index);
+
+  // Keys in the order in which the exact overflow policies would evict them.
+  std::vector<Key> order_overflow_victims_(const Partition& part, size_t num_victims) const;
+
+  void resolve_overflows_in_background_();
 };
 
 // TODO: Remove me!
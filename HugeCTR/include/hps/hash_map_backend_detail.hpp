@@ -109,74 +109,37 @@ namespace HugeCTR {
       case DatabaseOverflowPolicy_t::EvictRandom: {                                           \
         HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_FETCH_IMPL_());                            \
       } break;                                                                                \
-      case DatabaseOverflowPolicy_t::EvictLeastUsed: {                                        \
+      case DatabaseOverflowPolicy_t::EvictLeastUsed:                                          \
+      case DatabaseOverflowPolicy_t::EvictSampledLeastUsed: {                                 \
         HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_FETCH_IMPL_(++payload.access_count));      \
       } break;                                                                                \
-      case DatabaseOverflowPolicy_t::EvictOldest: {                                           \
+      case DatabaseOverflowPolicy_t::EvictOldest:                                             \
+      case DatabaseOverflowPolicy_t::EvictSampledOldest: {                                    \
         const time_t now{std::time(nullptr)};                                                 \
         HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_FETCH_IMPL_(payload.last_access = now));   \
       } break;                                                                                \
+      case DatabaseOverflowPolicy_t::EvictClock: {                                            \
+        /* Only write the reference bit if not yet set to keep cache lines clean. */          \
+        HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_FETCH_IMPL_({                              \
+                             if (!payload.access_count) {                                     \
+                               payload.access_count = 1;                                      \
+                             }                                                                \
+                           }));                                                               \
+      } break;                                                                                \
     }                                                                                         \
     return true;                                                                              \
   }()
 
 /**
  * HashMap Backend / Insert
- */
-#ifdef HCTR_HPS_HASH_MAP_INSERT_IMPL_
-#error HCTR_HPS_HASH_MAP_INSERT_IMPL_ already defined. Potential naming conflict!
-#endif
-#define HCTR_HPS_HASH_MAP_INSERT_IMPL_(...)                                                  \
-  do {                                                                                       \
-    static_assert(std::is_same_v<decltype(num_inserts), size_t>);                            \
-    static_assert(std::is_same_v<decltype(value_size), const uint32_t>);                     \
-    static_assert(std::is_same_v<decltype(value_stride), const size_t>);                     \
-    static_assert(std::is_same_v<decltype(k), const Key*> ||                                 \
-                  std::is_same_v<decltype(k), const Key* const>);                            \
-    static_assert(std::is_same_v<decltype(values), const char* const>);                      \
-                                                                                             \
-    const auto& res{part.entries.try_emplace(*k)};                                           \
-    Payload& payload{res.first->second};                                                     \
-                                                                                             \
-    __VA_ARGS__;                                                                             \
-                                                                                             \
-    /* If new insertion. */                                                                  \
-    if (res.second) {                                                                        \
-      /* If no free space, allocate another buffer, and fill pointer queue. */               \
-      if (part.value_slots.empty()) {                                                        \
-        const size_t stride{(value_size + value_page_alignment - 1) / value_page_alignment * \
-                            value_page_alignment};                                           \
-        const size_t num_values{part.allocation_rate / stride};                              \
-        HCTR_CHECK(num_values > 0);                                                          \
-                                                                                             \
-        /* Get more memory. */                                                               \
-        part.value_pages.emplace_back(num_values* stride, char_allocator_);                  \
-        ValuePage& value_page{part.value_pages.back()};                                      \
-                                                                                             \
-        /* Stock up slot references. */                                                      \
-        part.value_slots.reserve(part.value_slots.size() + num_values);                      \
-        for (auto it{value_page.end()}; it != value_page.begin();) {                         \
-          it -= stride;                                                                      \
-          part.value_slots.emplace_back(&*it);                                               \
-        }                                                                                    \
-      }                                                                                      \
-                                                                                             \
-      /* Fetch storage slot. */                                                              \
-      payload.value = part.value_slots.back();                                               \
-      part.value_slots.pop_back();                                                           \
-      ++num_inserts;                                                                         \
-    }                                                                                        \
-                                                                                             \
-    std::copy_n(&values[(k - keys) * value_stride], value_size, payload.value);              \
-  } while (0)
-
-/**
- * HashMap Backend / Insert
+ *
+ * The optional argument is a statement that is executed for each newly inserted key if a sampled
+ * overflow policy is used.
  */
 #ifdef HCTR_HPS_HASH_MAP_INSERT_
 #error HCTR_HPS_HASH_MAP_INSERT_ already defined. Potential naming conflict!
 #endif
-#define HCTR_HPS_HASH_MAP_INSERT_(MODE)                                                       \
+#define HCTR_HPS_HASH_MAP_INSERT_(MODE, ...)                                                  \
   [&]() {                                                                                     \
     static_assert(std::is_same_v<decltype(overflow_policy), const DatabaseOverflowPolicy_t>); \
                                                                                               \
@@ -187,10 +150,30 @@ namespace HugeCTR {
       case DatabaseOverflowPolicy_t::EvictLeastUsed: {                                        \
         HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_INSERT_IMPL_(payload.access_count = 0));   \
       } break;                                                                                \
+      case DatabaseOverflowPolicy_t::EvictSampledLeastUsed: {                                 \
+        HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_INSERT_IMPL_({                             \
+                             payload.access_count = 0;                                        \
+                             if (res.second) {                                                \
+                               __VA_ARGS__;                                                   \
+                             }                                                                \
+                           }));                                                               \
+      } break;                                                                                \
       case DatabaseOverflowPolicy_t::EvictOldest: {                                           \
         const time_t now{std::time(nullptr)};                                                 \
         HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_INSERT_IMPL_(payload.last_access = now));  \
       } break;                                                                                \
+      case DatabaseOverflowPolicy_t::EvictSampledOldest: {                                    \
+        const time_t now{std::time(nullptr)};                                                 \
+        HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_INSERT_IMPL_({                             \
+                             payload.last_access = now;                                       \
+                             if (res.second) {                                                \
+                               __VA_ARGS__;                                                   \
+                             }                                                                \
+                           }));                                                               \
+      } break;                                                                                \
+      case DatabaseOverflowPolicy_t::EvictClock: {                                            \
+        HCTR_HPS_DB_APPLY_(MODE, HCTR_HPS_HASH_MAP_INSERT_IMPL_(payload.access_count = 0));   \
+      } break;                                                                                \
     }                                                                                         \
     return true;                                                                              \
   }()
@@ -22,6 +22,7 @@
 #include <hps/inference_utils.hpp>
 #include <hps/memory_pool.hpp>
 #include <hps/message.hpp>
+#include <hps/negative_lookup_cache.hpp>
 #include <iostream>
 #include <memory>
 #include <string>
@@ -68,6 +69,10 @@ class HierParameterServer : public HierParameterServerBase {
   virtual void profiler_print();
 
  private:
+  size_t fetch_from_persistent_db_(const std::string& tag_name, std::vector<size_t>& indices,
+                                   size_t num_keys, const TypeHashKey* keys, float* vectors,
+                                   size_t value_size, const DatabaseMissCallback& fill_default);
+
   // Parameter server configuration
   parameter_server_config ps_config_;
 
@@ -80,6 +85,7 @@ class HierParameterServer : public HierParameterServerBase {
 
   std::unique_ptr<DatabaseBackendBase<TypeHashKey>> persistent_db_;
   bool persistent_db_initialize_after_startup_;
+  std::unique_ptr<NegativeLookupCache<TypeHashKey>> persistent_db_negative_cache_;
 
   // Realtime data ingestion.
   std::unique_ptr<MessageSource<TypeHashKey>> volatile_db_source_;
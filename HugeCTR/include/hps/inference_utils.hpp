@@ -56,6 +56,9 @@ enum class DatabaseOverflowPolicy_t {
   EvictRandom,
   EvictLeastUsed,
   EvictOldest,
+  EvictSampledLeastUsed,
+  EvictSampledOldest,
+  EvictClock,
 };
 enum class UpdateSourceType_t {
   Null,
@@ -112,6 +115,12 @@ constexpr const char* hctr_enum_to_c_str(const DatabaseOverflowPolicy_t value) {
       return "evict_least_used";
     case DatabaseOverflowPolicy_t::EvictOldest:
       return "evict_oldest";
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+      return "evict_sampled_least_used";
+    case DatabaseOverflowPolicy_t::EvictSampledOldest:
+      return "evict_sampled_oldest";
+    case DatabaseOverflowPolicy_t::EvictClock:
+      return "evict_clock";
     default:
       return "<unknown DatabaseOverflowPolicy_t value>";
   }
@@ -179,6 +188,8 @@ struct VolatileDatabaseParams {
   size_t overflow_margin{std::numeric_limits<size_t>::max()};
   DatabaseOverflowPolicy_t overflow_policy{DatabaseOverflowPolicy_t::EvictRandom};
   double overflow_resolution_target{0.8};
+  bool background_overflow_resolution{false};
+  double overflow_soft_watermark{0.9};
 
   // Caching behavior related.
   bool initialize_after_startup{true};
@@ -200,7 +211,8 @@ struct VolatileDatabaseParams {
       const std::string& tls_client_key, const std::string& tls_server_name_identification,
       // Overflow handling related.
       size_t overflow_margin, DatabaseOverflowPolicy_t overflow_policy,
-      double overflow_resolution_target,
+      double overflow_resolution_target, bool background_overflow_resolution,
+      double overflow_soft_watermark,
       // Caching behavior related.
       bool initialize_after_startup, double initial_cache_rate, bool cache_missed_embeddings,
       // Real-time update mechanism related.
@@ -221,6 +233,8 @@ struct PersistentDatabaseParams {
 
   // Caching behavior related.
   bool initialize_after_startup{true};
+  size_t negative_cache_capacity{0};  // 0 = Do not remember missing keys.
+  size_t negative_cache_ttl_ms{60'000};
 
   // Real-time update mechanism related.
   std::vector<std::string> update_filters{{"^hps_.+$"}};  // Should be a regex for Kafka.
@@ -231,7 +245,8 @@ struct PersistentDatabaseParams {
                            const std::string& path, size_t num_threads, bool read_only,
                            size_t max_batch_size,
                            // Caching behavior related.
-                           bool initialize_after_startup,
+                           bool initialize_after_startup, size_t negative_cache_capacity,
+                           size_t negative_cache_ttl_ms,
                            // Real-time update mechanism related.
                            const std::vector<std::string>& update_filters);
 
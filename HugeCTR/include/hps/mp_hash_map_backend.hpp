@@ -118,7 +118,7 @@ class MultiProcessHashMapBackend final
   struct Payload final {
     union {
       time_t last_access;
-      uint64_t access_count;
+      uint64_t access_count;  // Also serves as the reference bit for CLOCK eviction.
     };
     ValuePtr value;
   };
@@ -138,6 +138,9 @@ class MultiProcessHashMapBackend final
     // Key -> Payload map.
     SharedFlatMap<Key, Payload> entries;
 
+    // Position of the CLOCK hand. Refers to the smallest key >= `eviction_cursor`.
+    Key eviction_cursor;
+
     Partition() = delete;
 
     Partition(const uint32_t value_size, const MultiProcessHashMapBackendParams& params,
@@ -149,7 +152,8 @@ class MultiProcessHashMapBackend final
           overflow_resolution_target{params.overflow_resolution_target},
           value_pages(segment.get_allocator<ValuePage>()),
           value_slots(segment.get_allocator<ValuePtr>()),
-          entries(segment.get_allocator<Entry>()) {}
+          entries(segment.get_allocator<Entry>()),
+          eviction_cursor{0} {}
   };
 
   struct SharedMemory final {
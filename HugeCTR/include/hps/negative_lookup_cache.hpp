@@ -0,0 +1,140 @@
+/*
+ * Copyright (c) 2023, NVIDIA CORPORATION.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+#pragma once
+
+#include <parallel_hashmap/phmap.h>
+
+#include <atomic>
+#include <chrono>
+#include <common.hpp>
+#include <functional>
+#include <hps/database_backend.hpp>
+#include <shared_mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace HugeCTR {
+
+/**
+ * Remembers keys that recently could not be found in a database, so that repeated queries for
+ * unknown keys can be answered without consulting the database again. Each entry expires after a
+ * fixed time to live.
+ *
+ * A lookup may find a key missing, while it is being inserted into the database concurrently. To
+ * avoid remembering such keys, each table has a generation, which advances whenever keys of the
+ * table are forgotten. Lookups take the generation before querying the database, and keys are only
+ * remembered if the generation is still the same afterwards.
+ *
+ * @tparam Key Data-type to be used for keys.
+ */
+template <typename Key>
+class NegativeLookupCache final {
+ public:
+  using clock_type = std::chrono::steady_clock;
+  using clock_function = std::function<clock_type::time_point()>;
+
+  HCTR_DISALLOW_COPY_AND_MOVE(NegativeLookupCache);
+
+  NegativeLookupCache() = delete;
+
+  /**
+   * @param capacity The maximum number of keys to remember per table.
+   * @param ttl The amount of time after which a remembered key is considered unknown again.
+   * @param clock The source of the current time.
+   */
+  NegativeLookupCache(size_t capacity, std::chrono::milliseconds ttl,
+                      clock_function clock = clock_type::now);
+
+  size_t capacity() const { return capacity_; }
+  std::chrono::milliseconds ttl() const { return ttl_; }
+
+  /**
+   * @param table_name The name of the table.
+   * @return The number of keys remembered for the table (including expired ones).
+   */
+  size_t size(const std::string& table_name) const;
+
+  /**
+   * @param table_name The name of the table.
+   * @return The current generation of the table.
+   */
+  uint64_t generation(const std::string& table_name) const;
+
+  /**
+   * Removes all keys that are known to be missing from \p indices .
+   *
+   * @param table_name The name of the table.
+   * @param indices Indices of the keys to check. Known missing keys are removed in-place.
+   * @param keys Pointer to the keys.
+   * @param on_hit A function that is called for every index that was removed.
+   *
+   * @return The number of indices that were removed.
+   */
+  size_t filter(const std::string& table_name, std::vector<size_t>& indices, const Key* keys,
+                const DatabaseMissCallback& on_hit) const;
+
+  /**
+   * Remembers that the selected keys are missing. Does nothing if keys of the table were forgotten
+   * since \p generation was taken.
+   *
+   * @param table_name The name of the table.
+   * @param generation The generation of the table before the keys were looked up.
+   * @param num_indices Number of \p indices .
+   * @param indices Indices of the missing keys.
+   * @param keys Pointer to the keys.
+   */
+  void insert(const std::string& table_name, uint64_t generation, size_t num_indices,
+              const size_t* indices, const Key* keys);
+
+  /**
+   * Forgets the provided keys, usually because they have been inserted into the database.
+   *
+   * @param table_name The name of the table.
+   * @param num_keys Number of \p keys .
+   * @param keys Pointer to the keys.
+   */
+  void erase(const std::string& table_name, size_t num_keys, const Key* keys);
+
+  /**
+   * Forgets all keys of the provided tables.
+   *
+   * @param table_names The names of the tables.
+   */
+  void clear(const std::vector<std::string>& table_names);
+
+  size_t num_hits() const { return num_hits_; }
+  size_t num_misses() const { return num_misses_; }
+
+ private:
+  const size_t capacity_;
+  const std::chrono::milliseconds ttl_;
+  const clock_function clock_;
+
+  struct Table final {
+    phmap::flat_hash_map<Key, clock_type::time_point> entries;  // Key -> expiry time.
+    clock_type::time_point next_purge;    // No entry expires before this point in time.
+    std::atomic<uint64_t> generation{0};  // Advances whenever keys are forgotten.
+  };
+
+  mutable std::shared_mutex guard_;
+  std::unordered_map<std::string, Table> tables_;
+
+  mutable std::atomic<size_t> num_hits_{0};
+  mutable std::atomic<size_t> num_misses_{0};
+};
+
+}  // namespace HugeCTR
@@ -441,7 +441,9 @@ class RedisBinFileInserter final
                       std::forward_as_tuple(reinterpret_cast<const char*>(k), sizeof(Key)),    \
                       std::forward_as_tuple(&values[(k - keys) * value_stride], value_size))); \
       } break;                                                                                 \
-      case DatabaseOverflowPolicy_t::EvictLeastUsed: {                                         \
+      case DatabaseOverflowPolicy_t::EvictLeastUsed:                                           \
+      case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:                                    \
+      case DatabaseOverflowPolicy_t::EvictClock: {                                             \
         HCTR_HPS_DB_APPLY_(MODE, {                                                             \
           kv_views.emplace_back(                                                               \
               std::piecewise_construct,                                                        \
@@ -450,7 +452,8 @@ class RedisBinFileInserter final
           pipe.hincrby(hkey_m, {reinterpret_cast<const char*>(k), sizeof(Key)}, 1);            \
         });                                                                                    \
       } break;                                                                                 \
-      case DatabaseOverflowPolicy_t::EvictOldest: {                                            \
+      case DatabaseOverflowPolicy_t::EvictOldest:                                              \
+      case DatabaseOverflowPolicy_t::EvictSampledOldest: {                                     \
         const time_t now = std::time(nullptr);                                                 \
         HCTR_HPS_DB_APPLY_(MODE, {                                                             \
           kv_views.emplace_back(                                                               \
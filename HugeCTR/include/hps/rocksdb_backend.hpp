@@ -18,6 +18,8 @@
 #include <filesystem>
 #include <hps/database_backend.hpp>
 #include <hps/database_backend_detail.hpp>
+#include <mutex>
+#include <shared_mutex>
 #include <unordered_map>
 
 #ifdef HCTR_USE_ROCKS_DB
@@ -97,11 +99,19 @@ class RocksDBBackend final : public PersistentBackend<Key, RocksDBBackendParams>
 
  protected:
   inline rocksdb::ColumnFamilyHandle* get_column_handle_(const std::string& table_name) const {
+    const std::shared_lock lock(column_handles_guard_);
+
     const auto& it{column_handles_.find(table_name)};
     return it != column_handles_.end() ? it->second : nullptr;
   }
 
   inline rocksdb::ColumnFamilyHandle* get_or_create_column_handle_(const std::string& table_name) {
+    if (rocksdb::ColumnFamilyHandle* const ch{get_column_handle_(table_name)}) {
+      return ch;
+    }
+
+    // Tables may be created concurrently. Hence, we need to check again.
+    const std::unique_lock lock(column_handles_guard_);
     const auto& it{column_handles_.find(table_name)};
     if (it != column_handles_.end()) {
       return it->second;
@@ -114,6 +124,7 @@ class RocksDBBackend final : public PersistentBackend<Key, RocksDBBackendParams>
   }
 
   std::unique_ptr<rocksdb::DB> db_;
+  mutable std::shared_mutex column_handles_guard_;  // Protects `column_handles_`.
   std::unordered_map<std::string, rocksdb::ColumnFamilyHandle*> column_handles_;
 
   rocksdb::ColumnFamilyOptions column_family_options_;
@@ -263,6 +263,12 @@ void CommonPybind(pybind11::module& m) {
              HugeCTR::DatabaseOverflowPolicy_t::EvictLeastUsed)
       .value(HugeCTR::hctr_enum_to_c_str(HugeCTR::DatabaseOverflowPolicy_t::EvictOldest),
              HugeCTR::DatabaseOverflowPolicy_t::EvictOldest)
+      .value(HugeCTR::hctr_enum_to_c_str(HugeCTR::DatabaseOverflowPolicy_t::EvictSampledLeastUsed),
+             HugeCTR::DatabaseOverflowPolicy_t::EvictSampledLeastUsed)
+      .value(HugeCTR::hctr_enum_to_c_str(HugeCTR::DatabaseOverflowPolicy_t::EvictSampledOldest),
+             HugeCTR::DatabaseOverflowPolicy_t::EvictSampledOldest)
+      .value(HugeCTR::hctr_enum_to_c_str(HugeCTR::DatabaseOverflowPolicy_t::EvictClock),
+             HugeCTR::DatabaseOverflowPolicy_t::EvictClock)
       .export_values();
   pybind11::enum_<HugeCTR::UpdateSourceType_t>(m, "UpdateSourceType_t")
       .value(HugeCTR::hctr_enum_to_c_str(HugeCTR::UpdateSourceType_t::Null),
@@ -286,7 +286,7 @@ void HPSPybind(pybind11::module& m) {
                          size_t, const std::string&, bool, size_t, size_t, bool, const std::string&,
                          const std::string&, const std::string&, const std::string&,
                          // Overflow handling related.
-                         size_t, DatabaseOverflowPolicy_t, double,
+                         size_t, DatabaseOverflowPolicy_t, double, bool, double,
                          // Caching behavior related.
                          bool, double, bool,
                          // Real-time update mechanism related.
@@ -310,6 +310,8 @@ void HPSPybind(pybind11::module& m) {
           pybind11::arg("overflow_margin") = std::numeric_limits<size_t>::max(),
           pybind11::arg("overflow_policy") = DatabaseOverflowPolicy_t::EvictRandom,
           pybind11::arg("overflow_resolution_target") = 0.8,
+          pybind11::arg("background_overflow_resolution") = false,
+          pybind11::arg("overflow_soft_watermark") = 0.9,
           // Caching behavior related.
           pybind11::arg("initialize_after_startup") = true,
           pybind11::arg("initial_cache_rate") = 1.0,
@@ -324,7 +326,7 @@ void HPSPybind(pybind11::module& m) {
                           // Backend specific.
                           const std::string&, size_t, bool, size_t,
                           // Caching behavior related.
-                          bool,
+                          bool, size_t, size_t,
                           // Real-time update mechanism related.
                           const std::vector<std::string>&>(),
            pybind11::arg("backend") = DatabaseType_t::Disabled,
@@ -334,6 +336,8 @@ void HPSPybind(pybind11::module& m) {
            pybind11::arg("max_batch_size") = 64L * 1024L,
            // Caching behavior related.
            pybind11::arg("initialize_after_startup") = true,
+           pybind11::arg("negative_cache_capacity") = 0,
+           pybind11::arg("negative_cache_ttl_ms") = 60'000,
            // Real-time update mechanism related.
            pybind11::arg("update_filters") = std::vector<std::string>{"^hps_.+$"});
 
@@ -30,10 +30,29 @@
 namespace HugeCTR {
 
 template <typename Key>
-HashMapBackend<Key>::HashMapBackend(const HashMapBackendParams& params) : Base(params) {
+HashMapBackend<Key>::HashMapBackend(const HashMapBackendParams& params)
+    : Base(params),
+      overflow_soft_margin_{params.background_overflow_resolution
+                                ? params.overflow_soft_margin()
+                                : std::numeric_limits<size_t>::max()} {
+  if (params.background_overflow_resolution) {
+    overflow_resolver_ = std::thread([this]() { resolve_overflows_in_background_(); });
+  }
   HCTR_LOG_C(DEBUG, WORLD, "Created blank database backend in local memory!\n");
 }
 
+template <typename Key>
+HashMapBackend<Key>::~HashMapBackend() {
+  if (overflow_resolver_.joinable()) {
+    {
+      const std::lock_guard lock(overflow_queue_guard_);
+      overflow_resolver_stop_ = true;
+    }
+    overflow_queue_cv_.notify_one();
+    overflow_resolver_.join();
+  }
+}
+
 template <typename Key>
 size_t HashMapBackend<Key>::size(const std::string& table_name) const {
   const std::shared_lock lock(read_write_guard_);
@@ -164,13 +183,16 @@ size_t HashMapBackend<Key>::insert(const std::string& table_name, const size_t n
     for (const Key* k{keys}; k != keys_end;) {
       // Check overflow condition.
       if (part.entries.size() >= this->params_.overflow_margin) {
-        resolve_overflow_(table_name, part_index, part);
+        resolve_overflow_(table_name, part_index, part, this->overflow_resolution_margin_);
       }
 
       // Perform insertion.
       const size_t prev_num_inserts{num_inserts};
       const size_t batch_size{std::min<size_t>(keys_end - k, max_batch_size)};
-      HCTR_HPS_HASH_MAP_INSERT_(SEQUENTIAL_DIRECT);
+      HCTR_HPS_HASH_MAP_INSERT_(SEQUENTIAL_DIRECT, part.sample_keys.emplace_back(*k));
+      if (part.entries.size() >= overflow_soft_margin_) {
+        queue_overflow_resolution_(table_name, part_index);
+      }
 
       HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
                  ", batch ", (k - keys - 1) / max_batch_size, ": Inserted ",
@@ -191,13 +213,16 @@ size_t HashMapBackend<Key>::insert(const std::string& table_name, const size_t n
       for (const Key* k{keys}; k != keys_end; ++num_batches) {
         // Check overflow condition.
         if (part.entries.size() >= this->params_.overflow_margin) {
-          resolve_overflow_(table_name, part_index, part);
+          resolve_overflow_(table_name, part_index, part, this->overflow_resolution_margin_);
         }
 
         // Perform insertion.
         const size_t prev_num_inserts{num_inserts};
         size_t batch_size{0};
-        HCTR_HPS_HASH_MAP_INSERT_(PARALLEL_DIRECT);
+        HCTR_HPS_HASH_MAP_INSERT_(PARALLEL_DIRECT, part.sample_keys.emplace_back(*k));
+        if (part.entries.size() >= overflow_soft_margin_) {
+          queue_overflow_resolution_(table_name, part_index);
+        }
 
         HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
                    ", batch ", num_batches, ": Inserted ", num_inserts - prev_num_inserts,
@@ -559,7 +584,8 @@ size_t HashMapBackend<Key>::dump_sst(const std::string& table_name, rocksdb::Sst
 
 template <typename Key>
 size_t HashMapBackend<Key>::resolve_overflow_(const std::string& table_name,
-                                              const size_t part_index, Partition& part) {
+                                              const size_t part_index, Partition& part,
+                                              const size_t target_size) {
   const size_t max_batch_size{this->params_.max_batch_size};
 
   size_t num_deletions{0};
@@ -595,7 +621,7 @@ size_t HashMapBackend<Key>::resolve_overflow_(const std::string& table_name,
           const Key* const k{&*k_it};
           HCTR_HPS_HASH_MAP_EVICT_K_();
         }
-        if (part.entries.size() <= this->overflow_resolution_margin_) {
+        if (part.entries.size() <= target_size) {
           break;
         }
       }
@@ -627,7 +653,7 @@ size_t HashMapBackend<Key>::resolve_overflow_(const std::string& table_name,
           const Key* const k{&km_it->first};
           HCTR_HPS_HASH_MAP_EVICT_K_();
         }
-        if (part.entries.size() <= this->overflow_resolution_margin_) {
+        if (part.entries.size() <= target_size) {
           break;
         }
       }
@@ -677,16 +703,268 @@ size_t HashMapBackend<Key>::resolve_overflow_(const std::string& table_name,
           const Key* const k{&km_it->first};
           HCTR_HPS_HASH_MAP_EVICT_K_();
         }
-        if (part.entries.size() <= this->overflow_resolution_margin_) {
+        if (part.entries.size() <= target_size) {
           break;
         }
       }
     } break;
+
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictSampledOldest: {
+      const bool least_used{this->params_.overflow_policy ==
+                            DatabaseOverflowPolicy_t::EvictSampledLeastUsed};
+
+      // Instead of sorting the entire partition, we draw `overflow_sample_factor_` random
+      // candidates per entry to evict, and evict the least used / oldest among them. The hash map
+      // is not random-access. Hence, samples are drawn from `sample_keys`, which also still holds
+      // keys that were evicted meanwhile. These are dropped from it when drawn.
+      std::random_device rd;
+      std::default_random_engine gen(rd());
+      std::vector<std::pair<Key, uint64_t>> keys_metas;
+
+      // Rebuild the sample pool if it mostly consists of evicted keys.
+      if (part.sample_keys.size() > 2 * part.entries.size()) {
+        part.sample_keys.clear();
+        part.sample_keys.reserve(part.entries.size());
+        for (const auto& entry : part.entries) {
+          part.sample_keys.emplace_back(entry.first);
+        }
+      }
+
+      while (part.entries.size() > target_size) {
+        const size_t batch_size{std::min(part.entries.size() - target_size, max_batch_size)};
+        const size_t num_samples{
+            std::min(batch_size * this->overflow_sample_factor_, part.entries.size())};
+
+        HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+                   " is overflowing (size = ", part.entries.size(), " > ",
+                   this->params_.overflow_margin, "): Attempting to evict ", batch_size,
+                   least_used ? " SAMPLED LEAST USED" : " SAMPLED OLDEST", " key/value pairs!\n");
+
+        keys_metas.clear();
+        keys_metas.reserve(num_samples);
+        while (keys_metas.size() != num_samples) {
+          std::uniform_int_distribution<size_t> index_dist(0, part.sample_keys.size() - 1);
+          Key& key{part.sample_keys[index_dist(gen)]};
+          const auto& it{part.entries.find(key)};
+          if (it == part.entries.end()) {
+            key = part.sample_keys.back();
+            part.sample_keys.pop_back();
+            continue;
+          }
+
+          Payload& payload{it->second};
+          if (least_used) {
+            keys_metas.emplace_back(it->first, payload.access_count);
+            // Halve the access count of each inspected entry to let stale popularity decay.
+            payload.access_count /= 2;
+          } else {
+            keys_metas.emplace_back(it->first, static_cast<uint64_t>(payload.last_access));
+          }
+        }
+
+        // Evict the `batch_size` least used / oldest samples. Duplicate samples are skipped by the
+        // eviction, and the next batch makes up for them.
+        std::nth_element(keys_metas.begin(), keys_metas.begin() + batch_size, keys_metas.end(),
+                         [](const auto& km0, const auto& km1) { return km0.second < km1.second; });
+        for (auto km_it{keys_metas.begin()}; km_it != keys_metas.begin() + batch_size; ++km_it) {
+          const Key* const k{&km_it->first};
+          HCTR_HPS_HASH_MAP_EVICT_K_();
+        }
+      }
+    } break;
+
+    case DatabaseOverflowPolicy_t::EvictClock: {
+      // Sweep a clock hand across the hash map. Entries that were accessed since the hand passed
+      // them last get a second chance, all others are evicted. Each sweep is limited to a single
+      // revolution. Since that clears all reference bits, the next sweep is guaranteed to evict.
+      std::vector<Key> keys;
+
+      while (part.entries.size() > target_size) {
+        const size_t batch_size{std::min(part.entries.size() - target_size, max_batch_size)};
+
+        HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+                   " is overflowing (size = ", part.entries.size(), " > ",
+                   this->params_.overflow_margin, "): Attempting to evict ", batch_size,
+                   " CLOCK key/value pairs!\n");
+
+        keys.clear();
+        auto it{part.eviction_cursor ? part.entries.find(*part.eviction_cursor)
+                                     : part.entries.end()};
+        if (it == part.entries.end()) {
+          it = part.entries.begin();
+        }
+        for (size_t n{part.entries.size()}; n != 0 && keys.size() != batch_size; --n) {
+          Payload& payload{it->second};
+          if (payload.access_count) {
+            payload.access_count = 0;
+          } else {
+            keys.emplace_back(it->first);
+          }
+
+          if (++it == part.entries.end()) {
+            it = part.entries.begin();
+          }
+        }
+        part.eviction_cursor = it->first;
+
+        for (const Key& key : keys) {
+          const Key* const k{&key};
+          HCTR_HPS_HASH_MAP_EVICT_K_();
+        }
+      }
+    } break;
   }
 
   return num_deletions;
 }
 
+template <typename Key>
+void HashMapBackend<Key>::queue_overflow_resolution_(const std::string& table_name,
+                                                     const size_t part_index) {
+  {
+    const std::lock_guard lock(overflow_queue_guard_);
+    if (!overflow_queue_.emplace(table_name, part_index).second) {
+      return;
+    }
+  }
+  overflow_queue_cv_.notify_one();
+}
+
+template <typename Key>
+std::vector<Key> HashMapBackend<Key>::order_overflow_victims_(const Partition& part,
+                                                              const size_t num_victims) const {
+  std::vector<Key> keys;
+
+  switch (this->params_.overflow_policy) {
+    case DatabaseOverflowPolicy_t::EvictRandom: {
+      keys.reserve(part.entries.size());
+      for (const auto& entry : part.entries) {
+        keys.emplace_back(entry.first);
+      }
+
+      std::random_device rd;
+      std::default_random_engine gen(rd());
+      std::shuffle(keys.begin(), keys.end(), gen);
+      keys.resize(std::min(keys.size(), num_victims));
+    } break;
+
+    case DatabaseOverflowPolicy_t::EvictLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictOldest: {
+      const bool least_used{this->params_.overflow_policy ==
+                            DatabaseOverflowPolicy_t::EvictLeastUsed};
+
+      std::vector<std::pair<Key, uint64_t>> keys_metas;
+      keys_metas.reserve(part.entries.size());
+      for (const auto& entry : part.entries) {
+        keys_metas.emplace_back(entry.first, least_used
+                                                 ? entry.second.access_count
+                                                 : static_cast<uint64_t>(entry.second.last_access));
+      }
+
+      // Sort ascending by number of accesses / time, but only as far as needed.
+      const size_t num_keys{std::min(keys_metas.size(), num_victims)};
+      const auto& km_end{keys_metas.begin() + num_keys};
+      std::partial_sort(keys_metas.begin(), km_end, keys_metas.end(),
+                        [](const auto& km0, const auto& km1) { return km0.second < km1.second; });
+      keys.reserve(num_keys);
+      for (auto km_it{keys_metas.begin()}; km_it != km_end; ++km_it) {
+        keys.emplace_back(km_it->first);
+      }
+    } break;
+
+    default:
+      HCTR_DIE("Overflow policy has no exact eviction order!");
+  }
+
+  return keys;
+}
+
+template <typename Key>
+void HashMapBackend<Key>::resolve_overflows_in_background_() {
+  const size_t max_batch_size{this->params_.max_batch_size};
+  const DatabaseOverflowPolicy_t overflow_policy{this->params_.overflow_policy};
+  const bool exact_policy{overflow_policy == DatabaseOverflowPolicy_t::EvictRandom ||
+                          overflow_policy == DatabaseOverflowPolicy_t::EvictLeastUsed ||
+                          overflow_policy == DatabaseOverflowPolicy_t::EvictOldest};
+
+  while (true) {
+    // Wait for a partition that crossed the soft watermark.
+    std::pair<std::string, size_t> table_name_part_index;
+    {
+      std::unique_lock lock(overflow_queue_guard_);
+      overflow_queue_cv_.wait(
+          lock, [this]() { return overflow_resolver_stop_ || !overflow_queue_.empty(); });
+      if (overflow_resolver_stop_) {
+        break;
+      }
+      table_name_part_index = std::move(overflow_queue_.extract(overflow_queue_.begin()).value());
+    }
+    const std::string& table_name{table_name_part_index.first};
+    const size_t part_index{table_name_part_index.second};
+
+    // Trim the partition one batch at a time. The write lock is released between batches, so that
+    // queries and inserts can interleave. The exact policies have to inspect the entire partition
+    // to pick victims. Hence, they determine the victims once per pass under the read lock, and
+    // evict them in batches. Victims that disappear meanwhile are skipped.
+    size_t num_deletions{0};
+    std::vector<Key> victims;
+    auto v_it{victims.cend()};
+    while (!overflow_resolver_stop_) {
+      if (exact_policy && v_it == victims.cend()) {
+        const std::shared_lock lock(read_write_guard_);
+
+        // The table might have been dropped meanwhile.
+        const auto& tables_it{tables_.find(table_name)};
+        if (tables_it == tables_.end()) {
+          break;
+        }
+        const Partition& part{tables_it->second[part_index]};
+
+        const size_t part_size{part.entries.size()};
+        if (part_size <= this->overflow_resolution_margin_) {
+          break;
+        }
+        victims = order_overflow_victims_(part, part_size - this->overflow_resolution_margin_);
+        v_it = victims.cbegin();
+      }
+
+      const std::unique_lock lock(read_write_guard_);
+
+      // The table might have been dropped meanwhile.
+      const auto& tables_it{tables_.find(table_name)};
+      if (tables_it == tables_.end()) {
+        break;
+      }
+      Partition& part{tables_it->second[part_index]};
+
+      const size_t part_size{part.entries.size()};
+      if (part_size <= this->overflow_resolution_margin_) {
+        break;
+      }
+
+      if (exact_policy) {
+        HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+                   " is overflowing (size = ", part_size, " > ", overflow_soft_margin_,
+                   "): Evicting up to ", max_batch_size, " key/value pairs in background!\n");
+
+        const size_t batch_size{std::min<size_t>(victims.cend() - v_it, max_batch_size)};
+        for (const auto& batch_end{v_it + batch_size}; v_it != batch_end; ++v_it) {
+          const Key* const k{&*v_it};
+          HCTR_HPS_HASH_MAP_EVICT_K_();
+        }
+      } else {
+        const size_t target_size{std::max(part_size - std::min(part_size, max_batch_size),
+                                          this->overflow_resolution_margin_)};
+        num_deletions += resolve_overflow_(table_name, part_index, part, target_size);
+      }
+    }
+
+    HCTR_LOG_C(DEBUG, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+               ": Background overflow resolution evicted ", num_deletions, " entries.\n");
+  }
+}
+
 template class HashMapBackend<unsigned int>;
 template class HashMapBackend<long long>;
 
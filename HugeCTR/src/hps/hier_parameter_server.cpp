@@ -14,9 +14,15 @@
  * limitations under the License.
  */
 
+#include <parallel_hashmap/phmap.h>
+
 #include <algorithm>
 #include <cmath>
+#include <condition_variable>
+#include <deque>
+#include <exception>
 #include <filesystem>
+#include <future>
 #include <hps/hash_map_backend.hpp>
 #include <hps/hier_parameter_server.hpp>
 #include <hps/kafka_message.hpp>
@@ -24,10 +30,126 @@
 #include <hps/mp_hash_map_backend.hpp>
 #include <hps/redis_backend.hpp>
 #include <hps/rocksdb_backend.hpp>
+#include <mutex>
+#include <numeric>
 #include <regex>
+#include <thread>
+#include <thread_pool.hpp>
 
 namespace HugeCTR {
 
+namespace {
+
+/**
+ * A chunk of embeddings that has been read from a model file.
+ */
+template <typename Key>
+struct ModelChunk final {
+  std::vector<Key> keys;
+  std::vector<float> vectors;
+};
+
+/**
+ * Bounded queue to pass chunks of embeddings from the thread reading a model file to the thread
+ * inserting them into the database(s).
+ */
+template <typename Key>
+class ModelChunkQueue final {
+ public:
+  HCTR_DISALLOW_COPY_AND_MOVE(ModelChunkQueue);
+
+  ModelChunkQueue(const size_t capacity) : capacity_{capacity} {}
+
+  /**
+   * Blocks while the queue is full.
+   *
+   * @return \p false if the queue has been closed.
+   */
+  bool push(ModelChunk<Key>&& chunk) {
+    std::unique_lock lock(guard_);
+    not_full_.wait(lock, [&]() { return closed_ || chunks_.size() < capacity_; });
+    if (closed_) {
+      return false;
+    }
+    chunks_.emplace_back(std::move(chunk));
+    not_empty_.notify_one();
+    return true;
+  }
+
+  /**
+   * Blocks while the queue is empty.
+   *
+   * @return \p false if the queue has been closed and all chunks have been consumed.
+   */
+  bool pop(ModelChunk<Key>& chunk) {
+    std::unique_lock lock(guard_);
+    not_empty_.wait(lock, [&]() { return closed_ || !chunks_.empty(); });
+    if (chunks_.empty()) {
+      return false;
+    }
+    chunk = std::move(chunks_.front());
+    chunks_.pop_front();
+    not_full_.notify_one();
+    return true;
+  }
+
+  void close() {
+    {
+      const std::lock_guard lock(guard_);
+      closed_ = true;
+    }
+    not_full_.notify_all();
+    not_empty_.notify_all();
+  }
+
+ private:
+  const size_t capacity_;
+  std::mutex guard_;
+  std::condition_variable not_full_;
+  std::condition_variable not_empty_;
+  std::deque<ModelChunk<Key>> chunks_;
+  bool closed_{false};
+};
+
+/**
+ * Lookups with fewer keys are not deduplicated. For these, building the hash map costs more than
+ * the duplicate fetches it can save.
+ */
+constexpr size_t lookup_dedup_min_length{1024};
+
+/**
+ * Reusable buffers to deduplicate the keys of a parameter server lookup.
+ */
+template <typename Key>
+struct LookupDedupWorkspace final {
+  phmap::flat_hash_map<Key, size_t> unique_index;
+  std::vector<Key> unique_keys;
+  std::vector<size_t> inverse;  // Position of each input key in `unique_keys`.
+  std::vector<float> unique_vectors;
+
+  /**
+   * Collects the unique keys in order of their first occurrence.
+   *
+   * @return The number of unique keys.
+   */
+  size_t deduplicate(const Key* const keys, const size_t num_keys) {
+    unique_index.clear();
+    unique_keys.clear();
+    inverse.resize(num_keys);
+
+    for (size_t i{}; i != num_keys; ++i) {
+      const auto& res{unique_index.try_emplace(keys[i], unique_keys.size())};
+      if (res.second) {
+        unique_keys.emplace_back(keys[i]);
+      }
+      inverse[i] = res.first->second;
+    }
+    return unique_keys.size();
+  }
+};
+
+}  // namespace
+
 std::string HierParameterServerBase::make_tag_name(const std::string& model_name,
                                                    const std::string& embedding_table_name,
                                                    const bool check_arguments) {
@@ -117,6 +239,8 @@ HierParameterServer<TypeHashKey>::HierParameterServer(const parameter_server_con
             conf.overflow_margin,
             conf.overflow_policy,
             conf.overflow_resolution_target,
+            conf.background_overflow_resolution,
+            conf.overflow_soft_watermark,
             conf.allocation_rate,
         };
         volatile_db_ = std::make_unique<HashMapBackend<TypeHashKey>>(params);
@@ -131,6 +255,8 @@ HierParameterServer<TypeHashKey>::HierParameterServer(const parameter_server_con
             conf.overflow_margin,
             conf.overflow_policy,
             conf.overflow_resolution_target,
+            conf.background_overflow_resolution,
+            conf.overflow_soft_watermark,
             conf.allocation_rate,
             conf.shared_memory_size,
             conf.shared_memory_name,
@@ -149,6 +275,8 @@ HierParameterServer<TypeHashKey>::HierParameterServer(const parameter_server_con
             conf.overflow_margin,
             conf.overflow_policy,
             conf.overflow_resolution_target,
+            conf.background_overflow_resolution,
+            conf.overflow_soft_watermark,
             conf.address,
             conf.user_name,
             conf.password,
@@ -201,6 +329,14 @@ HierParameterServer<TypeHashKey>::HierParameterServer(const parameter_server_con
         break;
     }
     persistent_db_initialize_after_startup_ = conf.initialize_after_startup;
+
+    if (persistent_db_ && conf.negative_cache_capacity) {
+      persistent_db_negative_cache_ = std::make_unique<NegativeLookupCache<TypeHashKey>>(
+          conf.negative_cache_capacity, std::chrono::milliseconds{conf.negative_cache_ttl_ms});
+      HCTR_LOG_S(INFO, WORLD) << "Persistent DB: negative cache capacity = "
+                              << conf.negative_cache_capacity
+                              << ", ttl = " << conf.negative_cache_ttl_ms << " ms" << std::endl;
+    }
   }
 
   // initialize the profiler
@@ -249,75 +385,143 @@ HierParameterServer<TypeHashKey>::~HierParameterServer() {
 template <typename TypeHashKey>
 void HierParameterServer<TypeHashKey>::update_database_per_model(
     const InferenceParams& inference_params) {
-  IModelLoader* rawreader =
-      ModelLoader<TypeHashKey, float>::CreateLoader(DatabaseTableDumpFormat_t::Raw);
-  size_t num_tables = inference_params.fuse_embedding_table
-                          ? inference_params.fused_sparse_model_files.size()
-                          : inference_params.sparse_model_files.size();
-  // Create input file stream to read the embedding file
-  for (size_t j = 0; j < num_tables; j++) {
-    if (ps_config_.embedding_vec_size_[inference_params.model_name].size() != num_tables) {
-      HCTR_OWN_THROW(Error_t::WrongInput,
-                     "Wrong input: The number of embedding tables in network json file for model " +
-                         inference_params.model_name +
-                         " doesn't match the number of model files in configuration.");
+  const std::string& model_name = inference_params.model_name;
+  const size_t num_tables = inference_params.fuse_embedding_table
+                                ? inference_params.fused_sparse_model_files.size()
+                                : inference_params.sparse_model_files.size();
+  const std::vector<std::string>& table_names = ps_config_.emb_table_name_[model_name];
+  const std::vector<size_t>& embedding_sizes = ps_config_.embedding_vec_size_[model_name];
+  if (embedding_sizes.size() != num_tables) {
+    HCTR_OWN_THROW(Error_t::WrongInput,
+                   "Wrong input: The number of embedding tables in network json file for model " +
+                       model_name + " doesn't match the number of model files in configuration.");
+  }
+
+  const bool is_dynamic =
+      inference_params.embedding_cache_type == HugeCTR::EmbeddingCacheType_t::Dynamic;
+  // Populate volatile database(s).
+  const bool populate_volatile_db =
+      volatile_db_ && volatile_db_initialize_after_startup_ && is_dynamic;
+  // Persistent database - by definition - always gets all keys.
+  const bool populate_persistent_db =
+      persistent_db_ && persistent_db_initialize_after_startup_ && is_dynamic;
+  if (populate_volatile_db) {
+    volatile_db_async_inserter_.await_idle();
+  }
+
+  // Model files are read in chunks. While a chunk is inserted, the next chunks are already read.
+  const size_t chunk_size{std::max(inference_params.volatile_db.max_batch_size,
+                                   inference_params.persistent_db.max_batch_size)};
+  constexpr size_t max_queued_chunks{4};
+
+  std::vector<size_t> num_keys(num_tables);
+  auto load_table = [&](const size_t j) {
+    const auto begin{std::chrono::high_resolution_clock::now()};
+
+    const std::string tag_name = make_tag_name(model_name, table_names[j]);
+    const size_t embedding_size = embedding_sizes[j];
+    const size_t value_size = embedding_size * sizeof(float);
+    const std::vector<std::string>& paths =
+        inference_params.fuse_embedding_table
+            ? inference_params.fused_sparse_model_files[j]
+            : std::vector<std::string>{inference_params.sparse_model_files[j]};
+
+    // Keys missing from the previous version of the table might be present now.
+    if (persistent_db_negative_cache_) {
+      persistent_db_negative_cache_->clear({tag_name});
     }
-    // Get raw format model loader
-    size_t num_key = 0;
-    if (inference_params.fuse_embedding_table) {
-      for (int table_id = 0; table_id < inference_params.fused_sparse_model_files[j].size();
-           table_id++) {
-        rawreader->load(inference_params.embedding_table_names[j],
-                        inference_params.fused_sparse_model_files[j][table_id]);
-        num_key += rawreader->getkeycount();
+
+    // Get a raw format model loader per file. The loaders are kept to read the files below, so that
+    // the metadata of each file is only loaded once.
+    std::vector<IModelLoader*> rawreaders;
+    rawreaders.reserve(paths.size());
+    const auto delete_rawreaders{[&]() {
+      for (IModelLoader* const rawreader : rawreaders) {
+        rawreader->delete_table();
       }
-    } else {
-      rawreader->load(inference_params.embedding_table_names[j],
-                      inference_params.sparse_model_files[j]);
-      num_key = rawreader->getkeycount();
+    }};
+    for (const std::string& path : paths) {
+      IModelLoader* const rawreader =
+          ModelLoader<TypeHashKey, float>::CreateLoader(DatabaseTableDumpFormat_t::Raw);
+      rawreaders.emplace_back(rawreader);
+      rawreader->load(inference_params.embedding_table_names[j], path, chunk_size);
+      num_keys[j] += rawreader->getkeycount();
+    }
+    if (!populate_volatile_db && !populate_persistent_db) {
+      delete_rawreaders();
+      return;
     }
-    ps_config_.embedding_key_count_.at(inference_params.model_name).emplace_back(num_key);
-    const std::string tag_name = make_tag_name(
-        inference_params.model_name, ps_config_.emb_table_name_[inference_params.model_name][j]);
-    const size_t embedding_size = ps_config_.embedding_vec_size_[inference_params.model_name][j];
-    // Populate volatile database(s).
-    if (volatile_db_ && volatile_db_initialize_after_startup_ &&
-        inference_params.embedding_cache_type == HugeCTR::EmbeddingCacheType_t::Dynamic) {
-      const size_t volatile_capacity = volatile_db_->capacity(tag_name);
-      const size_t volatile_cache_amount =
-          (num_key <= volatile_capacity)
-              ? num_key
-              : static_cast<size_t>(
-                    volatile_db_cache_rate_ * static_cast<double>(volatile_capacity) + 0.5);
 
-      volatile_db_async_inserter_.await_idle();
-      if (!inference_params.fuse_embedding_table) {
-        for (size_t i = 0; i < rawreader->get_num_iterations(); i++) {
-          std::pair<void*, size_t> key_result = rawreader->getkeys(i);
-          std::pair<void*, size_t> vec_result = rawreader->getvectors(i, embedding_size);
-          volatile_db_->insert(tag_name, key_result.second,
-                               reinterpret_cast<const TypeHashKey*>(key_result.first),
-                               reinterpret_cast<const char*>(vec_result.first),
-                               embedding_size * sizeof(float), embedding_size * sizeof(float));
-        }
-      } else {
-        for (int table_id = 0; table_id < inference_params.fused_sparse_model_files[j].size();
-             table_id++) {
-          rawreader->load(inference_params.embedding_table_names[j],
-                          inference_params.fused_sparse_model_files[j][table_id]);
+    // Read the model file(s) in a separate thread.
+    ModelChunkQueue<TypeHashKey> queue(max_queued_chunks);
+    std::exception_ptr read_error;
+    std::thread reader([&]() {
+      try {
+        for (IModelLoader* const rawreader : rawreaders) {
           for (size_t i = 0; i < rawreader->get_num_iterations(); i++) {
-            std::pair<void*, size_t> key_result = rawreader->getkeys(i);
-            std::pair<void*, size_t> vec_result = rawreader->getvectors(i, embedding_size);
-            volatile_db_->insert(tag_name, key_result.second,
-                                 reinterpret_cast<const TypeHashKey*>(key_result.first),
-                                 reinterpret_cast<const char*>(vec_result.first),
-                                 embedding_size * sizeof(float), embedding_size * sizeof(float));
+            const std::pair<void*, size_t> key_result = rawreader->getkeys(i);
+            const std::pair<void*, size_t> vec_result = rawreader->getvectors(i, embedding_size);
+
+            ModelChunk<TypeHashKey> chunk;
+            const TypeHashKey* const keys = reinterpret_cast<const TypeHashKey*>(key_result.first);
+            chunk.keys.assign(keys, &keys[key_result.second]);
+            const float* const vectors = reinterpret_cast<const float*>(vec_result.first);
+            chunk.vectors.assign(vectors, &vectors[key_result.second * embedding_size]);
+            if (!queue.push(std::move(chunk))) {
+              return;  // Inserting failed.
+            }
           }
         }
+      } catch (...) {
+        read_error = std::current_exception();
+      }
+      queue.close();
+    });
+
+    // Insert the chunks into the database(s) as they arrive.
+    size_t num_loaded = 0;
+    try {
+      ModelChunk<TypeHashKey> chunk;
+      while (queue.pop(chunk)) {
+        const size_t num_pairs = chunk.keys.size();
+        const char* const values = reinterpret_cast<const char*>(chunk.vectors.data());
+        if (populate_volatile_db) {
+          volatile_db_->insert(tag_name, num_pairs, chunk.keys.data(), values, value_size,
+                               value_size);
+        }
+        if (populate_persistent_db) {
+          persistent_db_->insert(tag_name, num_pairs, chunk.keys.data(), values, value_size,
+                                 value_size);
+        }
+        num_loaded += num_pairs;
       }
+    } catch (...) {
+      queue.close();
+      reader.join();
+      delete_rawreaders();
+      throw;
+    }
+    reader.join();
+    delete_rawreaders();
+    if (read_error) {
+      std::rethrow_exception(read_error);
+    }
+
+    // Lookups during the load might have remembered keys as missing that have been loaded since.
+    if (persistent_db_negative_cache_) {
+      persistent_db_negative_cache_->clear({tag_name});
+    }
+
+    if (populate_volatile_db) {
+      const size_t volatile_capacity = volatile_db_->capacity(tag_name);
+      const size_t volatile_cache_amount =
+          (num_keys[j] <= volatile_capacity)
+              ? num_keys[j]
+              : static_cast<size_t>(
+                    volatile_db_cache_rate_ * static_cast<double>(volatile_capacity) + 0.5);
 
       HCTR_LOG_S(INFO, WORLD) << "Table: " << tag_name << "; cached " << volatile_cache_amount
-                              << " / " << num_key << " embeddings in volatile database ("
+                              << " / " << num_keys[j] << " embeddings in volatile database ("
                               << volatile_db_->get_name()
                               << "); load: " << volatile_db_->size(tag_name) << " / "
                               << volatile_capacity << " (" << std::fixed << std::setprecision(2)
@@ -325,40 +529,37 @@ void HierParameterServer<TypeHashKey>::update_database_per_model(
                                   static_cast<double>(volatile_capacity))
                               << "%)." << std::endl;
     }
+    if (populate_persistent_db) {
+      HCTR_LOG_S(INFO, WORLD) << "Table: " << tag_name << "; cached " << num_keys[j]
+                              << " embeddings in persistent database ("
+                              << persistent_db_->get_name() << ")." << std::endl;
+    }
 
-    // Persistent database - by definition - always gets all keys.
-    if (persistent_db_ && persistent_db_initialize_after_startup_ &&
-        inference_params.embedding_cache_type == HugeCTR::EmbeddingCacheType_t::Dynamic) {
-      if (!inference_params.fuse_embedding_table) {
-        for (size_t i = 0; i < rawreader->get_num_iterations(); i++) {
-          std::pair<void*, size_t> key_result = rawreader->getkeys(i);
-          std::pair<void*, size_t> vec_result = rawreader->getvectors(i, embedding_size);
-          persistent_db_->insert(tag_name, key_result.second,
-                                 reinterpret_cast<const TypeHashKey*>(key_result.first),
-                                 reinterpret_cast<const char*>(vec_result.first),
-                                 embedding_size * sizeof(float), embedding_size * sizeof(float));
-        }
-      } else {
-        for (int table_id = 0; table_id < inference_params.fused_sparse_model_files[j].size();
-             table_id++) {
-          rawreader->load(inference_params.embedding_table_names[j],
-                          inference_params.fused_sparse_model_files[j][table_id]);
-          for (size_t i = 0; i < rawreader->get_num_iterations(); i++) {
-            std::pair<void*, size_t> key_result = rawreader->getkeys(i);
-            std::pair<void*, size_t> vec_result = rawreader->getvectors(i, embedding_size);
-            persistent_db_->insert(tag_name, key_result.second,
-                                   reinterpret_cast<const TypeHashKey*>(key_result.first),
-                                   reinterpret_cast<const char*>(vec_result.first),
-                                   embedding_size * sizeof(float), embedding_size * sizeof(float));
-          }
-        }
-        HCTR_LOG_S(INFO, WORLD) << "Table: " << tag_name << "; cached " << num_key
-                                << " embeddings in persistent database ("
-                                << persistent_db_->get_name() << ")." << std::endl;
-      }
+    const std::chrono::duration<double> elapsed{std::chrono::high_resolution_clock::now() - begin};
+    const double num_mbytes{static_cast<double>(num_loaded * (sizeof(TypeHashKey) + value_size)) /
+                            (1024.0 * 1024.0)};
+    HCTR_LOG_S(INFO, WORLD) << "Table: " << tag_name << "; loaded " << num_loaded << " embeddings ("
+                            << std::fixed << std::setprecision(2) << num_mbytes << " MiB) in "
+                            << elapsed.count() << " s (" << num_mbytes / elapsed.count()
+                            << " MiB/s)." << std::endl;
+  };
+
+  // Load independent tables concurrently.
+  {
+    // Each table occupies a thread for reading and a thread for inserting.
+    const size_t num_workers{
+        std::min<size_t>(num_tables, std::max(std::thread::hardware_concurrency() / 2, 1U))};
+    ThreadPool table_loaders{"hps table loader", num_workers};
+    std::vector<std::future<void>> tasks;
+    tasks.reserve(num_tables);
+    for (size_t j = 0; j < num_tables; j++) {
+      tasks.emplace_back(table_loaders.submit([&, j]() { load_table(j); }));
     }
+    ThreadPool::await(tasks.begin(), tasks.end());
+  }
+  for (const size_t num_key : num_keys) {
+    ps_config_.embedding_key_count_.at(model_name).emplace_back(num_key);
   }
-  rawreader->delete_table();
 
   // Connect to online update service (if configured).
   // TODO: Maybe need to change the location where this is initialized.
@@ -441,6 +642,9 @@ void HierParameterServer<TypeHashKey>::update_database_per_model(
       HCTR_LOG_C(TRACE, WORLD, "Volatile DB update for tag: '", tag, "', num_pairs: ", num_pairs,
                  ", value_size: ", value_size, " bytes\n");
       volatile_db_->insert(tag, num_pairs, keys, values, value_size, value_size);
+      if (persistent_db_negative_cache_) {
+        persistent_db_negative_cache_->erase(tag, num_pairs, keys);
+      }
     });
   }
 
@@ -451,6 +655,9 @@ void HierParameterServer<TypeHashKey>::update_database_per_model(
       HCTR_LOG_C(TRACE, WORLD, "Persistent DB update for tag: '", tag, "', num_pairs: ", num_pairs,
                  ", value_size: ", value_size, " bytes\n");
       persistent_db_->insert(tag, num_pairs, keys, values, value_size, value_size);
+      if (persistent_db_negative_cache_) {
+        persistent_db_negative_cache_->erase(tag, num_pairs, keys);
+      }
     });
   }
 }
@@ -684,6 +891,9 @@ void HierParameterServer<TypeHashKey>::erase_model_from_hps(const std::string& m
   if (persistent_db_) {
     const std::vector<std::string>& table_names = persistent_db_->find_tables(model_name);
     persistent_db_->evict(table_names);
+    if (persistent_db_negative_cache_) {
+      persistent_db_negative_cache_->clear(table_names);
+    }
   }
 }
 
@@ -763,40 +973,61 @@ void HierParameterServer<TypeHashKey>::lookup(const void* const h_keys, const si
   HCTR_LOG_S(TRACE, WORLD) << "Looking up " << length << " embeddings (each with " << embedding_size
                            << " values)..." << std::endl;
 #endif
+
+  // Deduplicate the keys of large lookups, so that each unique key is fetched (and elevated) only
+  // once. The workspace is kept per thread to reuse its memory across calls.
+  thread_local LookupDedupWorkspace<TypeHashKey> dedup;
+  size_t num_unique = length;
+  if (length >= lookup_dedup_min_length) {
+    start = profiler::start();
+    num_unique = dedup.deduplicate(reinterpret_cast<const TypeHashKey*>(h_keys), length);
+    hps_profiler->end(start, "Deduplicate the embedding keys");
+    start = profiler::start(static_cast<double>(num_unique) / static_cast<double>(length),
+                            ProfilerType_t::Occupancy);
+    hps_profiler->end(start, "The unique ratio of embedding keys", ProfilerType_t::Occupancy);
+  }
+
+  // Without duplicates, we can directly work on the input and output buffers.
+  const bool has_duplicates = num_unique != length;
+  const TypeHashKey* const keys =
+      has_duplicates ? dedup.unique_keys.data() : reinterpret_cast<const TypeHashKey*>(h_keys);
+  float* vectors = h_vectors;
+  if (has_duplicates) {
+    dedup.unique_vectors.resize(num_unique * embedding_size);
+    vectors = dedup.unique_vectors.data();
+  }
+
   size_t hit_count = 0;
 
   DatabaseMissCallback fill_default{[&](const size_t index) {
-    std::fill_n(&h_vectors[index * embedding_size], embedding_size, default_vec_value);
+    std::fill_n(&vectors[index * embedding_size], embedding_size, default_vec_value);
   }};
 
   // If have volatile and persistent database.
   if (volatile_db_ && persistent_db_) {
     // Do a sequential lookup in the volatile DB, and remember the missing keys.
     constexpr size_t invalid_index{std::numeric_limits<size_t>::max()};
-    std::vector<size_t> indices(length, invalid_index);
+    std::vector<size_t> indices(num_unique, invalid_index);
 
     start = profiler::start();
-    hit_count += volatile_db_->fetch(tag_name, length, reinterpret_cast<const TypeHashKey*>(h_keys),
-                                     reinterpret_cast<char*>(h_vectors), expected_value_size,
+    hit_count += volatile_db_->fetch(tag_name, num_unique, keys, reinterpret_cast<char*>(vectors),
+                                     expected_value_size,
                                      [&](const size_t index) { indices[index] = index; });
     hps_profiler->end(start, "Lookup the embedding key from VDB");
 
     HCTR_LOG_C(TRACE, WORLD, volatile_db_->get_name(), ": ", hit_count, " hits, ",
-               length - hit_count, " missing!\n");
+               num_unique - hit_count, " missing!\n");
 
-    if (hit_count != length) {
+    if (hit_count != num_unique) {
       // Compress indices (Erase-remove idiom).
       indices.erase(std::remove(indices.begin(), indices.end(), invalid_index), indices.end());
 
       // Do a sparse lookup in the persisent DB, to fill gaps and set others to default.
-      start = profiler::start();
-      hit_count += persistent_db_->fetch(
-          tag_name, indices.size(), indices.data(), reinterpret_cast<const TypeHashKey*>(h_keys),
-          reinterpret_cast<char*>(h_vectors), expected_value_size, fill_default);
-      hps_profiler->end(start, "Lookup the missing embedding key from the PDB");
+      hit_count += fetch_from_persistent_db_(tag_name, indices, num_unique, keys, vectors,
+                                             expected_value_size, fill_default);
 
       HCTR_LOG_C(TRACE, WORLD, persistent_db_->get_name(), ": ", hit_count, " hits, ",
-                 length - hit_count, " still missing!\n");
+                 num_unique - hit_count, " still missing!\n");
 
       // Elevate KV pairs if desired and possible.
       if (volatile_db_cache_missed_embeddings_) {
@@ -809,8 +1040,8 @@ void HierParameterServer<TypeHashKey>::lookup(const void* const h_keys, const si
         for (size_t i{}; i != indices.size(); ++i) {
           const size_t index{indices[i]};
 
-          (*keys_to_elevate)[i] = reinterpret_cast<const TypeHashKey*>(h_keys)[index];
-          std::copy_n(&h_vectors[index * embedding_size], embedding_size,
+          (*keys_to_elevate)[i] = keys[index];
+          std::copy_n(&vectors[index * embedding_size], embedding_size,
                       &(*values_to_elevate)[i * embedding_size]);
         }
         hps_profiler->end(start, "Insert the missing embedding key into the VDB");
@@ -835,30 +1066,108 @@ void HierParameterServer<TypeHashKey>::lookup(const void* const h_keys, const si
     DatabaseBackendBase<TypeHashKey>* const db =
         volatile_db_ ? static_cast<DatabaseBackendBase<TypeHashKey>*>(volatile_db_.get())
                      : static_cast<DatabaseBackendBase<TypeHashKey>*>(persistent_db_.get());
-    if (db) {
+    if (db == persistent_db_.get() && persistent_db_negative_cache_) {
+      // Sparse lookup, so that keys known to be missing can be skipped.
+      std::vector<size_t> indices(num_unique);
+      std::iota(indices.begin(), indices.end(), 0);
+      hit_count += fetch_from_persistent_db_(tag_name, indices, num_unique, keys, vectors,
+                                             expected_value_size, fill_default);
+      HCTR_LOG_C(TRACE, WORLD, db->get_name(), ": ", hit_count, " hits, ", num_unique - hit_count,
+                 " missing!\n");
+    } else if (db) {
       start = profiler::start();
       // Do a sequential lookup in the volatile DB, but fill gaps with a default value.
-      hit_count += db->fetch(tag_name, length, reinterpret_cast<const TypeHashKey*>(h_keys),
-                             reinterpret_cast<char*>(h_vectors), expected_value_size, fill_default);
+      hit_count += db->fetch(tag_name, num_unique, keys, reinterpret_cast<char*>(vectors),
+                             expected_value_size, fill_default);
       hps_profiler->end(start, "Lookup the embedding key from default HPS database Backend");
-      HCTR_LOG_C(TRACE, WORLD, db->get_name(), ": ", hit_count, " hits, ", length - hit_count,
+      HCTR_LOG_C(TRACE, WORLD, db->get_name(), ": ", hit_count, " hits, ", num_unique - hit_count,
                  " missing!\n");
     } else {
       // Without a database, set everything to default.
-      std::fill_n(h_vectors, length * embedding_size, default_vec_value);
+      std::fill_n(vectors, num_unique * embedding_size, default_vec_value);
       HCTR_LOG_C(WARNING, WORLD, "No database. All embeddings set to default.\n");
     }
   }
 
+  // Scatter the unique embeddings back to their original positions.
+  if (has_duplicates) {
+    start = profiler::start();
+    for (size_t i{}; i != length; ++i) {
+      std::copy_n(&vectors[dedup.inverse[i] * embedding_size], embedding_size,
+                  &h_vectors[i * embedding_size]);
+    }
+    hps_profiler->end(start, "Scatter the unique embeddings to the duplicate keys");
+  }
+
   const auto end_time = std::chrono::high_resolution_clock::now();
   const auto duration =
       std::chrono::duration_cast<std::chrono::microseconds>(end_time - start_time);
 #ifdef ENABLE_INFERENCE
-  HCTR_LOG_S(TRACE, WORLD) << "Parameter server lookup of " << hit_count << " / " << length
-                           << " embeddings took " << duration.count() << " us." << std::endl;
+  HCTR_LOG_S(TRACE, WORLD) << "Parameter server lookup of " << hit_count << " / " << num_unique
+                           << " unique (" << length << " total) embeddings took "
+                           << duration.count() << " us." << std::endl;
 #endif
 }
 
+template <typename TypeHashKey>
+size_t HierParameterServer<TypeHashKey>::fetch_from_persistent_db_(
+    const std::string& tag_name, std::vector<size_t>& indices, const size_t num_keys,
+    const TypeHashKey* const keys, float* const vectors, const size_t value_size,
+    const DatabaseMissCallback& fill_default) {
+  if (!persistent_db_negative_cache_) {
+    BaseUnit* start = profiler::start();
+    const size_t hit_count =
+        persistent_db_->fetch(tag_name, indices.size(), indices.data(), keys,
+                              reinterpret_cast<char*>(vectors), value_size, fill_default);
+    hps_profiler->end(start, "Lookup the missing embedding key from the PDB");
+    return hit_count;
+  }
+
+  // Skip keys that were recently found to be missing from the persistent DB. Take the generation
+  // first, to not remember keys that are inserted while we query the persistent DB.
+  const uint64_t generation = persistent_db_negative_cache_->generation(tag_name);
+  BaseUnit* start = profiler::start();
+  const size_t num_indices = indices.size();
+  const size_t num_known_missing =
+      persistent_db_negative_cache_->filter(tag_name, indices, keys, fill_default);
+  hps_profiler->end(start, "Lookup the missing embedding key from the negative cache");
+  start = profiler::start(static_cast<double>(num_known_missing) / static_cast<double>(num_indices),
+                          ProfilerType_t::Occupancy);
+  hps_profiler->end(start, "The hit rate of the negative cache", ProfilerType_t::Occupancy);
+
+  HCTR_LOG_C(TRACE, WORLD, "Negative cache: ", num_known_missing, " / ", num_indices,
+             " embeddings known to be missing.\n");
+
+  if (indices.empty()) {
+    return 0;
+  }
+
+  // Remember the keys that the persistent DB does not know either.
+  std::vector<char> missing(num_keys);
+  start = profiler::start();
+  const DatabaseMissCallback fill_default_and_remember{[&](const size_t index) {
+    fill_default(index);
+    missing[index] = 1;
+  }};
+  const size_t hit_count = persistent_db_->fetch(tag_name, indices.size(), indices.data(), keys,
+                                                 reinterpret_cast<char*>(vectors), value_size,
+                                                 fill_default_and_remember);
+  hps_profiler->end(start, "Lookup the missing embedding key from the PDB");
+
+  if (hit_count != indices.size()) {
+    std::vector<size_t> missing_indices;
+    missing_indices.reserve(indices.size() - hit_count);
+    for (const size_t index : indices) {
+      if (missing[index]) {
+        missing_indices.emplace_back(index);
+      }
+    }
+    persistent_db_negative_cache_->insert(tag_name, generation, missing_indices.size(),
+                                          missing_indices.data(), keys);
+  }
+  return hit_count;
+}
+
 template <typename TypeHashKey>
 void HierParameterServer<TypeHashKey>::refresh_embedding_cache(const std::string& model_name,
                                                                const int device_id) {
@@ -45,6 +45,8 @@ bool VolatileDatabaseParams::operator==(const VolatileDatabaseParams& p) const {
          // Overflow handling related.
          overflow_margin == p.overflow_margin && overflow_policy == p.overflow_policy &&
          overflow_resolution_target == p.overflow_resolution_target &&
+         background_overflow_resolution == p.background_overflow_resolution &&
+         overflow_soft_watermark == p.overflow_soft_watermark &&
          // Caching behavior related.
          initialize_after_startup == p.initialize_after_startup &&
          initial_cache_rate == p.initial_cache_rate &&
@@ -63,6 +65,8 @@ bool PersistentDatabaseParams::operator==(const PersistentDatabaseParams& p) con
          max_batch_size == p.max_batch_size &&
          // Caching behavior related.
          initialize_after_startup == p.initialize_after_startup &&
+         negative_cache_capacity == p.negative_cache_capacity &&
+         negative_cache_ttl_ms == p.negative_cache_ttl_ms &&
          // Real-time update mechanism related.
          update_filters == p.update_filters;
 }
@@ -96,7 +100,8 @@ VolatileDatabaseParams::VolatileDatabaseParams(
     const std::string& tls_client_key, const std::string& tls_server_name_identification,
     // Overflow handling related.
     const size_t overflow_margin, const DatabaseOverflowPolicy_t overflow_policy,
-    const double overflow_resolution_target,
+    const double overflow_resolution_target, const bool background_overflow_resolution,
+    const double overflow_soft_watermark,
     // Caching behavior related.
     const bool initialize_after_startup, const double initial_cache_rate,
     const bool cache_missed_embeddings,
@@ -123,6 +128,8 @@ VolatileDatabaseParams::VolatileDatabaseParams(
       overflow_margin{overflow_margin},
       overflow_policy{overflow_policy},
       overflow_resolution_target{overflow_resolution_target},
+      background_overflow_resolution{background_overflow_resolution},
+      overflow_soft_watermark{overflow_soft_watermark},
       // Caching behavior related.
       initialize_after_startup{initialize_after_startup},
       initial_cache_rate{initial_cache_rate},
@@ -140,6 +147,8 @@ PersistentDatabaseParams::PersistentDatabaseParams(const DatabaseType_t type,
                                                    const size_t max_batch_size,
                                                    // Caching behavior related.
                                                    const bool initialize_after_startup,
+                                                   const size_t negative_cache_capacity,
+                                                   const size_t negative_cache_ttl_ms,
                                                    // Real-time update mechanism related.
                                                    const std::vector<std::string>& update_filters)
     : type(type),
@@ -150,6 +159,8 @@ PersistentDatabaseParams::PersistentDatabaseParams(const DatabaseType_t type,
       max_batch_size(max_batch_size),
       // Caching behavior related.
       initialize_after_startup{initialize_after_startup},
+      negative_cache_capacity{negative_cache_capacity},
+      negative_cache_ttl_ms{negative_cache_ttl_ms},
       // Real-time update mechanism related.
       update_filters(update_filters) {}
 
@@ -422,6 +433,13 @@ void parameter_server_config::init(const std::string& hps_json_config_file) {
     params.max_batch_size =
         get_value_from_json_soft(persistent_db, "max_batch_size", params.max_batch_size);
 
+    // Caching behavior related.
+    params.negative_cache_capacity = get_value_from_json_soft(
+        persistent_db, "negative_cache_capacity", params.negative_cache_capacity);
+    params.negative_cache_ttl_ms = get_value_from_json_soft(persistent_db, "negative_cache_ttl_ms",
+                                                            params.negative_cache_ttl_ms);
+
+    // Real-time update mechanism related.
     if (persistent_db.find("update_filters") != persistent_db.end()) {
       params.update_filters.clear();
       auto update_filters = get_json(persistent_db, "update_filters");
@@ -481,6 +499,10 @@ void parameter_server_config::init(const std::string& hps_json_config_file) {
         get_hps_overflow_policy(volatile_db, "overflow_policy", params.overflow_policy);
     params.overflow_resolution_target = get_value_from_json_soft(
         volatile_db, "overflow_resolution_target", params.overflow_resolution_target);
+    params.background_overflow_resolution = get_value_from_json_soft(
+        volatile_db, "background_overflow_resolution", params.background_overflow_resolution);
+    params.overflow_soft_watermark = get_value_from_json_soft(
+        volatile_db, "overflow_soft_watermark", params.overflow_soft_watermark);
 
     // Caching behavior related.
     params.initial_cache_rate =
@@ -989,6 +1011,27 @@ DatabaseOverflowPolicy_t get_hps_overflow_policy(const nlohmann::json& json, con
       return enum_value;
     }
 
+  enum_value = DatabaseOverflowPolicy_t::EvictSampledLeastUsed;
+  names = {hctr_enum_to_c_str(enum_value), "sampled_least_used"};
+  for (const char* name : names)
+    if (tmp == name) {
+      return enum_value;
+    }
+
+  enum_value = DatabaseOverflowPolicy_t::EvictSampledOldest;
+  names = {hctr_enum_to_c_str(enum_value), "sampled_oldest"};
+  for (const char* name : names)
+    if (tmp == name) {
+      return enum_value;
+    }
+
+  enum_value = DatabaseOverflowPolicy_t::EvictClock;
+  names = {hctr_enum_to_c_str(enum_value), "clock"};
+  for (const char* name : names)
+    if (tmp == name) {
+      return enum_value;
+    }
+
   return default_value;
 }
 
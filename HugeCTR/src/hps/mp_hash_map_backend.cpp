@@ -767,6 +767,95 @@ size_t MultiProcessHashMapBackend<Key>::resolve_overflow_(const std::string& tab
         }
       }
     } break;
+
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictSampledOldest: {
+      const bool least_used{part.overflow_policy ==
+                            DatabaseOverflowPolicy_t::EvictSampledLeastUsed};
+
+      // Instead of sorting the entire partition, we draw `overflow_sample_factor_` random
+      // candidates per entry to evict, and evict the least used / oldest among them. The flat map
+      // is random-access. Hence, selecting the victims costs time proportional to their number.
+      std::random_device rd;
+      std::default_random_engine gen(rd());
+      std::vector<std::pair<Key, uint64_t>> keys_metas;
+
+      while (part.entries.size() > this->overflow_resolution_margin_) {
+        const size_t batch_size{
+            std::min(part.entries.size() - this->overflow_resolution_margin_, max_batch_size)};
+        const size_t num_samples{
+            std::min(batch_size * this->overflow_sample_factor_, part.entries.size())};
+
+        HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+                   " is overflowing (size = ", part.entries.size(), " > ", part.overflow_margin,
+                   "): Attempting to evict ", batch_size,
+                   least_used ? " SAMPLED LEAST USED" : " SAMPLED OLDEST", " key/value pairs!\n");
+
+        keys_metas.clear();
+        keys_metas.reserve(num_samples);
+        std::uniform_int_distribution<size_t> index_dist(0, part.entries.size() - 1);
+        while (keys_metas.size() != num_samples) {
+          auto& entry{*(part.entries.begin() + static_cast<ptrdiff_t>(index_dist(gen)))};
+          Payload& payload{entry.second};
+          if (least_used) {
+            keys_metas.emplace_back(entry.first, payload.access_count);
+            // Halve the access count of each inspected entry to let stale popularity decay.
+            payload.access_count /= 2;
+          } else {
+            keys_metas.emplace_back(entry.first, static_cast<uint64_t>(payload.last_access));
+          }
+        }
+
+        // Evict the `batch_size` least used / oldest samples. Duplicate samples are skipped by the
+        // eviction, and the next batch makes up for them.
+        std::nth_element(keys_metas.begin(), keys_metas.begin() + batch_size, keys_metas.end(),
+                         [](const auto& km0, const auto& km1) { return km0.second < km1.second; });
+        for (auto km_it{keys_metas.begin()}; km_it != keys_metas.begin() + batch_size; ++km_it) {
+          const Key* const k{&km_it->first};
+          HCTR_HPS_HASH_MAP_EVICT_K_();
+        }
+      }
+    } break;
+
+    case DatabaseOverflowPolicy_t::EvictClock: {
+      // Sweep a clock hand across the flat map. Entries that were accessed since the hand passed
+      // them last get a second chance, all others are evicted. Each sweep is limited to a single
+      // revolution. Since that clears all reference bits, the next sweep is guaranteed to evict.
+      std::vector<Key> keys;
+
+      while (part.entries.size() > this->overflow_resolution_margin_) {
+        const size_t batch_size{
+            std::min(part.entries.size() - this->overflow_resolution_margin_, max_batch_size)};
+
+        HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Partition ", table_name, '/', part_index,
+                   " is overflowing (size = ", part.entries.size(), " > ", part.overflow_margin,
+                   "): Attempting to evict ", batch_size, " CLOCK key/value pairs!\n");
+
+        keys.clear();
+        auto it{part.entries.lower_bound(part.eviction_cursor)};
+        if (it == part.entries.end()) {
+          it = part.entries.begin();
+        }
+        for (size_t n{part.entries.size()}; n != 0 && keys.size() != batch_size; --n) {
+          Payload& payload{it->second};
+          if (payload.access_count) {
+            payload.access_count = 0;
+          } else {
+            keys.emplace_back(it->first);
+          }
+
+          if (++it == part.entries.end()) {
+            it = part.entries.begin();
+          }
+        }
+        part.eviction_cursor = it->first;
+
+        for (const Key& key : keys) {
+          const Key* const k{&key};
+          HCTR_HPS_HASH_MAP_EVICT_K_();
+        }
+      }
+    } break;
   }
 
   return num_deletions;
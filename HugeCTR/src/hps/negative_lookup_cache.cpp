@@ -0,0 +1,166 @@
+/*
+ * Copyright (c) 2023, NVIDIA CORPORATION.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#include <algorithm>
+#include <hps/negative_lookup_cache.hpp>
+#include <mutex>
+
+namespace HugeCTR {
+
+template <typename Key>
+NegativeLookupCache<Key>::NegativeLookupCache(const size_t capacity,
+                                              const std::chrono::milliseconds ttl,
+                                              clock_function clock)
+    : capacity_{capacity}, ttl_{ttl}, clock_{std::move(clock)} {
+  HCTR_CHECK_HINT(capacity_ > 0, "Negative lookup cache capacity must be positive!");
+}
+
+template <typename Key>
+size_t NegativeLookupCache<Key>::size(const std::string& table_name) const {
+  const std::shared_lock lock(guard_);
+
+  const auto tables_it{tables_.find(table_name)};
+  return tables_it != tables_.end() ? tables_it->second.entries.size() : 0;
+}
+
+template <typename Key>
+uint64_t NegativeLookupCache<Key>::generation(const std::string& table_name) const {
+  const std::shared_lock lock(guard_);
+
+  const auto tables_it{tables_.find(table_name)};
+  return tables_it != tables_.end() ? tables_it->second.generation.load() : 0;
+}
+
+template <typename Key>
+size_t NegativeLookupCache<Key>::filter(const std::string& table_name, std::vector<size_t>& indices,
+                                        const Key* const keys,
+                                        const DatabaseMissCallback& on_hit) const {
+  const size_t num_indices{indices.size()};
+  {
+    const std::shared_lock lock(guard_);
+
+    const auto tables_it{tables_.find(table_name)};
+    if (tables_it != tables_.end() && !tables_it->second.entries.empty()) {
+      const auto& entries{tables_it->second.entries};
+      const clock_type::time_point now{clock_()};
+
+      indices.erase(std::remove_if(indices.begin(), indices.end(),
+                                   [&](const size_t index) {
+                                     const auto it{entries.find(keys[index])};
+                                     if (it == entries.end() || it->second <= now) {
+                                       return false;
+                                     }
+                                     on_hit(index);
+                                     return true;
+                                   }),
+                    indices.end());
+    }
+  }
+
+  const size_t hit_count{num_indices - indices.size()};
+  num_hits_ += hit_count;
+  num_misses_ += indices.size();
+  return hit_count;
+}
+
+template <typename Key>
+void NegativeLookupCache<Key>::insert(const std::string& table_name, const uint64_t generation,
+                                      const size_t num_indices, const size_t* const indices,
+                                      const Key* const keys) {
+  if (!num_indices) {
+    return;
+  }
+
+  const std::unique_lock lock(guard_);
+
+  // Some of the keys might have been inserted into the database meanwhile.
+  Table& table{tables_[table_name]};
+  if (table.generation != generation) {
+    return;
+  }
+
+  const clock_type::time_point now{clock_()};
+  const clock_type::time_point expiry{now + ttl_};
+
+  for (size_t i{}; i != num_indices; ++i) {
+    const Key& key{keys[indices[i]]};
+
+    // If full, make room by dropping expired entries. Without expired entries, only refresh keys.
+    if (table.entries.size() >= capacity_ && table.entries.find(key) == table.entries.end()) {
+      if (now < table.next_purge) {
+        continue;
+      }
+
+      table.next_purge = expiry;
+      for (auto it{table.entries.begin()}; it != table.entries.end();) {
+        if (it->second <= now) {
+          table.entries.erase(it++);
+        } else {
+          table.next_purge = std::min(table.next_purge, it->second);
+          ++it;
+        }
+      }
+      if (table.entries.size() >= capacity_) {
+        continue;
+      }
+    }
+    table.entries.insert_or_assign(key, expiry);
+  }
+}
+
+template <typename Key>
+void NegativeLookupCache<Key>::erase(const std::string& table_name, const size_t num_keys,
+                                     const Key* const keys) {
+  // Avoid blocking lookups if there is nothing to forget.
+  {
+    const std::shared_lock lock(guard_);
+
+    const auto tables_it{tables_.find(table_name)};
+    if (tables_it != tables_.end()) {
+      Table& table{tables_it->second};
+      ++table.generation;
+      if (table.entries.empty()) {
+        return;
+      }
+    }
+  }
+
+  const std::unique_lock lock(guard_);
+
+  Table& table{tables_[table_name]};
+  ++table.generation;
+  for (size_t i{}; i != num_keys; ++i) {
+    table.entries.erase(keys[i]);
+  }
+}
+
+template <typename Key>
+void NegativeLookupCache<Key>::clear(const std::vector<std::string>& table_names) {
+  const std::unique_lock lock(guard_);
+
+  // Keep the tables, so that the generation still advances.
+  for (const std::string& table_name : table_names) {
+    Table& table{tables_[table_name]};
+    table.entries = {};
+    table.next_purge = {};
+    ++table.generation;
+  }
+}
+
+template class NegativeLookupCache<unsigned int>;
+template class NegativeLookupCache<long long>;
+
+}  // namespace HugeCTR
@@ -77,6 +77,18 @@ RedisClusterBackend<Key>::RedisClusterBackend(const RedisClusterBackendParams& p
   HCTR_CHECK(params.num_node_connections > 0);
   HCTR_CHECK(params.num_partitions >= params.num_node_connections);
 
+  switch (params.overflow_policy) {
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictSampledOldest:
+    case DatabaseOverflowPolicy_t::EvictClock:
+      HCTR_LOG_C(WARNING, WORLD, get_name(), ": Overflow policy '",
+                 hctr_enum_to_c_str(params.overflow_policy),
+                 "' is not supported. Falling back to exact least used / oldest eviction.\n");
+      break;
+    default:
+      break;
+  }
+
   // Put together cluster configuration.
   sw::redis::ConnectionOptions options;
 
@@ -853,7 +865,9 @@ void RedisClusterBackend<Key>::resolve_overflow_(const std::string& table_name,
       }
     } break;
 
-    case DatabaseOverflowPolicy_t::EvictLeastUsed: {
+    case DatabaseOverflowPolicy_t::EvictLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictClock: {
       // Fetch keys and parse all metadata.
       std::vector<std::pair<Key, long long>> keys_metas;
       keys_metas.reserve(part_size);
@@ -913,7 +927,8 @@ void RedisClusterBackend<Key>::resolve_overflow_(const std::string& table_name,
       }
     } break;
 
-    case DatabaseOverflowPolicy_t::EvictOldest: {
+    case DatabaseOverflowPolicy_t::EvictOldest:
+    case DatabaseOverflowPolicy_t::EvictSampledOldest: {
       // Fetch keys and metadata.
       std::vector<std::pair<Key, time_t>> keys_metas;
       keys_metas.reserve(part_size);
@@ -1056,13 +1071,16 @@ void RedisClusterBackend<Key>::queue_metadata_refresh_(const std::string& table_
     case DatabaseOverflowPolicy_t::EvictRandom: {
     } break;
 
-    case DatabaseOverflowPolicy_t::EvictLeastUsed: {
+    case DatabaseOverflowPolicy_t::EvictLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictSampledLeastUsed:
+    case DatabaseOverflowPolicy_t::EvictClock: {
       background_worker_.submit([this, table_name, part_index, keys]() {
         refresh_metadata_lfu_inc_(table_name, part_index, *keys, 1);
       });
     } break;
 
-    case DatabaseOverflowPolicy_t::EvictOldest: {
+    case DatabaseOverflowPolicy_t::EvictOldest:
+    case DatabaseOverflowPolicy_t::EvictSampledOldest: {
       const time_t now{std::time(nullptr)};
       background_worker_.submit([this, table_name, part_index, keys, now]() {
         refresh_metadata_lru_(table_name, part_index, *keys, now);
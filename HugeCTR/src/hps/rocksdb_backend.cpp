@@ -341,7 +341,10 @@ size_t RocksDBBackend<Key>::evict(const std::string& table_name) {
   // Drop the entire table form the database.
   HCTR_ROCKSDB_CHECK(db_->DropColumnFamily(ch));
   HCTR_ROCKSDB_CHECK(db_->DestroyColumnFamilyHandle(ch));
-  column_handles_.erase(table_name);
+  {
+    const std::unique_lock lock(column_handles_guard_);
+    column_handles_.erase(table_name);
+  }
 
   HCTR_LOG_C(TRACE, WORLD, get_name(), " backend; Table ", table_name, ": Erased ", num_entries,
              " entries (approximately).\n");
@@ -388,6 +391,7 @@ std::vector<std::string> RocksDBBackend<Key>::find_tables(const std::string& mod
   const std::string& tag_prefix{HierParameterServerBase::make_tag_name(model_name, "", false)};
 
   std::vector<std::string> table_names;
+  const std::shared_lock lock(column_handles_guard_);
   for (const auto& pair : column_handles_) {
     if (pair.first.find(tag_prefix) == 0) {
       table_names.emplace_back(pair.first);
@@ -0,0 +1,194 @@
+# Copyright (c) 2023, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import ast
+import glob
+import inspect
+import os
+import sys
+import time
+
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from sharding import CostModel, Planner
+
+default_dataset_dir = os.path.join(os.path.dirname(parentdir), "dataset")
+
+
+def load_dataset_info(filename):
+    """
+    Extract the `dataset_info` list of (num_table, hotness, vocabulary_size) from a dataset
+    generation script without executing it.
+    """
+    with open(filename, "r") as f:
+        tree = ast.parse(f.read(), filename)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "dataset_info" for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    return None
+
+
+def expand_dataset_info(dataset_info, replicate):
+    slot_size_array, multi_hot_sizes = [], []
+    for _ in range(replicate):
+        for num_table, hotness, vocabulary_size in dataset_info:
+            slot_size_array += [vocabulary_size] * num_table
+            multi_hot_sizes += [hotness] * num_table
+    return slot_size_array, multi_hot_sizes
+
+
+def run_planner(args, slot_size_array, multi_hot_sizes, use_incremental_cost, search=False):
+    byte_per_elem = 8 if args.optimizer == "adagrad" else 4
+    ev_size_list = np.array([args.ev_size] * len(slot_size_array))
+    is_hier = args.sharding_plan == "hier_auto"
+    mem_capacity = args.memory_cap_for_embedding
+    if is_hier:
+        mem_capacity *= args.num_gpus_per_node
+    cost_model = CostModel(
+        1,
+        args.mem_comm_bw_ratio,
+        args.mem_comm_work_ratio,
+        args.dense_comm_work_ratio,
+        args.batchsize,
+        ev_size_list.astype(np.float64) * byte_per_elem / 1024 / 1024 / 1024,
+        ev_size_list,
+        mem_capacity,
+        slot_size_array,
+        1,
+    )
+    t0 = time.time()
+    planner = Planner(
+        multi_hot_sizes,
+        ev_size_list,
+        args.num_nodes,
+        args.num_gpus_per_node,
+        args.batchsize,
+        is_hier,
+        cost_model,
+        use_column_wise_sharding=args.use_column_wise_shard,
+        use_incremental_cost=use_incremental_cost,
+    )
+    if search:
+        planner.search_plan(
+            beam_width=args.beam_width,
+            num_workers=args.num_workers,
+            time_budget=args.time_budget,
+        )
+    else:
+        planner.plan()
+    return time.time() - t0, planner.list_candidate[0][0]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the planning time of the full and the incremental cost evaluation."
+    )
+    parser.add_argument("--dataset_dir", type=str, default=default_dataset_dir)
+    parser.add_argument(
+        "--datasets",
+        help="Comma separated dataset names, all the dataset/*.py layouts are used by default",
+        type=str,
+        default="",
+    )
+    parser.add_argument(
+        "--replicate",
+        help="Replicate the tables of each layout to benchmark larger models",
+        type=int,
+        default=1,
+    )
+    parser.add_argument("--num_nodes", type=int, default=8)
+    parser.add_argument("--num_gpus_per_node", type=int, default=8)
+    parser.add_argument("--batchsize", type=int, default=8192)
+    parser.add_argument("--ev_size", type=int, default=128)
+    parser.add_argument("--optimizer", type=str, choices=["adagrad", "sgd"], default="sgd")
+    parser.add_argument("--mem_comm_bw_ratio", type=float, default=2000 / 25)
+    parser.add_argument("--mem_comm_work_ratio", type=float, default=8 / 2)
+    parser.add_argument("--dense_comm_work_ratio", type=float, default=1.0)
+    parser.add_argument("--memory_cap_for_embedding", type=float, default=60)
+    parser.add_argument("--sharding_plan", type=str, choices=["auto", "hier_auto"], default="auto")
+    parser.add_argument("--use_column_wise_shard", action="store_true")
+    parser.add_argument(
+        "--beam_width",
+        help="Also run the search mode of the planner with this beam width",
+        type=int,
+        default=0,
+    )
+    parser.add_argument("--num_workers", type=int, default=None)
+    parser.add_argument("--time_budget", type=float, default=None)
+    parser.add_argument(
+        "--skip_baseline",
+        help="Only run the incremental planner",
+        action="store_true",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.datasets:
+        filenames = [
+            os.path.join(args.dataset_dir, name + ".py") for name in args.datasets.split(",")
+        ]
+    else:
+        filenames = sorted(glob.glob(os.path.join(args.dataset_dir, "*.py")))
+
+    print(
+        "%-28s %8s %12s %12s %10s %16s"
+        % ("dataset", "tables", "full (s)", "incr (s)", "speedup", "max bucket cost")
+    )
+    for filename in filenames:
+        dataset_info = load_dataset_info(filename)
+        if dataset_info is None:
+            continue
+        name = os.path.splitext(os.path.basename(filename))[0]
+        slot_size_array, multi_hot_sizes = expand_dataset_info(dataset_info, args.replicate)
+        try:
+            incremental_time, incremental_cost = run_planner(
+                args, slot_size_array, multi_hot_sizes, True
+            )
+        except Exception as e:
+            print("%-28s %8d %s" % (name, len(slot_size_array), e))
+            continue
+        if args.skip_baseline:
+            full_time, speedup = float("nan"), float("nan")
+        else:
+            full_time, full_cost = run_planner(args, slot_size_array, multi_hot_sizes, False)
+            assert np.isclose(full_cost, incremental_cost), "planners disagree on %s" % name
+            speedup = full_time / incremental_time
+        print(
+            "%-28s %8d %12.3f %12.3f %10.1f %16.1f"
+            % (
+                name,
+                len(slot_size_array),
+                full_time,
+                incremental_time,
+                speedup,
+                incremental_cost,
+            )
+        )
+        if args.beam_width > 0:
+            search_time, search_cost = run_planner(
+                args, slot_size_array, multi_hot_sizes, True, search=True
+            )
+            print(
+                "%-28s %8s %12s %12.3f %10s %16.1f"
+                % ("  search mode", "", "", search_time, "", search_cost)
+            )
@@ -30,6 +30,17 @@ def get_byte_per_elem(args):
     return byte_per_elem
 
 
+def run_planner(planner, args):
+    beam_width = getattr(args, "planner_beam_width", 0)
+    if beam_width > 0:
+        return planner.search_plan(
+            beam_width=beam_width,
+            num_workers=getattr(args, "planner_num_workers", None),
+            time_budget=getattr(args, "planner_time_budget", None),
+        )
+    return planner.plan()
+
+
 def int_to_string(
     shard_matrix_int, shard_strategy_int, unique_table_ids_int, reduction_table_ids_int
 ):
@@ -164,7 +175,7 @@ def generate_plan_ragged_ev_size(
                 log_result=log_result,
                 use_column_wise_sharding=args.use_column_wise_shard,
             )
-            shard_strategy_, shard_matrix_, shard_column_wise_nums_ = planner.plan()
+            shard_strategy_, shard_matrix_, shard_column_wise_nums_ = run_planner(planner, args)
 
         elif sharding_plan == "hier_auto":
             if num_nodes <= 1:
@@ -194,7 +205,9 @@ def generate_plan_ragged_ev_size(
                 log_result=log_result,
                 use_column_wise_sharding=args.use_column_wise_shard,
             )
-            shard_strategy_, shard_matrix_node_, shard_column_wise_nums_ = planner.plan()
+            shard_strategy_, shard_matrix_node_, shard_column_wise_nums_ = run_planner(
+                planner, args
+            )
             shard_matrix_ = []
             for node_shard_matrix in shard_matrix_node_:
                 for i in range(args.num_gpus_per_node):
@@ -12,9 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import logging
 import time
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 
 import numpy as np
 import copy
@@ -92,9 +93,11 @@ class ShardingState:
         self.shard_ll = [[] for i in range(self.num_bucket)]  # N device list
         self.is_hier = is_hier
 
-    def split_hot_shard(self, cost, is_column_wise=False):
+    def split_hot_shard(self, cost, is_column_wise=False, shard_rank=0):
         """
-        split the shard with the largest hotness
+        split the shard with the largest hotness. With shard_rank > 0, the first shard_rank
+        splittable tables are skipped, which lets the search mode explore other split orders.
+        Return whether a table was split.
         """
         # shards are sorted based on the hotness. Find the first hot shard that
         # can be split further
@@ -111,6 +114,8 @@ class ShardingState:
         tmp_embedding_length_cost = tmp_embedding_length_cost[tmp_sorted_idx]
         tmp_table_ids = self.array_table_id[tmp_sorted_idx]
         # print("tmp_table_ids = ",tmp_table_ids," is_column_wise = ",is_column_wise)
+        split = False
+        skipped_table_ids = set()
         for shard_id in range(tmp_table_ids.size):
             table_id = tmp_table_ids[shard_id]
             hotness = self.array_unshard_hotness[table_id]
@@ -120,6 +125,11 @@ class ShardingState:
                 * self.array_num_split[table_id]
             )
             if split_num_pre * 2 <= self.num_bucket:
+                if table_id in skipped_table_ids:
+                    continue
+                if len(skipped_table_ids) < shard_rank:
+                    skipped_table_ids.add(table_id)
+                    continue
                 # if this table can be further split and we can put it into
                 # more buckets
                 idx = np.where(self.array_table_id == table_id)[0]
@@ -157,6 +167,7 @@ class ShardingState:
                     )
                 )
                 # TODO: do we need a flag that means we can know if we already split a table?
+                split = True
                 break
 
         self.array_cost = cost.get_cost_per_lookup(
@@ -170,6 +181,7 @@ class ShardingState:
         self.array_evsizes = self.array_evsizes[sorted_idx]
         # print("final self.array_evsizes = ",self.array_evsizes," self.array_hotness = ",self.array_hotness," self.array_table_id = ",self.array_table_id)
         # print("final self.array_num_split = ",self.array_num_split)
+        return split
 
     def split_oom_shard(self, table_id, cost, is_column_wise=False):
         hotness = self.array_unshard_hotness[table_id]
@@ -361,6 +373,123 @@ class CostModel:
         return hotness_cost + comm_cost
 
 
+class IncrementalCost:
+    """
+    Incremental version of CostModel.get_cost for a single greedy placement pass.
+    The per-table hotness, comm and memory contributions only depend on the split state of
+    the table, which does not change while the shards are placed. They are evaluated once,
+    and the per-bucket costs are kept in arrays that only update the touched bucket on
+    push/pop, so every placement is O(1) instead of O(num_bucket * num_table).
+    """
+
+    def __init__(
+        self,
+        cost_model: CostModel,
+        ss: ShardingState,
+    ) -> None:
+        self.mem_capacity = cost_model.mem_capacity
+        num_table = ss.array_unshard_hotness.size
+        array_num_split = np.array(ss.array_num_split, dtype=np.float64)
+        array_evsizes_update = np.asarray(ss.array_unshard_evsizes_update, dtype=np.float64)
+
+        self.table_hotness_cost = (
+            cost_model.unit_hotness_cost
+            * cost_model.sparse_work_ratio
+            * cost_model.batchsize
+            * ss.array_unshard_hotness
+            * ev_size_compensation(array_evsizes_update)
+            / array_num_split
+        )
+        self.table_comm_cost = (
+            cost_model.band_width_ratio * cost_model.batchsize * array_evsizes_update
+        )
+        if ss.is_hier:
+            self.table_comm_cost = self.table_comm_cost / ss.num_gpus_per_node * 3 / 2
+            self.table_hotness_cost = self.table_hotness_cost / ss.num_gpus_per_node
+        self.table_mem_cost = (
+            np.asarray(cost_model.unit_mem_cost)
+            / (ss.array_unshard_evsizes / array_evsizes_update)
+            * cost_model.array_table_size
+            / array_num_split
+        )
+
+        self.hotness_cost = np.zeros(ss.num_bucket)
+        self.comm_cost = np.zeros(ss.num_bucket)
+        self.mem_cost = np.zeros(ss.num_bucket)
+        self.placed = np.zeros((ss.num_bucket, num_table), dtype=bool)
+        self._saved = None
+
+    def contains(self, bucket_id: int, table_id: int) -> bool:
+        return self.placed[bucket_id, table_id]
+
+    def push(self, bucket_id: int, table_id: int) -> bool:
+        """
+        Add the table to the bucket and return whether the bucket runs out of memory.
+        Only the touched bucket can become OOM, since all the others were accepted before.
+        """
+        self._saved = (
+            self.hotness_cost[bucket_id],
+            self.comm_cost[bucket_id],
+            self.mem_cost[bucket_id],
+        )
+        self.hotness_cost[bucket_id] += self.table_hotness_cost[table_id]
+        self.comm_cost[bucket_id] += self.table_comm_cost[table_id]
+        self.mem_cost[bucket_id] += self.table_mem_cost[table_id]
+        self.placed[bucket_id, table_id] = True
+        return self.mem_cost[bucket_id] > self.mem_capacity
+
+    def pop(self, bucket_id: int, table_id: int) -> None:
+        """
+        Undo the last push. The saved values are restored instead of subtracted to avoid
+        accumulating floating point error.
+        """
+        (
+            self.hotness_cost[bucket_id],
+            self.comm_cost[bucket_id],
+            self.mem_cost[bucket_id],
+        ) = self._saved
+        self.placed[bucket_id, table_id] = False
+
+    def get_cost(self) -> Cost:
+        return Cost(
+            self.hotness_cost + self.comm_cost,
+            self.hotness_cost.copy(),
+            self.comm_cost.copy(),
+            self.mem_cost.copy(),
+        )
+
+
+def _sharding_state_signature(ss: ShardingState):
+    return (tuple(ss.array_num_split), tuple(ss.array_unshard_evsizes_update))
+
+
+_search_worker_planner = None
+
+
+def _init_search_worker(planner):
+    global _search_worker_planner
+    _search_worker_planner = planner
+
+
+def _expand_sharding_state(ss, oom_table_id, shard_rank, is_column_wise):
+    """
+    Apply one split action to a sharding state and re-run the greedy placement on it. Run in
+    the worker processes of Planner.search_plan, the state is a private copy of the worker.
+    """
+    planner = _search_worker_planner
+    if oom_table_id is None:
+        split = ss.split_hot_shard(
+            cost=planner.cost_model, is_column_wise=is_column_wise, shard_rank=shard_rank
+        )
+    else:
+        split = ss.split_oom_shard(
+            oom_table_id, cost=planner.cost_model, is_column_wise=is_column_wise
+        )
+    if not split:
+        return None
+    return planner.greedy_plan(ss)
+
+
 class Planner:
     """
     The planner work out a series of plans iteratively.
@@ -383,6 +512,7 @@ class Planner:
         max_search_iter: int = 20,
         use_column_wise_sharding: bool = False,
         log_result: bool = False,
+        use_incremental_cost: bool = True,
     ) -> None:
         self.array_hotness = np.array(list_hotness)
         self.ev_sizes = np.array(ev_sizes)
@@ -398,6 +528,7 @@ class Planner:
         self.list_candidate = []
         self.max_search_iter = max_search_iter
         self.log_result = log_result
+        self.use_incremental_cost = use_incremental_cost
 
         # Create the default sharding plan. Throw if even this default sharding plan cannot fit, as
         # it should be the most memory-efficient
@@ -454,6 +585,9 @@ class Planner:
         This is a heuristic based on greedy policy. The shard is placed to the bucket with the
         lowest hotness cost
         """
+        if self.use_incremental_cost:
+            return self.greedy_plan_incremental(ss)
+
         array_cost = np.zeros(ss.num_bucket)
 
         ss.reset_shard_ll()
@@ -481,8 +615,52 @@ class Planner:
                 return ss.array_table_id[i], ss, cost
         return None, ss, cost
 
+    def greedy_plan_incremental(self, ss):
+        """
+        Same placement policy as greedy_plan, but the bucket costs are updated incrementally
+        by IncrementalCost instead of being recomputed from scratch after every push.
+        """
+        incremental_cost = IncrementalCost(self.cost_model, ss)
+        array_cost = np.zeros(ss.num_bucket)
+
+        ss.reset_shard_ll()
+
+        cost = incremental_cost.get_cost()
+        for i in range(ss.array_cost.size):  # mp table num
+            table_id = ss.array_table_id[i]
+            sorted_idx = np.argsort(array_cost)
+            sharded = False
+            for bucket_id in sorted_idx:
+                if not incremental_cost.contains(bucket_id, table_id):
+                    # for now, only uniform sharding is supported. Hence cannot put two shards
+                    # from the same table into the same bucket
+                    oom = incremental_cost.push(bucket_id, table_id)
+                    if not oom:
+                        ss.push_bucket(bucket_id, table_id)
+                        sharded = True
+                        array_cost[bucket_id] = (
+                            incremental_cost.hotness_cost[bucket_id]
+                            + incremental_cost.comm_cost[bucket_id]
+                        )
+                        break
+                    else:
+                        # Current bucket cannot fit. Iterate to the next best bucket
+                        cost = incremental_cost.get_cost()
+                        incremental_cost.pop(bucket_id, table_id)
+            if not sharded:
+                # This means the shard is too large to fit within any bucket
+                return table_id, ss, cost
+        return None, ss, incremental_cost.get_cost()
+
     def plan(self):
         t0 = time.time()
+        self.plan_single_trajectory()
+        return self.get_best_plan(t0)
+
+    def plan_single_trajectory(self):
+        """
+        Follow a single greedy trajectory and collect its feasible plans in list_candidate.
+        """
         for i in range(self.max_search_iter):
             oom_table_id, self.sharding_state, cost = self.greedy_plan(self.sharding_state)
 
@@ -597,6 +775,112 @@ class Planner:
                 if not oom_table_can_split:
                     break
 
+    def search_plan(
+        self,
+        beam_width: int = 4,
+        num_split_candidates: int = 2,
+        num_workers: int = None,
+        time_budget: float = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Search mode of the planner. Instead of following a single greedy trajectory, keep the
+        beam_width best sharding states and expand each of them with several split actions per
+        iteration: split one of the num_split_candidates hottest splittable tables, row-wise or
+        column-wise (only when column-wise sharding is enabled). The expanded states are
+        evaluated by greedy_plan in a process pool. The search stops after max_search_iter
+        iterations or once time_budget seconds of clock are spent, and returns the best plan found
+        in the same format as plan(). The candidates of the single greedy trajectory of plan() are
+        always included. The number of completed iterations is kept in num_search_rounds.
+        """
+        t0 = time.time()
+        deadline = None if time_budget is None else clock() + time_budget
+        split_directions = [False, True] if self.use_column_wise_sharding else [False]
+
+        # the single greedy trajectory is cheap, it seeds the candidates so that the search
+        # never returns a worse plan than plan()
+        initial_state = copy.deepcopy(self.sharding_state)
+        self.plan_single_trajectory()
+        self.sharding_state = initial_state
+
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_search_worker, initargs=(self,)
+        )
+        try:
+            oom_table_id, ss, cost = self.greedy_plan(self.sharding_state)
+            beam = [(oom_table_id, ss, cost)]
+            self._add_search_candidate(oom_table_id, ss, cost)
+            visited = {_sharding_state_signature(ss)}
+
+            self.num_search_rounds = 0
+            for _ in range(self.max_search_iter):
+                if deadline is not None and clock() >= deadline:
+                    break
+                futures = []
+                for oom_table_id, ss, _ in beam:
+                    if oom_table_id is None:
+                        shard_ranks = range(num_split_candidates)
+                    else:
+                        # the table that does not fit has to be split first
+                        shard_ranks = [None]
+                    for shard_rank in shard_ranks:
+                        for is_column_wise in split_directions:
+                            futures.append(
+                                executor.submit(
+                                    _expand_sharding_state,
+                                    ss,
+                                    oom_table_id,
+                                    shard_rank,
+                                    is_column_wise,
+                                )
+                            )
+
+                timeout = None if deadline is None else max(deadline - clock(), 0)
+                done, _ = concurrent.futures.wait(futures, timeout=timeout)
+                self.num_search_rounds += 1
+
+                children = []
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    signature = _sharding_state_signature(result[1])
+                    if signature in visited:
+                        continue
+                    visited.add(signature)
+                    self._add_search_candidate(*result)
+                    children.append(result)
+                if not children:
+                    break
+
+                # states that fit in memory first, then the ones with the lowest max bucket cost
+                children.sort(key=lambda x: (x[0] is not None, x[2].cost.max()))
+                beam = children[:beam_width]
+        finally:
+            # do not wait for the expansions that are still running once the budget is spent
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.log_result:
+            logging.info(
+                "Search mode explored %d states in %d iterations"
+                % (len(visited), self.num_search_rounds)
+            )
+        return self.get_best_plan(t0)
+
+    def _add_search_candidate(self, oom_table_id, ss, cost):
+        if oom_table_id is None:
+            self.list_candidate.append(
+                (
+                    cost.cost.max(),
+                    cost.hotness_cost,
+                    cost.comm_cost,
+                    cost.mem_cost,
+                    ss.get_column_wise_sharding_nums(),
+                    ss.shard_ll,
+                )
+            )
+
+    def get_best_plan(self, t0):
         self.list_candidate.sort(key=lambda x: x[0])
 
         sparse_cost = self.list_candidate[0][0]
@@ -5,7 +5,6 @@ import unittest
 from itertools import chain
 import numpy as np
 
-
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
@@ -421,6 +420,119 @@ class TestShardingPlanner(unittest.TestCase):
         )
         sanity_check(shard_matrix, shard_strategy)
 
+    def test_incremental_cost_matches_full_cost(self):
+        print("######################incremental cost evaluation")
+        band_width_ratio = 72
+        sparse_work_ratio = 4
+        dense_work_ratio = 4
+        batchsize = 2048
+        mem_cost = ev_sizes * 8 * 1e-9
+
+        for num_nodes, is_hier, mem_capacity in [(1, False, 60), (2, False, 60), (4, True, 480)]:
+            for use_column_wise_sharding in [False, True]:
+                plans = []
+                for use_incremental_cost in [False, True]:
+                    cost_model = CostModel(
+                        1,
+                        band_width_ratio,
+                        sparse_work_ratio,
+                        dense_work_ratio,
+                        batchsize,
+                        mem_cost,
+                        ev_sizes,
+                        mem_capacity,
+                        list_table_size,
+                        1,
+                    )
+                    planner = Planner(
+                        list_hotness,
+                        ev_sizes,
+                        num_nodes,
+                        8,
+                        batchsize,
+                        is_hier,
+                        cost_model,
+                        use_column_wise_sharding=use_column_wise_sharding,
+                        use_incremental_cost=use_incremental_cost,
+                    )
+                    plans.append(planner.plan())
+                full_plan, incremental_plan = plans
+                sanity_check(incremental_plan[1], incremental_plan[0])
+                self.assertEqual(full_plan[0], incremental_plan[0])
+                self.assertEqual(full_plan[1], incremental_plan[1])
+                np.testing.assert_array_equal(full_plan[2], incremental_plan[2])
+
+    def test_search_mode(self):
+        print("######################search mode")
+        band_width_ratio = 72
+        sparse_work_ratio = 4
+        dense_work_ratio = 4
+        batchsize = 2048
+        mem_cost = ev_sizes * 8 * 1e-9
+
+        for use_column_wise_sharding in [False, True]:
+            max_costs = []
+            for search in [False, True]:
+                cost_model = CostModel(
+                    1,
+                    band_width_ratio,
+                    sparse_work_ratio,
+                    dense_work_ratio,
+                    batchsize,
+                    mem_cost,
+                    ev_sizes,
+                    60,
+                    list_table_size,
+                    1,
+                )
+                planner = Planner(
+                    list_hotness,
+                    ev_sizes,
+                    2,
+                    8,
+                    batchsize,
+                    False,
+                    cost_model,
+                    use_column_wise_sharding=use_column_wise_sharding,
+                )
+                if search:
+                    shard_strategy, shard_matrix, shard_column_wise_num = planner.search_plan(
+                        beam_width=4, num_workers=2, time_budget=60
+                    )
+                else:
+                    shard_strategy, shard_matrix, shard_column_wise_num = planner.plan()
+                sanity_check(shard_matrix, shard_strategy)
+                max_costs.append(planner.list_candidate[0][0])
+            # the search mode always contains the single greedy trajectory
+            self.assertLessEqual(max_costs[1], max_costs[0])
+
+    def test_search_mode_time_budget(self):
+        print("######################search mode time budget")
+        mem_cost = ev_sizes * 8 * 1e-9
+        cost_model = CostModel(1, 72, 4, 4, 2048, mem_cost, ev_sizes, 480, list_table_size, 1)
+        planner = Planner(
+            list_hotness,
+            ev_sizes,
+            4,
+            8,
+            2048,
+            True,
+            cost_model,
+            use_column_wise_sharding=True,
+        )
+        # without a budget, this search takes tens of seconds. The clock stands still for the
+        # first iteration and then jumps past the budget, whatever the load of the machine is.
+        readings = iter([0.0, 0.0, 0.0])
+        shard_strategy, shard_matrix, _ = planner.search_plan(
+            beam_width=64,
+            num_split_candidates=8,
+            num_workers=2,
+            time_budget=0.5,
+            clock=lambda: next(readings, float("inf")),
+        )
+        sanity_check(shard_matrix, shard_strategy)
+        self.assertEqual(planner.num_search_rounds, 1)
+
     def test_oom_throw(self):
         # test throw from an OOM case
         print("######################oom raise error")
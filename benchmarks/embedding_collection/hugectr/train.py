@@ -286,6 +286,24 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
         "--use_column_wise_shard",
         action="store_true",
     )
+    parser.add_argument(
+        "--planner_beam_width",
+        help="Beam width of the planner search mode, 0 follows a single greedy trajectory",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--planner_num_workers",
+        help="Number of processes used by the planner search mode, default to the number of CPUs",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--planner_time_budget",
+        help="Time budget of the planner search mode in seconds",
+        type=float,
+        default=None,
+    )
 
     args = parser.parse_args(argv)
     num_table_list = args.num_table.strip().split(",")
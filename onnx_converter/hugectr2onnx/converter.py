@@ -27,6 +27,9 @@ def convert(
     sparse_models=None,
     ntp_file=None,
     graph_name="hugectr",
+    compact_key_mapping=False,
+    use_external_data=False,
+    num_threads=None,
 ):
     """Convert a HugeCTR model to an ONNX model
     Args:
@@ -37,9 +40,22 @@ def convert(
         sparse_models: the files of the sparse embeddings for the HugeCTR model (optional)
         ntp_file: the file of the non-trainable parameters for the HugeCTR model (optional)
         graph_name: the graph name for the ONNX model (optional)
+        compact_key_mapping: whether to map keys with the sorted unique keys of each embedding table
+                             instead of a dense key to indice hash of all tables, the keys are
+                             stored inline and must fit in the 2GB protobuf limit (optional)
+        use_external_data: whether to store large weights as ONNX external data files next to the
+                           ONNX model (optional)
+        num_threads: the number of threads writing the external data files (optional)
     """
-    loader = HugeCTRLoader(graph_config, dense_model, convert_embedding, sparse_models, ntp_file)
-    builder = GraphBuilder(convert_embedding)
+    loader = HugeCTRLoader(
+        graph_config, dense_model, convert_embedding, sparse_models, ntp_file, compact_key_mapping
+    )
+    builder = GraphBuilder(
+        convert_embedding,
+        compact_key_mapping,
+        use_external_data=use_external_data,
+        num_threads=num_threads,
+    )
     for _ in range(loader.layers):
         layer_params, weights_dict, dimensions = loader.load_layer()
         print(f"[HUGECTR2ONNX][INFO]: Converting {layer_params.layer_type} layer to ONNX")
@@ -67,6 +83,22 @@ if __name__ == "__main__":
     parser.add_argument(
         "--graph_name", type=str, default="hugectr", help="Graph name for the ONNX model (optional)"
     )
+    parser.add_argument(
+        "--compact_key_mapping",
+        action="store_true",
+        help="Map keys with the sorted unique keys of each embedding table (optional)",
+    )
+    parser.add_argument(
+        "--use_external_data",
+        action="store_true",
+        help="Store large weights as ONNX external data files (optional)",
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=None,
+        help="Number of threads writing the external data files (optional)",
+    )
     args = parser.parse_args()
     print(args)
     convert(
@@ -77,4 +109,7 @@ if __name__ == "__main__":
         args.sparse_models,
         args.ntp_file,
         args.graph_name,
+        args.compact_key_mapping,
+        args.use_external_data,
+        args.num_threads,
     )
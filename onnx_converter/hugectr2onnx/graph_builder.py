@@ -16,23 +16,98 @@
 
 from onnx import AttributeProto, TensorProto, GraphProto, helper, numpy_helper
 from hugectr2onnx.hugectr_loader import HugeCTRLoader, LayerParams
+import concurrent.futures
 import numpy as np
 import onnx
+import os
+
+# The serialized ModelProto, without its external data, can not exceed 2GB
+PROTOBUF_SIZE_LIMIT = 2**31 - 1
+
+
+def varint_nbytes(array):
+    """Number of bytes of the int64 values of array in a repeated (unpacked) protobuf field"""
+    array = np.asarray(array, dtype=np.int64)
+    # 1 byte tag per value, negative values take 10 bytes, the others 1 byte per started 7 bits
+    nbytes = np.where(array < 0, 11, 2)
+    for bits in range(7, 63, 7):
+        nbytes += (array >= (1 << bits)).astype(nbytes.dtype)
+    return int(nbytes.sum())
 
 
 class GraphBuilder(object):
-    def __init__(self, convert_embedding):
+    def __init__(
+        self,
+        convert_embedding,
+        compact_key_mapping=False,
+        use_external_data=False,
+        external_data_threshold=1024,
+        num_threads=None,
+    ):
         """Create GraphBuilder
         Args:
             convert_embedding: boolean, whether converting sparse embedding models to ONNX
+            compact_key_mapping: boolean, whether mapping keys to indices with a LabelEncoder
+                node over the sorted unique keys of each embedding table instead of a dense
+                key to indice hash of all tables. The keys are node attributes, which can not be
+                stored as external data, so all key mappings together must stay below 2GB
+            use_external_data: boolean, whether storing large initializers as ONNX external data,
+                i.e., one raw binary file per tensor next to the ONNX model
+            external_data_threshold: int, initializers of at least this many bytes are stored as
+                external data
+            num_threads: int, number of threads writing the external data files
         """
         self.__convert_embeddding = convert_embedding
+        self.__compact_key_mapping = compact_key_mapping
+        self.__use_external_data = use_external_data
+        self.__external_data_threshold = external_data_threshold
+        self.__num_threads = num_threads
+        self.__external_data = []
+        self.__key_mapping_nbytes = 0
         self.__nodes = []
         self.__initializers = []
         self.__inputs = []
         self.__outputs = []
         self.__counter = 0
 
+    def __make_initializer(self, name, array):
+        """Create the TensorProto of an initializer
+        Args:
+            name: initializer name
+            array: np.ndarray, initializer value
+        """
+        array = np.ascontiguousarray(array)
+        if not self.__use_external_data or array.nbytes < self.__external_data_threshold:
+            return numpy_helper.from_array(array, name)
+        # Only the metadata is kept in the graph, the array is written by save_model
+        tensor = TensorProto()
+        tensor.name = name
+        tensor.data_type = onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[array.dtype]
+        tensor.dims.extend(array.shape)
+        # sanitized names may collide, e.g., "a/b" and "a:b", hence the unique index suffix
+        location = "{}_{}.data".format(
+            "".join(c if c.isalnum() or c in "._-" else "_" for c in name),
+            len(self.__external_data),
+        )
+        tensor.data_location = TensorProto.EXTERNAL
+        for key, value in [("location", location), ("offset", "0"), ("length", str(array.nbytes))]:
+            entry = tensor.external_data.add()
+            entry.key = key
+            entry.value = value
+        self.__external_data.append((location, array))
+        return tensor
+
+    def __save_external_data(self, model_dir):
+        def write(location, array):
+            array.tofile(os.path.join(model_dir, location))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.__num_threads) as executor:
+            futures = [
+                executor.submit(write, location, array) for location, array in self.__external_data
+            ]
+            for future in futures:
+                future.result()
+
     def add_layer(self, layer_params, weights_dict, dimensions):
         """Add layer to ONNX graph, one layer may consist of multiple ONNX nodes
         Args:
@@ -73,19 +148,15 @@ class GraphBuilder(object):
                         )
                     )
 
-            self.__key_to_indice_hash_all_tables = weights_dict["key_to_indice_hash_all_tables"]
-            key_to_indice_hash_all_tables = weights_dict["key_to_indice_hash_all_tables"]
-            key_to_indice_hash_all_tables_name = "key_to_indice_hash_all_tables"
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=key_to_indice_hash_all_tables_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[
-                        key_to_indice_hash_all_tables.dtype
-                    ],
-                    dims=key_to_indice_hash_all_tables.shape,
-                    vals=key_to_indice_hash_all_tables.flatten(),
+            if not self.__compact_key_mapping:
+                self.__key_to_indice_hash_all_tables = weights_dict["key_to_indice_hash_all_tables"]
+                key_to_indice_hash_all_tables = weights_dict["key_to_indice_hash_all_tables"]
+                key_to_indice_hash_all_tables_name = "key_to_indice_hash_all_tables"
+                self.__initializers.append(
+                    self.__make_initializer(
+                        key_to_indice_hash_all_tables_name, key_to_indice_hash_all_tables
+                    )
                 )
-            )
         elif (
             layer_type == "DistributedSlotSparseEmbeddingHash"
             or layer_type == "LocalizedSlotSparseEmbeddingHash"
@@ -96,21 +167,45 @@ class GraphBuilder(object):
                 indice_name = layer_params.top_names[0] + "_indice"
                 embedding_feature_name = layer_params.top_names[0] + "_embedding_feature"
                 self.__initializers.append(
-                    helper.make_tensor(
-                        name=embedding_table_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[embedding_table.dtype],
-                        dims=embedding_table.shape,
-                        vals=embedding_table.flatten(),
+                    self.__make_initializer(embedding_table_name, embedding_table)
+                )
+                if self.__compact_key_mapping:
+                    # rows of the embedding table are ordered by key, the indice 0 is reserved for
+                    # default values of non-exisiting keys
+                    embedding_keys = weights_dict["embedding_keys"]
+                    embedding_indices = np.arange(1, embedding_keys.size + 1, dtype=np.int64)
+                    self.__key_mapping_nbytes += varint_nbytes(embedding_keys) + varint_nbytes(
+                        embedding_indices
+                    )
+                    if self.__key_mapping_nbytes > PROTOBUF_SIZE_LIMIT:
+                        raise ValueError(
+                            "The LabelEncoder key mappings take {} bytes after adding "
+                            "the {} keys of {}. They are stored inline in the ONNX graph, even "
+                            "with use_external_data, and exceed the 2GB protobuf limit. Please "
+                            "disable compact_key_mapping for this model".format(
+                                self.__key_mapping_nbytes, embedding_keys.size, embedding_table_name
+                            )
+                        )
+                    self.__nodes.append(
+                        helper.make_node(
+                            op_type="LabelEncoder",
+                            inputs=[layer_params.bottom_names[0]],
+                            outputs=[indice_name],
+                            domain="ai.onnx.ml",
+                            keys_int64s=embedding_keys,
+                            values_int64s=embedding_indices,
+                            default_int64=0,
+                        )
                     )
-                )
-                self.__nodes.append(
-                    helper.make_node(
-                        op_type="Gather",
-                        inputs=["key_to_indice_hash_all_tables", layer_params.bottom_names[0]],
-                        outputs=[indice_name],
-                        axis=0,
+                else:
+                    self.__nodes.append(
+                        helper.make_node(
+                            op_type="Gather",
+                            inputs=["key_to_indice_hash_all_tables", layer_params.bottom_names[0]],
+                            outputs=[indice_name],
+                            axis=0,
+                        )
                     )
-                )
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Gather",
@@ -164,37 +259,11 @@ class GraphBuilder(object):
             beta = weights_dict[beta_name]
             running_mean = weights_dict[running_mean_name]
             running_variance = weights_dict[running_variance_name]
+            self.__initializers.append(self.__make_initializer(gamma_name, gamma))
+            self.__initializers.append(self.__make_initializer(beta_name, beta))
+            self.__initializers.append(self.__make_initializer(running_mean_name, running_mean))
             self.__initializers.append(
-                helper.make_tensor(
-                    name=gamma_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[gamma.dtype],
-                    dims=gamma.shape,
-                    vals=gamma.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=beta_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[beta.dtype],
-                    dims=beta.shape,
-                    vals=beta.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=running_mean_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[running_mean.dtype],
-                    dims=running_mean.shape,
-                    vals=running_mean.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=running_variance_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[running_variance.dtype],
-                    dims=running_variance.shape,
-                    vals=running_variance.flatten(),
-                )
+                self.__make_initializer(running_variance_name, running_variance)
             )
             self.__nodes.append(
                 helper.make_node(
@@ -220,22 +289,8 @@ class GraphBuilder(object):
             beta = weights_dict[beta_name]
             # running_mean = weights_dict[running_mean_name]
             # running_variance = weights_dict[running_variance_name]
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=gamma_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[gamma.dtype],
-                    dims=gamma.shape,
-                    vals=gamma.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=beta_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[beta.dtype],
-                    dims=beta.shape,
-                    vals=beta.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(gamma_name, gamma))
+            self.__initializers.append(self.__make_initializer(beta_name, beta))
             self.__nodes.append(
                 helper.make_node(
                     op_type="LayerNormalization",
@@ -296,21 +351,9 @@ class GraphBuilder(object):
 
             maxlen = np.array([layer_params.max_sequence_len], dtype=np.float32)
             maxlen_name = layer_params.top_names[0] + "_maxlen_value"
+            self.__initializers.append(self.__make_initializer(new_shape_name, new_shape))
             self.__initializers.append(
-                helper.make_tensor(
-                    name=new_shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[new_shape.dtype],
-                    dims=new_shape.shape,
-                    vals=new_shape.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=len_expand_shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[new_shape.dtype],
-                    dims=len_expand_shape.shape,
-                    vals=len_expand_shape.flatten(),
-                )
+                self.__make_initializer(len_expand_shape_name, len_expand_shape)
             )
             self.__nodes.append(
                 helper.make_node(
@@ -326,14 +369,7 @@ class GraphBuilder(object):
                     outputs=[input_expand_reshape_name],
                 )
             )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=maxlen_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[maxlen.dtype],
-                    dims=maxlen.shape,
-                    vals=maxlen.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(maxlen_name, maxlen))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Less",
@@ -354,22 +390,8 @@ class GraphBuilder(object):
             sub_name = layer_params.top_names[0] + "_sub"
             scalar_name = layer_params.top_names[0] + "_scalar"
             scalar = np.array([0.5], dtype=np.float32)
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                    dims=shape.shape,
-                    vals=shape.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=scalar_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[scalar.dtype],
-                    dims=scalar.shape,
-                    vals=scalar.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(shape_name, shape))
+            self.__initializers.append(self.__make_initializer(scalar_name, scalar))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Reshape",
@@ -422,22 +444,8 @@ class GraphBuilder(object):
             bias_name = layer_params.top_names[0] + "_bias"
             weight = weights_dict[weight_name]
             bias = weights_dict[bias_name]
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=weight_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[weight.dtype],
-                    dims=weight.shape,
-                    vals=weight.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=bias_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[bias.dtype],
-                    dims=bias.shape,
-                    vals=bias.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(weight_name, weight))
+            self.__initializers.append(self.__make_initializer(bias_name, bias))
             if isinstance(dimensions[layer_params.bottom_names[0]], tuple):
                 dim = dimensions[layer_params.bottom_names[0]]
                 shape_name1 = layer_params.top_names[0] + "_shape1"
@@ -448,22 +456,8 @@ class GraphBuilder(object):
                 reshape_name1 = layer_params.bottom_names[0] + "_reshape_fc1"
                 reshape_name2 = layer_params.top_names[0] + "_reshape_fc2"
 
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=shape_name1,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape1.dtype],
-                        dims=shape1.shape,
-                        vals=shape1.flatten(),
-                    )
-                )
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=shape_name2,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape2.dtype],
-                        dims=shape2.shape,
-                        vals=shape2.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(shape_name1, shape1))
+                self.__initializers.append(self.__make_initializer(shape_name2, shape2))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Reshape",
@@ -500,22 +494,8 @@ class GraphBuilder(object):
             weight = weights_dict[weight_name]
             bias = weights_dict[bias_name]
             gemm_name = layer_params.top_names[0] + "_gemm"
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=weight_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[weight.dtype],
-                    dims=weight.shape,
-                    vals=weight.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=bias_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[bias.dtype],
-                    dims=bias.shape,
-                    vals=bias.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(weight_name, weight))
+            self.__initializers.append(self.__make_initializer(bias_name, bias))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Gemm",
@@ -553,24 +533,10 @@ class GraphBuilder(object):
                     else layer_params.top_names[0]
                 )
 
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=weight_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[weight.dtype],
-                        dims=weight.shape,
-                        vals=weight.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(weight_name, weight))
                 output_name = gemm_name if acts[i] == "Relu" else top_name
                 if biases[i]:
-                    self.__initializers.append(
-                        helper.make_tensor(
-                            name=bias_name,
-                            data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[bias.dtype],
-                            dims=bias.shape,
-                            vals=bias.flatten(),
-                        )
-                    )
+                    self.__initializers.append(self.__make_initializer(bias_name, bias))
                     self.__nodes.append(
                         helper.make_node(
                             op_type="Gemm",
@@ -602,46 +568,11 @@ class GraphBuilder(object):
             ad_starts = np.array([slot_num - 1], dtype=np.int64)
             ad_ends = np.array([slot_num], dtype=np.int64)
             axes = np.array([1], dtype=np.int64)
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=item_starts_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[item_starts.dtype],
-                    dims=item_starts.shape,
-                    vals=item_starts.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=item_ends_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[item_ends.dtype],
-                    dims=item_ends.shape,
-                    vals=item_ends.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=ad_starts_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[ad_starts.dtype],
-                    dims=ad_starts.shape,
-                    vals=ad_starts.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=ad_ends_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[ad_ends.dtype],
-                    dims=ad_ends.shape,
-                    vals=ad_ends.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=axes_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[axes.dtype],
-                    dims=axes.shape,
-                    vals=axes.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(item_starts_name, item_starts))
+            self.__initializers.append(self.__make_initializer(item_ends_name, item_ends))
+            self.__initializers.append(self.__make_initializer(ad_starts_name, ad_starts))
+            self.__initializers.append(self.__make_initializer(ad_ends_name, ad_ends))
+            self.__initializers.append(self.__make_initializer(axes_name, axes))
             for i in range(len(layer_params.bottom_names)):
                 input_tensor_name = layer_params.bottom_names[i]
                 output_fea_num += dimensions[input_tensor_name][1]
@@ -704,14 +635,7 @@ class GraphBuilder(object):
                 if num_input_tensors == 1
                 else last_bottom_tensor_name + "_concat_ad" + str(num_input_tensors - 1)
             )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                    dims=shape.shape,
-                    vals=shape.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(shape_name, shape))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Reshape",
@@ -740,14 +664,7 @@ class GraphBuilder(object):
                 query_reshape = layer_params.bottom_names[0] + "_4d"
                 key_reshape = layer_params.bottom_names[1] + "_4d"
                 value_reshape = layer_params.bottom_names[2] + "_4d"
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=shape_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                        dims=shape.shape,
-                        vals=shape.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(shape_name, shape))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Reshape", inputs=[query_name, shape_name], outputs=[query_reshape]
@@ -827,14 +744,7 @@ class GraphBuilder(object):
                     transpose_name = layer_params.top_names[0] + "_transposed_4d"
                     shape_name = layer_params.top_names[0] + "_3d_shape"
                     shape = np.array([-1, dims[0], dims[1]], dtype=np.int64)
-                    self.__initializers.append(
-                        helper.make_tensor(
-                            name=shape_name,
-                            data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                            dims=shape.shape,
-                            vals=shape.flatten(),
-                        )
-                    )
+                    self.__initializers.append(self.__make_initializer(shape_name, shape))
                     self.__nodes.append(
                         helper.make_node(
                             op_type="MatMul",
@@ -877,30 +787,9 @@ class GraphBuilder(object):
             indices = np.array(indices, dtype=np.int64)
             gather_name = layer_params.top_names[0] + "_gather"
             interaction_name = layer_params.top_names[0] + "_interaction"
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name1,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape1.dtype],
-                    dims=shape1.shape,
-                    vals=shape1.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name2,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape2.dtype],
-                    dims=shape2.shape,
-                    vals=shape2.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=indices_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[indices.dtype],
-                    dims=indices.shape,
-                    vals=indices.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(shape_name1, shape1))
+            self.__initializers.append(self.__make_initializer(shape_name2, shape2))
+            self.__initializers.append(self.__make_initializer(indices_name, indices))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Reshape", inputs=[mlp_name, shape_name1], outputs=[reshape_name1]
@@ -987,22 +876,8 @@ class GraphBuilder(object):
                     if i == layer_params.num_layers - 1
                     else layer_params.top_names[0] + "_multicross" + str(i + 1)
                 )
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=weight_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[weight.dtype],
-                        dims=weight.shape,
-                        vals=weight.flatten(),
-                    )
-                )
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=bias_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[bias.dtype],
-                        dims=bias.shape,
-                        vals=bias.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(weight_name, weight))
+                self.__initializers.append(self.__make_initializer(bias_name, bias))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="MatMul", inputs=[feed_name, weight_name], outputs=[matmul_name]
@@ -1044,22 +919,8 @@ class GraphBuilder(object):
             ps_mul_name = layer_params.top_names[0] + "_ps_mul"
             second_item_tmp_name = layer_params.top_names[0] + "_second_item_tmp"
             second_item_name = layer_params.top_names[0] + "_second_item"
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=epsilon_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[epsilon.dtype],
-                    dims=epsilon.shape,
-                    vals=epsilon.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=alpha_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[alpha.dtype],
-                    dims=alpha.shape,
-                    vals=alpha.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(epsilon_name, epsilon))
+            self.__initializers.append(self.__make_initializer(alpha_name, alpha))
             self.__nodes.append(
                 helper.make_node(
                     op_type="ReduceMean",
@@ -1184,25 +1045,13 @@ class GraphBuilder(object):
                 shape = np.array(
                     [-1, layer_params.reshape_time_step, layer_params.leading_dim], dtype=np.int64
                 )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                    dims=shape.shape,
-                    vals=shape.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(shape_name, shape))
             if layer_params.selected:
                 gather_name = layer_params.top_names[0] + "_gather"
                 selected_slots_name = layer_params.top_names[0] + "_selected_slots"
                 selected_slots = np.array(layer_params.selected_slots, dtype=np.int64)
                 self.__initializers.append(
-                    helper.make_tensor(
-                        name=selected_slots_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[selected_slots.dtype],
-                        dims=selected_slots.shape,
-                        vals=selected_slots.flatten(),
-                    )
+                    self.__make_initializer(selected_slots_name, selected_slots)
                 )
                 self.__nodes.append(
                     helper.make_node(
@@ -1234,14 +1083,7 @@ class GraphBuilder(object):
                 pre_shape_name = layer_params.top_names[0] + "_pre_shape"
                 pre_shape = np.array([-1, 1], dtype=np.int64)
                 reshape_name = layer_params.top_names[0] + "_reshape"
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=pre_shape_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[pre_shape.dtype],
-                        dims=pre_shape.shape,
-                        vals=pre_shape.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(pre_shape_name, pre_shape))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Reshape",
@@ -1271,14 +1113,7 @@ class GraphBuilder(object):
             last_concat_name = layer_params.top_names[0] + "_concat" + str(concat_times - 1)
             shape_name = layer_params.top_names[0] + "_shape"
             shape = np.array([-1, dimensions[layer_params.top_names[0]]], dtype=np.int64)
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape.dtype],
-                    dims=shape.shape,
-                    vals=shape.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(shape_name, shape))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Reshape",
@@ -1304,30 +1139,9 @@ class GraphBuilder(object):
                 starts = np.array([rng[0]], dtype=np.int64)
                 ends = np.array([rng[1]], dtype=np.int64)
                 axes = np.array([-1], dtype=np.int64)
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=starts_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[starts.dtype],
-                        dims=starts.shape,
-                        vals=starts.flatten(),
-                    )
-                )
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=ends_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[ends.dtype],
-                        dims=ends.shape,
-                        vals=ends.flatten(),
-                    )
-                )
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=axes_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[axes.dtype],
-                        dims=axes.shape,
-                        vals=axes.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(starts_name, starts))
+                self.__initializers.append(self.__make_initializer(ends_name, ends))
+                self.__initializers.append(self.__make_initializer(axes_name, axes))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Slice",
@@ -1357,14 +1171,7 @@ class GraphBuilder(object):
                 padding = np.array([-10000.0], dtype=np.float32)
                 padding_name = layer_params.bottom_names[0] + "_padding_val"
                 masked_input_name = layer_params.bottom_names[0] + "_masked_val"
-                self.__initializers.append(
-                    helper.make_tensor(
-                        name=padding_name,
-                        data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[padding.dtype],
-                        dims=padding.shape,
-                        vals=padding.flatten(),
-                    )
-                )
+                self.__initializers.append(self.__make_initializer(padding_name, padding))
                 self.__nodes.append(
                     helper.make_node(
                         op_type="Not",
@@ -1426,38 +1233,10 @@ class GraphBuilder(object):
             shape2 = np.array(
                 [-1, layer_params.weight_dims[0] * layer_params.weight_dims[1]], dtype=np.int64
             )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=weight_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[weight.dtype],
-                    dims=weight.shape,
-                    vals=weight.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=expand_shape_name,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[expand_shape.dtype],
-                    dims=expand_shape.shape,
-                    vals=expand_shape.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name1,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape1.dtype],
-                    dims=shape1.shape,
-                    vals=shape1.flatten(),
-                )
-            )
-            self.__initializers.append(
-                helper.make_tensor(
-                    name=shape_name2,
-                    data_type=onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[shape2.dtype],
-                    dims=shape2.shape,
-                    vals=shape2.flatten(),
-                )
-            )
+            self.__initializers.append(self.__make_initializer(weight_name, weight))
+            self.__initializers.append(self.__make_initializer(expand_shape_name, expand_shape))
+            self.__initializers.append(self.__make_initializer(shape_name1, shape1))
+            self.__initializers.append(self.__make_initializer(shape_name2, shape2))
             self.__nodes.append(
                 helper.make_node(
                     op_type="Flatten",
@@ -1500,11 +1279,15 @@ class GraphBuilder(object):
         self.__counter += 1
 
     def create_graph(self, name="hugectr_graph"):
-        # Finalize key to indice hash
-        key_to_indice_tensor = numpy_helper.from_array(
-            self.__key_to_indice_hash_all_tables, "key_to_indice_hash_all_tables"
-        )
-        self.__initializers[0].CopyFrom(key_to_indice_tensor)
+        # Finalize key to indice hash, the external data is only written by save_model
+        if (
+            not self.__compact_key_mapping
+            and self.__initializers[0].data_location != TensorProto.EXTERNAL
+        ):
+            key_to_indice_tensor = numpy_helper.from_array(
+                self.__key_to_indice_hash_all_tables, "key_to_indice_hash_all_tables"
+            )
+            self.__initializers[0].CopyFrom(key_to_indice_tensor)
         # Create the graph (GraphProto)
         self.__graph_def = helper.make_graph(
             self.__nodes, name, self.__inputs, self.__outputs, self.__initializers
@@ -1514,7 +1297,20 @@ class GraphBuilder(object):
         # Create the model (ModelProto)
         model_def = helper.make_model(self.__graph_def)
         model_def.opset_import[0].version = op_version
+        if self.__compact_key_mapping:
+            model_def.opset_import.append(helper.make_opsetid("ai.onnx.ml", 2))
         model_def.ir_version = ir_version
+        if self.__use_external_data:
+            self.__save_external_data(os.path.dirname(os.path.abspath(model_path)))
+            onnx.save(model_def, model_path)
+            onnx.checker.check_model(model_path)
+            print("[HUGECTR2ONNX][INFO]: The model is checked!")
+            print(
+                "[HUGECTR2ONNX][INFO]: The model is saved at {} with {} external data files".format(
+                    model_path, len(self.__external_data)
+                )
+            )
+            return
         onnx.checker.check_model(model_def)
         print("[HUGECTR2ONNX][INFO]: The model is checked!")
         onnx.save(model_def, model_path)
@@ -15,7 +15,6 @@
 """
 
 import os
-import struct
 import numpy as np
 import json
 
@@ -55,6 +54,9 @@ ONNX_LAYER_TYPES = {
 
 EXEMPTION_LAYER_TYPES = {"Cast", "FusedReshapeConcatGeneral", "GRU", "Gather", "ReLUHalf", "Select"}
 
+# Number of keys read from a sparse model at a time
+SPARSE_MODEL_CHUNK_SIZE = 1 << 20
+
 
 def get_tensor_names(clause):
     if isinstance(clause, list):
@@ -110,9 +112,59 @@ class LayerParams(object):
         self.biases = []
 
 
+class DenseModelReader(object):
+    def __init__(self, dense_model):
+        """Create DenseModelReader, which hands out the weights of the dense model in order
+        Args:
+            dense_model: str, dense model file
+        """
+        self.__dense_model = dense_model
+        self.__size = os.path.getsize(dense_model)
+        self.__offset = 0
+        if self.__size > 0:
+            self.__buffer = np.memmap(dense_model, dtype=np.uint8, mode="r")
+        else:
+            self.__buffer = np.zeros(shape=(0,), dtype=np.uint8)
+
+    @property
+    def offset(self):
+        return self.__offset
+
+    def read(self, shape):
+        """Return a read-only float32 view of the next weight in the dense model
+        Args:
+            shape: tuple, shape of the weight
+        """
+        count = int(np.prod(shape))
+        if self.__offset + count * 4 > self.__size:
+            raise ValueError(
+                "{} is too small: {} bytes requested at offset {} but the file has {} bytes".format(
+                    self.__dense_model, count * 4, self.__offset, self.__size
+                )
+            )
+        weight = np.frombuffer(self.__buffer, dtype="<f4", count=count, offset=self.__offset)
+        self.__offset += count * 4
+        return weight.reshape(shape)
+
+    def check_consumed(self):
+        """Check that all the bytes of the dense model have been read"""
+        if self.__offset != self.__size:
+            raise ValueError(
+                "{} has {} bytes but the model graph only consumes {} bytes".format(
+                    self.__dense_model, self.__size, self.__offset
+                )
+            )
+
+
 class HugeCTRLoader(object):
     def __init__(
-        self, graph_config, dense_model, convert_embedding=False, sparse_models=None, ntp_file=None
+        self,
+        graph_config,
+        dense_model,
+        convert_embedding=False,
+        sparse_models=None,
+        ntp_file=None,
+        compact_key_mapping=False,
     ):
         """Create HugeCTRLoader
         Args:
@@ -121,12 +173,15 @@ class HugeCTRLoader(object):
             convert_embedding: boolean, whether converting sparse embedding models to ONNX
             sparse_models: List[str], sparse model files
             ntp_file: str, file that stores non-trainable parameters
+            compact_key_mapping: boolean, whether loading the sorted unique keys of each
+                embedding table instead of a dense key to indice hash of all tables
         """
         self.__graph_config = graph_config
         self.__dense_model = dense_model
         self.__convert_embeddding = convert_embedding
         self.__sparse_models = sparse_models
         self.__ntp_file = ntp_file
+        self.__compact_key_mapping = compact_key_mapping
         self.__layers_config = json.load(open(graph_config, "rb"))["layers"]
         self.__layers = len(self.__layers_config)
         self.__index = 0
@@ -137,7 +192,7 @@ class HugeCTRLoader(object):
             self.__ntp_config = None
         self.__ntp_counter = 0
         self.__dimensions = {}
-        self.__offset = 0
+        self.__dense_model_reader = DenseModelReader(dense_model)
         self.__vocab_size_all_tables = 0
         self.__key_to_indice_hash_all_tables = None
         for i in range(self.layers):
@@ -151,9 +206,105 @@ class HugeCTRLoader(object):
                     "max_vocabulary_size_global"
                 ]
                 self.__vocab_size_all_tables += max_vocab_size_global
-        self.__key_to_indice_hash_all_tables = np.zeros(
-            shape=(self.__vocab_size_all_tables,), dtype=np.int64
+        if not self.__compact_key_mapping:
+            self.__key_to_indice_hash_all_tables = np.zeros(
+                shape=(self.__vocab_size_all_tables,), dtype=np.int64
+            )
+
+    def __load_embedding_table(self, sparse_model, max_vocab_size_global, embedding_vec_size):
+        """Load the embedding table of a sparse model and fill the key to indice hash
+        Args:
+            sparse_model: str, sparse model folder that contains the key and emb_vector files
+            max_vocab_size_global: int, maximum vocabulary size of the embedding layer
+            embedding_vec_size: int, embedding vector size of the embedding layer
+        Returns:
+            embedding_table: np.ndarray of shape (max_vocab_size_global + 1, embedding_vec_size)
+        """
+        key_path = os.path.join(sparse_model, "key")
+        vec_path = os.path.join(sparse_model, "emb_vector")
+        num_keys = min(
+            os.path.getsize(key_path) // 8,
+            os.path.getsize(vec_path) // (4 * embedding_vec_size),
         )
+        if num_keys > max_vocab_size_global:
+            raise ValueError(
+                "{} contains {} keys, more than max_vocabulary_size_global {}".format(
+                    sparse_model, num_keys, max_vocab_size_global
+                )
+            )
+        # indice 0 is reserved for default values of non-exisiting keys
+        embedding_table = np.zeros(
+            shape=(max_vocab_size_global + 1, embedding_vec_size), dtype=np.float32
+        )
+        if num_keys == 0:
+            return embedding_table
+        keys = np.memmap(key_path, dtype=np.int64, mode="r", shape=(num_keys,))
+        vectors = np.memmap(
+            vec_path, dtype=np.float32, mode="r", shape=(num_keys, embedding_vec_size)
+        )
+        for begin in range(0, num_keys, SPARSE_MODEL_CHUNK_SIZE):
+            end = min(begin + SPARSE_MODEL_CHUNK_SIZE, num_keys)
+            key_chunk = np.asarray(keys[begin:end])
+            if key_chunk.min() < 0 or key_chunk.max() >= self.__vocab_size_all_tables:
+                raise ValueError(
+                    "{} contains keys out of the range [0, {})".format(
+                        sparse_model, self.__vocab_size_all_tables
+                    )
+                )
+            self.__key_to_indice_hash_all_tables[key_chunk] = np.arange(
+                begin + 1, end + 1, dtype=np.int64
+            )
+            embedding_table[begin + 1 : end + 1] = vectors[begin:end]
+        del keys, vectors
+        return embedding_table
+
+    def __load_compact_embedding_table(
+        self, sparse_model, max_vocab_size_global, embedding_vec_size
+    ):
+        """Load the embedding table of a sparse model with rows ordered by key
+        Args:
+            sparse_model: str, sparse model folder that contains the key and emb_vector files
+            max_vocab_size_global: int, maximum vocabulary size of the embedding layer
+            embedding_vec_size: int, embedding vector size of the embedding layer
+        Returns:
+            embedding_table: np.ndarray of shape (num_unique_keys + 1, embedding_vec_size),
+                the row i + 1 stores the vector of embedding_keys[i]
+            embedding_keys: np.ndarray of shape (num_unique_keys,), sorted unique keys
+        """
+        key_path = os.path.join(sparse_model, "key")
+        vec_path = os.path.join(sparse_model, "emb_vector")
+        num_keys = min(
+            os.path.getsize(key_path) // 8,
+            os.path.getsize(vec_path) // (4 * embedding_vec_size),
+        )
+        if num_keys > max_vocab_size_global:
+            raise ValueError(
+                "{} contains {} keys, more than max_vocabulary_size_global {}".format(
+                    sparse_model, num_keys, max_vocab_size_global
+                )
+            )
+        if num_keys == 0:
+            return (
+                np.zeros(shape=(1, embedding_vec_size), dtype=np.float32),
+                np.zeros(shape=(0,), dtype=np.int64),
+            )
+        keys = np.fromfile(key_path, dtype=np.int64, count=num_keys)
+        # the last occurrence of a duplicated key wins, as with the dense key to indice hash
+        embedding_keys, reversed_positions = np.unique(keys[::-1], return_index=True)
+        positions = num_keys - 1 - reversed_positions
+        del keys
+        # indice 0 is reserved for default values of non-exisiting keys
+        embedding_table = np.zeros(
+            shape=(embedding_keys.size + 1, embedding_vec_size), dtype=np.float32
+        )
+        vectors = np.memmap(
+            vec_path, dtype=np.float32, mode="r", shape=(num_keys, embedding_vec_size)
+        )
+        for begin in range(0, embedding_keys.size, SPARSE_MODEL_CHUNK_SIZE):
+            end = min(begin + SPARSE_MODEL_CHUNK_SIZE, embedding_keys.size)
+            embedding_table[begin + 1 : end + 1] = vectors[positions[begin:end]]
+        del vectors
+        return embedding_table, embedding_keys
 
     @property
     def key_to_indice_hash_all_tables(self):
@@ -213,30 +364,19 @@ class HugeCTRLoader(object):
                 max_vocab_size_global = layer_config["sparse_embedding_hparam"][
                     "max_vocabulary_size_global"
                 ]
-                # indice 0 is reserved for default values of non-exisiting keys
-                embedding_table = np.zeros(
-                    shape=(max_vocab_size_global + 1, embedding_vec_size), dtype=np.float32
-                )
-                with open(
-                    self.__sparse_models[self.__embedding_counter] + "/key", "rb"
-                ) as key_file, open(
-                    self.__sparse_models[self.__embedding_counter] + "/emb_vector", "rb"
-                ) as vec_file:
-                    try:
-                        # indice 0 is reserved for default values of non-exisiting keys
-                        indice = 1
-                        while True:
-                            key_buffer = key_file.read(8)
-                            vec_buffer = vec_file.read(4 * embedding_vec_size)
-                            if len(key_buffer) == 0 or len(vec_buffer) == 0:
-                                break
-                            key = struct.unpack("q", key_buffer)[0]
-                            values = struct.unpack(str(embedding_vec_size) + "f", vec_buffer)
-                            self.key_to_indice_hash_all_tables[key] = indice
-                            embedding_table[indice] = values
-                            indice += 1
-                    except BaseException as error:
-                        print(error)
+                if self.__compact_key_mapping:
+                    embedding_table, embedding_keys = self.__load_compact_embedding_table(
+                        self.__sparse_models[self.__embedding_counter],
+                        max_vocab_size_global,
+                        embedding_vec_size,
+                    )
+                    layer_weights_dict["embedding_keys"] = embedding_keys
+                else:
+                    embedding_table = self.__load_embedding_table(
+                        self.__sparse_models[self.__embedding_counter],
+                        max_vocab_size_global,
+                        embedding_vec_size,
+                    )
                 layer_weights_dict["embedding_table"] = embedding_table
                 self.__embedding_counter += 1
             else:
@@ -248,15 +388,8 @@ class HugeCTRLoader(object):
             layer_params.eps = layer_config["bn_param"]["eps"]
             self.__dimensions[layer_config["top"]] = self.__dimensions[layer_config["bottom"]]
             in_feature = self.__dimensions[layer_config["bottom"]]
-            layer_bytes = in_feature * 4 * 2
-            with open(self.__dense_model, "rb") as file:
-                file.seek(self.__offset, 0)
-                buffer = file.read(layer_bytes)
-                gamma = struct.unpack(str(in_feature) + "f", buffer[: in_feature * 4])
-                beta = struct.unpack(str(in_feature) + "f", buffer[in_feature * 4 :])
-                gamma = np.reshape(np.float32(gamma), newshape=(in_feature,))
-                beta = np.reshape(np.float32(beta), newshape=(in_feature,))
-            self.__offset += layer_bytes
+            gamma = self.__dense_model_reader.read((in_feature,))
+            beta = self.__dense_model_reader.read((in_feature,))
             ntp_config = self.__ntp_config[self.__ntp_counter]
             running_mean = np.array(ntp_config["mean"], dtype=np.float32)
             running_variance = np.array(ntp_config["var"], dtype=np.float32)
@@ -270,15 +403,8 @@ class HugeCTRLoader(object):
             dim_in = self.__dimensions[layer_config["bottom"]]
             self.__dimensions[layer_config["top"]] = self.__dimensions[layer_config["bottom"]]
             in_feature = dim_in[len(dim_in) - 1]
-            layer_bytes = in_feature * 4 * 2
-            with open(self.__dense_model, "rb") as file:
-                file.seek(self.__offset, 0)
-                buffer = file.read(layer_bytes)
-                gamma = struct.unpack(str(in_feature) + "f", buffer[: in_feature * 4])
-                beta = struct.unpack(str(in_feature) + "f", buffer[in_feature * 4 :])
-                gamma = np.reshape(np.float32(gamma), newshape=(in_feature,))
-                beta = np.reshape(np.float32(beta), newshape=(in_feature,))
-            self.__offset += layer_bytes
+            gamma = self.__dense_model_reader.read((in_feature,))
+            beta = self.__dense_model_reader.read((in_feature,))
             # ntp_config = self.__ntp_config[self.__ntp_counter]
             # running_mean = np.array(ntp_config["mean"], dtype = np.float32)
             # running_variance = np.array(ntp_config["var"], dtype = np.float32)
@@ -334,17 +460,8 @@ class HugeCTRLoader(object):
                 self.__dimensions[layer_config["top"]] = layer_params.num_output
                 in_feature = self.__dimensions[layer_config["bottom"]]
             out_feature = layer_params.num_output
-            layer_bytes = (in_feature * out_feature + 1 * out_feature) * 4
-            with open(self.__dense_model, "rb") as file:
-                file.seek(self.__offset, 0)
-                buffer = file.read(layer_bytes)
-                weight = struct.unpack(
-                    str(in_feature * out_feature) + "f", buffer[: in_feature * out_feature * 4]
-                )
-                bias = struct.unpack(str(out_feature) + "f", buffer[in_feature * out_feature * 4 :])
-                weight = np.reshape(np.float32(weight), newshape=(in_feature, out_feature))
-                bias = np.reshape(np.float32(bias), newshape=(1, out_feature))
-            self.__offset += layer_bytes
+            weight = self.__dense_model_reader.read((in_feature, out_feature))
+            bias = self.__dense_model_reader.read((1, out_feature))
             layer_weights_dict[layer_config["top"] + "_weight"] = weight
             layer_weights_dict[layer_config["top"] + "_bias"] = bias
         elif layer_type == "MLP":
@@ -363,19 +480,8 @@ class HugeCTRLoader(object):
                 if i != 0:
                     in_feature = layer_params.num_outputs[i - 1]
                 out_feature = layer_params.num_outputs[i]
-                layer_bytes = (in_feature * out_feature + 1 * out_feature) * 4
-                with open(self.__dense_model, "rb") as file:
-                    file.seek(self.__offset, 0)
-                    buffer = file.read(layer_bytes)
-                    weight = struct.unpack(
-                        str(in_feature * out_feature) + "f", buffer[: in_feature * out_feature * 4]
-                    )
-                    bias = struct.unpack(
-                        str(out_feature) + "f", buffer[in_feature * out_feature * 4 :]
-                    )
-                    weight = np.reshape(np.float32(weight), newshape=(in_feature, out_feature))
-                    bias = np.reshape(np.float32(bias), newshape=(1, out_feature))
-                self.__offset += layer_bytes
+                weight = self.__dense_model_reader.read((in_feature, out_feature))
+                bias = self.__dense_model_reader.read((1, out_feature))
                 layer_weights_dict[layer_config["top"] + str(i) + "_weight"] = weight
                 layer_weights_dict[layer_config["top"] + str(i) + "_bias"] = bias
         elif layer_type == "FusedReshapeConcat":
@@ -426,25 +532,11 @@ class HugeCTRLoader(object):
             self.__dimensions[layer_config["top"]] = self.__dimensions[layer_config["bottom"]]
             num_layers = layer_params.num_layers
             in_feature = self.__dimensions[layer_config["bottom"]]
-            layer_bytes = in_feature * 2 * num_layers * 4
-            with open(self.__dense_model, "rb") as file:
-                file.seek(self.__offset, 0)
-                buffer = file.read(layer_bytes)
-                weights = []
-                biases = []
-                each_layer_bytes = layer_bytes // num_layers
-                for i in range(num_layers):
-                    weight = struct.unpack(
-                        str(in_feature) + "f",
-                        buffer[i * each_layer_bytes : i * each_layer_bytes + in_feature * 4],
-                    )
-                    bias = struct.unpack(
-                        str(in_feature) + "f",
-                        buffer[i * each_layer_bytes + in_feature * 4 : (i + 1) * each_layer_bytes],
-                    )
-                    weights.append(np.reshape(np.float32(weight), newshape=(len(weight), 1)))
-                    biases.append(np.reshape(np.float32(bias), newshape=(1, len(bias))))
-            self.__offset += layer_bytes
+            weights = []
+            biases = []
+            for i in range(num_layers):
+                weights.append(self.__dense_model_reader.read((in_feature, 1)))
+                biases.append(self.__dense_model_reader.read((1, in_feature)))
             layer_weights_dict[layer_config["top"] + "_weights"] = weights
             layer_weights_dict[layer_config["top"] + "_biases"] = biases
         elif layer_type == "PReLU_Dice":
@@ -538,15 +630,7 @@ class HugeCTRLoader(object):
             )
             slot_num = layer_params.weight_dims[0]
             vec_size = layer_params.weight_dims[1]
-            layer_bytes = slot_num * vec_size * 4
-            with open(self.__dense_model, "rb") as file:
-                file.seek(self.__offset, 0)
-                buffer = file.read(layer_bytes)
-                weight = struct.unpack(
-                    str(slot_num * vec_size) + "f", buffer[: slot_num * vec_size * 4]
-                )
-                weight = np.reshape(np.float32(weight), newshape=(slot_num, vec_size))
-            self.__offset += layer_bytes
+            weight = self.__dense_model_reader.read((slot_num, vec_size))
             layer_weights_dict[layer_config["top"] + "_weight"] = weight
         elif layer_type == "BinaryCrossEntropyLoss":
             layer_params.layer_type = "Sigmoid"
@@ -572,4 +656,6 @@ class HugeCTRLoader(object):
                 + "to see the supported layers."
             )
         self.__index += 1
+        if self.__index == self.__layers:
+            self.__dense_model_reader.check_consumed()
         return layer_params, layer_weights_dict, self.dimensions
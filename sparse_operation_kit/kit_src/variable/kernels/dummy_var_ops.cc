@@ -183,6 +183,61 @@ REGISTER_GPU_KERNELS(int32_t, int32_t, float, float);
 #endif
 #undef REGISTER_GPU_KERNELS
 
+// -----------------------------------------------------------------------------------------------
+// DummyVarSparseReadGrouped
+// -----------------------------------------------------------------------------------------------
+template <typename KeyType, typename ValueType>
+class DummyVarSparseReadGroupedOp : public OpKernel {
+ public:
+  explicit DummyVarSparseReadGroupedOp(OpKernelConstruction* ctx) : OpKernel(ctx) {
+    OP_REQUIRES_OK(ctx, ctx->GetAttr("N", &N_));
+  }
+
+  void Compute(OpKernelContext* ctx) override {
+    // Get cuda stream of tensorflow
+    auto device_ctx = ctx->op_device_context();
+    OP_REQUIRES(ctx, device_ctx != nullptr, errors::Aborted("No valid device context."));
+    cudaStream_t stream = stream_executor::gpu::AsGpuStreamValue(device_ctx->stream());
+
+    // One op for all the variables, the reads are issued to the same stream one after another
+    for (int i = 0; i < N_; ++i) {
+      core::RefCountPtr<DummyVar<KeyType, ValueType>> var;
+      OP_REQUIRES_OK(ctx, LookupResource(ctx, HandleFromInput(ctx, i), &var));
+
+      tf_shared_lock ml(*var->mu());
+
+      const Tensor& indices = ctx->input(N_ + i);
+
+      // Allocate output
+      int64_t num_indices = indices.NumElements();
+      Tensor* output = nullptr;
+      OP_REQUIRES_OK(ctx, ctx->allocate_output(i, {num_indices, var->cols()}, &output));
+
+      var->SparseRead(indices.data(), output->data(), num_indices, stream);
+    }
+  }
+
+ private:
+  // The number of variables
+  int N_;
+};
+
+#define REGISTER_GPU_KERNELS(key_type_tf, key_type, dtype_tf, dtype)   \
+  REGISTER_KERNEL_BUILDER(Name("DummyVarSparseReadGrouped")            \
+                              .Device(DEVICE_GPU)                      \
+                              .HostMemory("resources")                 \
+                              .TypeConstraint<key_type_tf>("key_type") \
+                              .TypeConstraint<dtype_tf>("dtype"),      \
+                          DummyVarSparseReadGroupedOp<key_type, dtype>)
+#if TF_VERSION_MAJOR == 1
+REGISTER_GPU_KERNELS(int64, int64_t, float, float);
+REGISTER_GPU_KERNELS(int32, int32_t, float, float);
+#else
+REGISTER_GPU_KERNELS(int64_t, int64_t, float, float);
+REGISTER_GPU_KERNELS(int32_t, int32_t, float, float);
+#endif
+#undef REGISTER_GPU_KERNELS
+
 // -----------------------------------------------------------------------------------------------
 // DummyVarScatterAdd
 // -----------------------------------------------------------------------------------------------
@@ -273,4 +328,59 @@ REGISTER_GPU_KERNELS(int32_t, int32_t, float, float);
 #endif
 #undef REGISTER_GPU_KERNELS
 
+// -----------------------------------------------------------------------------------------------
+// DummyVarScatterUpdateGrouped
+// -----------------------------------------------------------------------------------------------
+template <typename KeyType, typename ValueType>
+class DummyVarScatterUpdateGroupedOp : public OpKernel {
+ public:
+  explicit DummyVarScatterUpdateGroupedOp(OpKernelConstruction* ctx) : OpKernel(ctx) {
+    OP_REQUIRES_OK(ctx, ctx->GetAttr("N", &N_));
+  }
+
+  void Compute(OpKernelContext* ctx) override {
+    auto device_ctx = ctx->op_device_context();
+    OP_REQUIRES(ctx, device_ctx != nullptr, errors::Aborted("No valid device context."));
+    cudaStream_t stream = stream_executor::gpu::AsGpuStreamValue(device_ctx->stream());
+
+    // One op for all the variables, the updates are issued to the same stream one after another
+    for (int i = 0; i < N_; ++i) {
+      core::RefCountPtr<DummyVar<KeyType, ValueType>> var;
+      OP_REQUIRES_OK(ctx, LookupResource(ctx, HandleFromInput(ctx, i), &var));
+
+      tf_shared_lock ml(*var->mu());
+
+      const Tensor& indices = ctx->input(N_ + i);
+      const Tensor& updates = ctx->input(2 * N_ + i);
+      OP_REQUIRES(ctx, updates.NumElements() == indices.NumElements() * var->cols(),
+                  errors::InvalidArgument("The shape of updates ", i,
+                                          " doesn't match its indices and variable."));
+
+      // Do scatter update
+      int64_t num_indices = indices.NumElements();
+      var->ScatterUpdate(indices.data(), updates.data(), num_indices, stream);
+    }
+  }
+
+ private:
+  // The number of variables
+  int N_;
+};
+
+#define REGISTER_GPU_KERNELS(key_type_tf, key_type, dtype_tf, dtype)   \
+  REGISTER_KERNEL_BUILDER(Name("DummyVarScatterUpdateGrouped")         \
+                              .Device(DEVICE_GPU)                      \
+                              .HostMemory("resources")                 \
+                              .TypeConstraint<key_type_tf>("key_type") \
+                              .TypeConstraint<dtype_tf>("dtype"),      \
+                          DummyVarScatterUpdateGroupedOp<key_type, dtype>)
+#if TF_VERSION_MAJOR == 1
+REGISTER_GPU_KERNELS(int64, int64_t, float, float);
+REGISTER_GPU_KERNELS(int32, int32_t, float, float);
+#else
+REGISTER_GPU_KERNELS(int64_t, int64_t, float, float);
+REGISTER_GPU_KERNELS(int32_t, int32_t, float, float);
+#endif
+#undef REGISTER_GPU_KERNELS
+
 }  // namespace tensorflow
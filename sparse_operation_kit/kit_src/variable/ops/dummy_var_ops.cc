@@ -69,6 +69,39 @@ REGISTER_OP("DummyVarSparseRead")
       return sok_tsl_status();
     });
 
+REGISTER_OP("DummyVarSparseReadGrouped")
+    .Input("resources: N * resource")
+    .Input("indices: N * key_type")
+    .Output("outputs: N * dtype")
+    .Attr("N: int >= 1")
+    .Attr("key_type: {int32, int64}")
+    .Attr("dtype: {float32} = DT_FLOAT")
+    .SetShapeFn([](InferenceContext* c) {
+      int N;
+      TF_RETURN_IF_ERROR(c->GetAttr("N", &N));
+      for (int i = 0; i < N; ++i) {
+        // rank(indices) should == 1
+        ShapeHandle indices_shape;
+        TF_RETURN_IF_ERROR(c->WithRank(c->input(N + i), 1, &indices_shape));
+
+        // Get handle.shape[1]
+        auto handle_shapes_and_types = c->input_handle_shapes_and_types(i);
+        if (handle_shapes_and_types == nullptr) {
+          c->set_output(i, c->Matrix(c->Dim(indices_shape, 0), c->UnknownDim()));
+          continue;
+        }
+        auto handle_shape = (*handle_shapes_and_types)[0].shape;
+        ShapeHandle handle_shape_1;
+        TF_RETURN_IF_ERROR(c->Subshape(handle_shape, 1, 2, &handle_shape_1));
+
+        // Set output shape = [indices.shape[0], handle.shape[1]]
+        ShapeHandle output_shape;
+        TF_RETURN_IF_ERROR(c->Concatenate(indices_shape, handle_shape_1, &output_shape));
+        c->set_output(i, output_shape);
+      }
+      return sok_tsl_status();
+    });
+
 namespace {
 Status DummyVarScatterShapeFn(InferenceContext* c) {
   // Get handle.shape[1]
@@ -113,4 +146,23 @@ REGISTER_OP("DummyVarScatterUpdate")
     .Attr("dtype: {float32}")
     .SetShapeFn(DummyVarScatterShapeFn);
 
+REGISTER_OP("DummyVarScatterUpdateGrouped")
+    .Input("resources: N * resource")
+    .Input("indices: N * key_type")
+    .Input("updates: N * dtype")
+    .Attr("N: int >= 1")
+    .Attr("key_type: {int32, int64}")
+    .Attr("dtype: {float32}")
+    .SetShapeFn([](InferenceContext* c) {
+      int N;
+      TF_RETURN_IF_ERROR(c->GetAttr("N", &N));
+      for (int i = 0; i < N; ++i) {
+        // rank(indices) should == 1 and rank(updates) should == 2
+        ShapeHandle indices_shape, updates_shape;
+        TF_RETURN_IF_ERROR(c->WithRank(c->input(N + i), 1, &indices_shape));
+        TF_RETURN_IF_ERROR(c->WithRank(c->input(2 * N + i), 2, &updates_shape));
+      }
+      return sok_tsl_status();
+    });
+
 }  // namespace tensorflow
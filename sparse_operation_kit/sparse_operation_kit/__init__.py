@@ -66,9 +66,10 @@ from sparse_operation_kit.optimizer import SGD
 
 
 from sparse_operation_kit.lookup import lookup_sparse
+from sparse_operation_kit.lookup import LookupPlan
 from sparse_operation_kit.lookup import all2all_dense_embedding
 
-from sparse_operation_kit.dump_load import dump, load
+from sparse_operation_kit.dump_load import dump, load, dump_async, DumpHandle
 
 
 # a specific code path for dl framework tf2.11.0
@@ -0,0 +1,96 @@
+"""
+ Copyright (c) 2023, NVIDIA CORPORATION.
+ 
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+ 
+     http://www.apache.org/licenses/LICENSE-2.0
+ 
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+import horovod.tensorflow as hvd
+
+import sparse_operation_kit as sok
+
+
+def timeit(lookup, total_indices, args):
+    ts = []
+    t = time.time()
+    for i in range(args.iters):
+        ts.append(time.time() - t)
+        t = time.time()
+        left = args.batch_size // hvd.size() * hvd.rank()
+        left += i * args.batch_size
+        right = args.batch_size // hvd.size() * (hvd.rank() + 1)
+        right += i * args.batch_size
+        embeddings = lookup([indices[left:right] for indices in total_indices])
+        embeddings[0].numpy()
+    return sum(ts[5:]) / (args.iters - 5) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--hotness", type=int, default=2)
+    parser.add_argument("--combiner", type=str, default="sum")
+    parser.add_argument("--key_space", type=int, default=1024 * 1024)
+    parser.add_argument("--dim", type=int, default=4)
+    parser.add_argument("--num_tables", type=int, default=26)
+    parser.add_argument("--iters", type=int, default=100)
+    args = parser.parse_args()
+    args.iters = max(args.iters, 10)
+
+    hvd.init()
+    gpus = tf.config.experimental.list_physical_devices("GPU")
+    for gpu in gpus:
+        tf.config.experimental.set_memory_growth(gpu, True)
+    if gpus:
+        tf.config.experimental.set_visible_devices(gpus[hvd.local_rank()], "GPU")
+    sok.init()
+
+    total_indices = []
+    for _ in range(args.num_tables):
+        offsets = np.random.randint(1, args.hotness + 1, args.iters * args.batch_size)
+        offsets = tf.convert_to_tensor(offsets, dtype=tf.int64)
+        values = np.random.randint(0, args.key_space, tf.reduce_sum(offsets))
+        values = tf.convert_to_tensor(values, dtype=tf.int64)
+        total_indices.append(tf.RaggedTensor.from_row_lengths(values, offsets))
+
+    sok_vars = [
+        sok.Variable(tf.random.normal(shape=[args.key_space, args.dim]), dtype=tf.float32)
+        for _ in range(args.num_tables)
+    ]
+    combiners = [args.combiner] * args.num_tables
+
+    # eager lookups, where the python overhead of every call is not hidden by tf.function
+    lookup_sparse_result = timeit(
+        lambda indices: sok.lookup_sparse(sok_vars, indices, combiners=combiners),
+        total_indices,
+        args,
+    )
+    plan = sok.LookupPlan(sok_vars, combiners=combiners)
+    lookup_plan_result = timeit(plan, total_indices, args)
+
+    print("---------------------------------------------")
+    print("* batch_size          : %d" % args.batch_size)
+    print("* local batch_size    : %d" % (args.batch_size // hvd.size()))
+    print("* hotness             : %d" % args.hotness)
+    print("* combiner            : %s" % args.combiner)
+    print("* key_space           : %d" % args.key_space)
+    print("* dim                 : %d" % args.dim)
+    print("* num_tables          : %d" % args.num_tables)
+    print("---------------------------------------------")
+    print("* sok.lookup_sparse   : %.3f ms/iter" % lookup_sparse_result)
+    print("* sok.LookupPlan      : %.3f ms/iter" % lookup_plan_result)
+    print("* saved per call      : %.3f ms" % (lookup_sparse_result - lookup_plan_result))
+    print("---------------------------------------------")
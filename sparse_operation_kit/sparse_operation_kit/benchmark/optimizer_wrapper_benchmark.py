@@ -0,0 +1,84 @@
+"""
+ Copyright (c) 2023, NVIDIA CORPORATION.
+ 
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+ 
+     http://www.apache.org/licenses/LICENSE-2.0
+ 
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+import horovod.tensorflow as hvd
+
+import sparse_operation_kit as sok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=8192)
+    parser.add_argument("--key_space", type=int, default=1024 * 1024)
+    parser.add_argument("--dim", type=int, default=4)
+    parser.add_argument("--num_tables", type=int, default=100)
+    parser.add_argument("--iters", type=int, default=100)
+    args = parser.parse_args()
+    args.iters = max(args.iters, 10)
+
+    hvd.init()
+    gpus = tf.config.experimental.list_physical_devices("GPU")
+    for gpu in gpus:
+        tf.config.experimental.set_memory_growth(gpu, True)
+    if gpus:
+        tf.config.experimental.set_visible_devices(gpus[hvd.local_rank()], "GPU")
+    sok.init()
+
+    total_indices = np.random.randint(
+        0, args.key_space, [args.iters, args.num_tables, args.batch_size]
+    )
+    total_indices = tf.convert_to_tensor(total_indices, dtype=tf.int64)
+
+    sok_vars = [
+        sok.DynamicVariable(dimension=args.dim, initializer="13") for _ in range(args.num_tables)
+    ]
+    optimizer = sok.OptimizerWrapper(tf.keras.optimizers.legacy.Adam(0.1), phase_timing=True)
+
+    @tf.function
+    def sok_step(indices):
+        with tf.GradientTape() as tape:
+            embeddings = [tf.nn.embedding_lookup(v, indices[i]) for i, v in enumerate(sok_vars)]
+            loss = tf.add_n([tf.reduce_sum(embedding) for embedding in embeddings])
+        grads = tape.gradient(loss, sok_vars)
+        optimizer.apply_gradients(zip(grads, sok_vars))
+        return loss
+
+    ts = []
+    t = time.time()
+    for i in range(args.iters):
+        ts.append(time.time() - t)
+        t = time.time()
+        if i == 5:
+            optimizer.reset_phase_times()
+        loss = sok_step(total_indices[i])
+        loss = loss.numpy()
+    sok_result = sum(ts[5:]) / (args.iters - 5) * 1000
+    phase_times = optimizer.get_phase_times()
+
+    print("---------------------------------------------")
+    print("* batch_size          : %d" % args.batch_size)
+    print("* key_space           : %d" % args.key_space)
+    print("* dim                 : %d" % args.dim)
+    print("* num_tables          : %d" % args.num_tables)
+    print("---------------------------------------------")
+    print("* train step          : %.3f ms/iter" % sok_result)
+    for name, seconds in phase_times.items():
+        print("* %-19s : %.3f ms/iter" % (name, seconds * 1000))
+    print("---------------------------------------------")
@@ -0,0 +1,359 @@
+#
+# Copyright (c) 2023, NVIDIA CORPORATION.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Codec of the files written by ``sok.dump``, which only depends on numpy so that checkpoints can
+be inspected and converted without TensorFlow.
+"""
+
+import os
+import re
+import json
+import numpy as np
+
+integer_length = 4
+long_long_length = 8
+opt_name_max_length = 32
+opt_var_name_max_length = 32
+table_name_max_length = 256
+meta_info_name = "meta_info"
+sharded_manifest_name = "sharded_manifest.json"
+sharded_format_version = 1
+delta_segment_prefix = "delta_"
+
+# the integers are saved in big-endian and unsigned, the strings are right justified with spaces
+file_head_dtype = np.dtype(
+    [
+        ("table_name", "S%d" % table_name_max_length),
+        ("file_type", ">u4"),
+        ("var_name", "S%d" % opt_var_name_max_length),
+        ("data_index", ">u4"),
+    ]
+)
+file_head_length = file_head_dtype.itemsize
+
+# indexed by the file_type and the data_index of the file head
+file_type_names = ["key", "weight", "optimizer_state", "scale"]
+data_type_names = [
+    "int32",
+    "int64",
+    "uint32",
+    "uint64",
+    "float16",
+    "float32",
+    "float64",
+    "bfloat16",
+    "int8",
+]
+# numpy has no bfloat16, its values are read as the upper 16 bits of float32
+storage_type_names = {"bfloat16": "uint16"}
+# the dtypes of the weights of sok.dump(..., quantize=...), int8 rows have a float32 scale each
+quantized_type_names = ["float16", "bfloat16", "int8"]
+
+shard_file_pattern = re.compile(r"\.shard\d+$")
+
+
+def meta_info_dtype(num_tables):
+    return np.dtype(
+        [
+            ("num_tables", ">u4"),
+            ("key_type", ">u4", (num_tables,)),
+            ("emb_type", ">u4", (num_tables,)),
+            ("emb_length", ">u4", (num_tables,)),
+            ("emb_num", ">u8", (num_tables,)),
+            ("table_name", "S%d" % table_name_max_length, (num_tables,)),
+            ("opt_name", "S%d" % opt_name_max_length, (num_tables,)),
+        ]
+    )
+
+
+def encode_strings(strings, max_length):
+    return np.char.encode(np.char.rjust(np.asarray(strings, dtype=np.str_), max_length))
+
+
+def decode_strings(array):
+    if np.size(array) == 0:
+        return []
+    return np.char.strip(np.char.decode(array)).tolist()
+
+
+def encode_meta_info(table_names, opt_names, key_types, emb_types, emb_lengths, emb_nums):
+    """Return the bytes of a meta_info file describing the tables"""
+    num_tables = len(table_names)
+    meta = np.zeros((), dtype=meta_info_dtype(num_tables))
+    meta["num_tables"] = num_tables
+    meta["key_type"] = key_types
+    meta["emb_type"] = emb_types
+    meta["emb_length"] = emb_lengths
+    meta["emb_num"] = emb_nums
+    meta["table_name"] = encode_strings(table_names, table_name_max_length)
+    meta["opt_name"] = encode_strings(opt_names, opt_name_max_length)
+    return meta.tobytes()
+
+
+def decode_meta_info(buffer):
+    """Return the fields of a meta_info file as a dict of lists, one item per table"""
+    num_tables = int(np.frombuffer(buffer, dtype=">u4", count=1)[0])
+    meta = np.frombuffer(buffer, dtype=meta_info_dtype(num_tables), count=1)[0]
+    return {
+        "table_name": decode_strings(meta["table_name"]),
+        "opt_name": decode_strings(meta["opt_name"]),
+        "key_type": meta["key_type"].tolist(),
+        "emb_type": meta["emb_type"].tolist(),
+        "emb_length": meta["emb_length"].tolist(),
+        "emb_num": meta["emb_num"].tolist(),
+    }
+
+
+def encode_file_head(table_name, file_type, var_name, data_index):
+    """Return the bytes of the head in front of the data of a key, weight or state file"""
+    head = np.zeros((), dtype=file_head_dtype)
+    head["table_name"] = encode_strings(table_name, table_name_max_length)
+    head["file_type"] = file_type
+    head["var_name"] = encode_strings(var_name, opt_var_name_max_length)
+    head["data_index"] = data_index
+    return head.tobytes()
+
+
+def read_file_heads(paths):
+    """Read the heads of the files into a structured array of file_head_dtype"""
+    heads = np.zeros(len(paths), dtype=file_head_dtype)
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            heads[i] = np.frombuffer(f.read(file_head_length), dtype=file_head_dtype)[0]
+    return heads
+
+
+def decode_file_head(head):
+    """Return table_name, file_type, var_name and data_index of a file head"""
+    return (
+        decode_strings(head["table_name"]),
+        int(head["file_type"]),
+        decode_strings(head["var_name"]),
+        int(head["data_index"]),
+    )
+
+
+def get_storage_dtype(type_name):
+    """Return the numpy dtype which the data of type_name is stored as"""
+    return np.dtype(storage_type_names.get(type_name, type_name))
+
+
+def get_data_dtype(data_index):
+    return get_storage_dtype(data_type_names[data_index])
+
+
+def quantize_rows(rows, type_name):
+    """
+    Convert the float rows of a weight file to one of quantized_type_names. The int8 rows are
+    divided by a scale per row, the maximum absolute value of the row over 127. A row with inf or
+    NaN has no such scale, so int8 raises a ValueError for them, float16 and bfloat16 keep them.
+    Returns:
+        the data and the float32 scales of shape [num_rows, 1], or None but for int8
+    """
+    rows = np.asarray(rows, dtype=np.float32)
+    if type_name == "float16":
+        return rows.astype(np.float16), None
+    if type_name == "bfloat16":
+        bits = rows.view(np.uint32)
+        # round to nearest even, a NaN keeps a mantissa bit
+        rounded = (bits + (np.uint32(0x7FFF) + ((bits >> 16) & np.uint32(1)))) >> 16
+        rounded = np.where(np.isnan(rows), (bits >> 16) | np.uint32(0x40), rounded)
+        return rounded.astype(np.uint16), None
+    if type_name == "int8":
+        num_bad_rows = np.count_nonzero(~np.isfinite(rows).all(axis=1))
+        if num_bad_rows > 0:
+            raise ValueError(
+                "can't quantize %d rows with inf or NaN to int8, please use float16 or bfloat16"
+                % num_bad_rows
+            )
+        scales = (np.abs(rows).max(axis=1, keepdims=True) / 127).astype(np.float32)
+        data = np.rint(rows / np.where(scales == 0, 1, scales))
+        return np.clip(data, -127, 127).astype(np.int8), scales
+    raise ValueError("can't quantize to %s, expected one of %s" % (type_name, quantized_type_names))
+
+
+def dequantize_rows(data, type_name, scales=None, dtype=np.float32):
+    """Convert the rows of a weight file stored as type_name back to dtype, see quantize_rows"""
+    if type_name == "bfloat16":
+        data = (np.asarray(data, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+    elif type_name == "int8":
+        if scales is None:
+            raise ValueError("int8 rows need their scales")
+        data = np.asarray(data, dtype=np.float32) * scales
+    return np.asarray(data, dtype=dtype)
+
+
+def map_data(path, dtype, offset=0):
+    """Memory map the data of a file from offset bytes as a flat array"""
+    dtype = get_storage_dtype(dtype)
+    num_elements = (os.stat(path).st_size - offset) // dtype.itemsize
+    if num_elements == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(num_elements,))
+
+
+def write_sharded_manifest(path, manifest):
+    """Write the manifest of a sharded checkpoint, through a temporary file so an existing
+    manifest is never half written"""
+    manifest_path = os.path.join(path, sharded_manifest_name)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def get_shard_id(file_name):
+    match = shard_file_pattern.search(file_name)
+    return int(match.group(0)[len(".shard") :]) if match else -1
+
+
+def get_table_files(path):
+    """
+    Find the data files of the tables of a checkpoint directory from the file names and heads.
+    The files of a table are ``<table>-key``, ``<table>-weight``, ``<table>-scale`` of int8
+    weights and ``<table>-<optimizer>-<state>``, a table of the sharded layout is made of their
+    ``.shard<id>`` files.
+    Returns:
+        a dict from table name to a dict with keys ``key``, ``weight``, ``scale``, ``optimizer``
+        and ``optimizer_state``, a dict from state name to files. The files are lists of
+        (path, data size in bytes, data_index) sorted by shard id, so their rows are aligned.
+    """
+    manifest_path = os.path.join(path, sharded_manifest_name)
+    sharded_tables = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            sharded_tables = set(json.load(f)["tables"])
+
+    paths, sizes, names = [], [], []
+    for entry in sorted(os.scandir(path), key=lambda entry: get_shard_id(entry.name)):
+        name = shard_file_pattern.sub("", entry.name)
+        if not entry.is_file() or len(name.split("-")) not in (2, 3):
+            continue
+        if len(name.split("-")) == 2 and name.split("-")[1] not in ("key", "weight", "scale"):
+            continue
+        is_shard = name != entry.name
+        # a sharded dump may leave the files of an older single file dump of the table
+        if is_shard != (name.split("-")[0] in sharded_tables):
+            continue
+        if entry.stat().st_size < file_head_length:
+            continue
+        paths.append(entry.path)
+        sizes.append(entry.stat().st_size - file_head_length)
+        names.append(name.split("-"))
+    heads = read_file_heads(paths)
+    file_types = heads["file_type"].tolist()
+    data_indices = heads["data_index"].tolist()
+
+    tables = {}
+    for i, name in enumerate(names):
+        if file_types[i] >= len(file_type_names) or data_indices[i] >= len(data_type_names):
+            continue
+        table = tables.setdefault(
+            name[0],
+            {"key": [], "weight": [], "scale": [], "optimizer": None, "optimizer_state": {}},
+        )
+        files = (paths[i], sizes[i], data_indices[i])
+        if len(name) == 3:
+            table["optimizer"] = name[1]
+            table["optimizer_state"].setdefault(name[2], []).append(files)
+        else:
+            table[name[1]].append(files)
+    return tables
+
+
+def inspect_checkpoint(path):
+    """
+    Summarize the tables of a checkpoint directory from the file names, the file heads and the
+    file sizes only, see ``get_table_files``.
+    Returns:
+        a list of dict, one per table, sorted by table name, with keys ``table_name``,
+        ``num_keys``, ``key_dtype``, ``weight_dtype``, ``dimension``, ``optimizer``,
+        ``optimizer_states``, ``num_bytes``, ``num_files`` and ``errors``
+    """
+    tables = get_table_files(path)
+    summaries = []
+    for table_name in sorted(tables):
+        table = tables[table_name]
+        errors = []
+        num_keys, key_dtype = get_num_rows(table["key"], 1, errors, "key")
+        dimension, weight_dtype = None, None
+        num_weight_bytes = sum(size for _, size, _ in table["weight"])
+        if table["weight"]:
+            weight_dtype = get_data_dtype(table["weight"][0][2])
+            if data_type_names[table["weight"][0][2]] == "int8":
+                get_num_rows(table["scale"], 1, errors, "scale", num_keys)
+            if num_keys:
+                dimension = num_weight_bytes // (num_keys * weight_dtype.itemsize)
+            if dimension:
+                get_num_rows(table["weight"], dimension, errors, "weight", num_keys)
+            elif num_keys:
+                errors.append("weight files are truncated")
+                dimension = None
+        else:
+            errors.append("missing weight file")
+        states = {}
+        for state_name, state_files in sorted(table["optimizer_state"].items()):
+            if dimension:
+                get_num_rows(state_files, dimension, errors, state_name, num_keys)
+            states[state_name] = data_type_names[state_files[0][2]]
+        all_files = table["key"] + table["weight"] + table["scale"]
+        all_files += sum(table["optimizer_state"].values(), [])
+        summaries.append(
+            {
+                "table_name": table_name,
+                "num_keys": num_keys,
+                "key_dtype": data_type_names[table["key"][0][2]] if key_dtype is not None else None,
+                "weight_dtype": (
+                    data_type_names[table["weight"][0][2]] if weight_dtype is not None else None
+                ),
+                "dimension": dimension,
+                "optimizer": table["optimizer"],
+                "optimizer_states": states,
+                "num_bytes": sum(size for _, size, _ in all_files)
+                + len(all_files) * file_head_length,
+                "num_files": len(all_files),
+                "errors": errors,
+            }
+        )
+    return summaries
+
+
+def get_num_rows(files, dimension, errors, file_name, expected_rows=None):
+    """Return the number of rows of the files of a table and their dtype, and record errors"""
+    if not files:
+        errors.append("missing %s file" % file_name)
+        return 0, None
+    dtype = get_data_dtype(files[0][2])
+    if any(data_index != files[0][2] for _, _, data_index in files):
+        errors.append("%s files have different dtypes" % file_name)
+    row_bytes = dimension * dtype.itemsize
+    num_bytes = sum(size for _, size, _ in files)
+    if num_bytes % row_bytes != 0:
+        errors.append("%s files are truncated" % file_name)
+    num_rows = num_bytes // row_bytes
+    if expected_rows is not None and num_rows != expected_rows:
+        errors.append("%s files have %d rows, expected %d" % (file_name, num_rows, expected_rows))
+    return num_rows, dtype
+
+
+def list_delta_segments(path):
+    """Return the folders of the incremental dumps of a full dump, in the order they are dumped"""
+    segments = []
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            segment_id = name[len(delta_segment_prefix) :]
+            if name.startswith(delta_segment_prefix) and segment_id.isdigit():
+                segments.append((int(segment_id), path + "/" + name))
+    return [segment_path for _, segment_path in sorted(segments)]
@@ -15,6 +15,9 @@
 #
 import os
 import sys
+import glob
+import json
+import shutil
 import string
 import numpy as np
 from enum import Enum
@@ -38,16 +41,35 @@ from sparse_operation_kit.distributed_variable import DistributedVariable
 from sparse_operation_kit.distributed_variable import LocalizedVariable
 
 from sparse_operation_kit.dynamic_variable import DynamicVariable, export, assign
+from sparse_operation_kit.checkpoint_format import (
+    file_head_length,
+    meta_info_name,
+    sharded_manifest_name,
+    sharded_format_version,
+    delta_segment_prefix,
+    data_type_names,
+    quantized_type_names,
+    encode_meta_info,
+    decode_meta_info,
+    encode_file_head,
+    read_file_heads,
+    decode_file_head,
+    map_data,
+    quantize_rows,
+    dequantize_rows,
+    write_sharded_manifest,
+    list_delta_segments,
+)
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 # length:byte
-integer_length = 4
-long_long_length = 8
-opt_name_max_length = 32
-opt_var_name_max_length = 32
-table_name_max_length = 256
-file_head_length = 296
 save_buffer_size_bytes = 1024 * 1024 * 64  # 1Gb
+load_chunk_rows = 1 << 24
+max_row_ranges_to_slice = 4096
+# the partition index keeps at most num_keys / min_rows_per_partition_run runs, otherwise the keys
+# are interleaved across the partitions and masking the keys is cheaper than the index
+min_rows_per_partition_run = 64
 optimizer_names = ["SGD", "Adamax", "Adadelta", "Adagrad", "Ftrl", "Adam"]
 
 
@@ -61,6 +83,8 @@ class data_type_convert:
         tf.float16: (4, 2, np.float16),
         tf.float32: (5, 4, np.float32),
         tf.float64: (6, 8, np.float64),
+        tf.bfloat16: (7, 2, np.uint16),
+        tf.int8: (8, 1, np.int8),
     }
 
     integer_to_dtype = {
@@ -71,6 +95,8 @@ class data_type_convert:
         4: (tf.float16, np.float16),
         5: (tf.float32, np.float32),
         6: (tf.float64, np.float64),
+        7: (tf.bfloat16, np.uint16),
+        8: (tf.int8, np.int8),
     }
 
     @classmethod
@@ -165,195 +191,66 @@ class SOK_var_info:
         return
 
 
-class MetaVarType(Enum):
-    KeyType = 0
-    EmbType = 1
-    EmbLength = 2
-    EmbNum = 3
-    TableName = 4
-    OptName = 5
-
-
 class FileType(Enum):
     Key = 0
     Emb = 1
     OptState = 2
-
-
-MetaVarOffsetDict = {
-    MetaVarType.KeyType: 0,
-    MetaVarType.EmbType: 4,
-    MetaVarType.EmbLength: 8,
-    MetaVarType.EmbNum: 12,
-    MetaVarType.TableName: 20,
-    MetaVarType.OptName: 20 + table_name_max_length,
-}
-
-
-def get_meta_info_offset(variable_type, table_num):
-    assert isinstance(variable_type, MetaVarType)
-    offset = integer_length  # metainfo have embedding table num at begin of it , type is a integer
-    offset += MetaVarOffsetDict[variable_type] * table_num
-    return offset
+    Scale = 3
 
 
 def save_meta_file(path: str, sok_var_info_list: list):
-    meta_path = path + "/meta_info"
-    num_tables = len(sok_var_info_list)
-
-    table_name_list = []
-    opt_name_list = []
-    emb_length_list = []
-    key_type_list = []
-    embed_type_list = []
-    embed_num_list = []
+    meta_path = path + "/" + meta_info_name
     gpu_id = global_gpu_id()
 
     if gpu_id == 0:
-        for i in range(num_tables):
-            tmp_sok_var_info = sok_var_info_list[i]
-            table_name_list.append(tmp_sok_var_info.emb_name.rjust(table_name_max_length, " "))
-            opt_name_list.append(tmp_sok_var_info.opt_name.rjust(opt_name_max_length, " "))
-            emb_length_list.append(tmp_sok_var_info.emb_length)
-            key_type_list.append(tmp_sok_var_info.key_type)
-            embed_type_list.append(tmp_sok_var_info.emb_type)
-            embed_num_list.append(tmp_sok_var_info.emb_num)
-        f = open(meta_path, "wb")
-        f.write(
-            num_tables.to_bytes(integer_length, "big", signed=False)
-        )  # use big-endien and unsigned save all the int data
-        for key_type in key_type_list:
-            f.write(key_type.to_bytes(integer_length, "big", signed=False))
-        for embed_type in embed_type_list:
-            f.write(embed_type.to_bytes(integer_length, "big", signed=False))
-        for emb_length in emb_length_list:
-            f.write(emb_length.to_bytes(integer_length, "big", signed=False))
-        for embed_num in embed_num_list:
-            f.write(embed_num.to_bytes(long_long_length, "big", signed=False))
-        table_names_str = ""
-        for table_name in table_name_list:
-            table_names_str += table_name
-        f.write(table_names_str.encode())  # str save in binaray is utf-8
-        opt_names_str = ""
-
-        for opt_name in opt_name_list:
-            opt_names_str += opt_name
-        f.write(opt_names_str.encode())
-        f.close()
+        meta_bytes = encode_meta_info(
+            [sok_var_info.emb_name for sok_var_info in sok_var_info_list],
+            [sok_var_info.opt_name for sok_var_info in sok_var_info_list],
+            [sok_var_info.key_type for sok_var_info in sok_var_info_list],
+            [sok_var_info.emb_type for sok_var_info in sok_var_info_list],
+            [sok_var_info.emb_length for sok_var_info in sok_var_info_list],
+            [sok_var_info.emb_num for sok_var_info in sok_var_info_list],
+        )
+        with open(meta_path, "wb") as f:
+            f.write(meta_bytes)
 
     # still need a barrier between gpus
     return
 
 
-def convert_bytes_to_int_list(bytes_list, data_length, signed=False):
-    tmp_list = [
-        int.from_bytes(
-            bytes_list[i * data_length : i * data_length + data_length], "big", signed=signed
-        )
-        for i in range(int(len(bytes_list) / data_length))
-    ]
-    return tmp_list
-
-
-def convert_bytes_to_string_list(bytes_list, data_length, signed=False):
-    tmp_list = [
-        (bytes_list[i * data_length : i * data_length + data_length]).decode().strip()
-        for i in range(int(len(bytes_list) / data_length))
-    ]
-    return tmp_list
-
-
 def load_meta_file(path: str):
-    meta_path = path + "/meta_info"
+    meta_path = path + "/" + meta_info_name
 
-    if not os.path.exists(meta_path) or not os.path.exists(meta_path):
+    if not os.path.exists(meta_path):
         raise Exception(
             "can't find meta_info data from path = %s ,please ensure the integrity of weight file"
             % path
         )
-    f = open(meta_path, "rb")
-    table_nums = int.from_bytes(f.read(integer_length), byteorder="big", signed=False)
-    sok_var_info_list = [SOK_var_info()] * table_nums
-
-    # read KeyType
-    tmp_offset = get_meta_info_offset(MetaVarType.KeyType, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * integer_length)
-    key_type_list = convert_bytes_to_int_list(tmp_bytes, integer_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].key_type = key_type_list[i]
-
-    # read EmbType
-    tmp_offset = get_meta_info_offset(MetaVarType.EmbType, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * integer_length)
-    emb_type_list = convert_bytes_to_int_list(tmp_bytes, integer_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].emb_type = emb_type_list[i]
-
-    # read EmbLength
-    tmp_offset = get_meta_info_offset(MetaVarType.EmbLength, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * integer_length)
-    emb_length_list = convert_bytes_to_int_list(tmp_bytes, integer_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].emb_length = emb_length_list[i]
-
-    # read EmbNum
-    tmp_offset = get_meta_info_offset(MetaVarType.EmbNum, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * long_long_length)
-    emb_num_list = convert_bytes_to_int_list(tmp_bytes, long_long_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].emb_num = emb_num_list[i]
-
-    # read TableName
-    tmp_offset = get_meta_info_offset(MetaVarType.TableName, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * table_name_max_length)
-    emb_name_list = convert_bytes_to_string_list(tmp_bytes, table_name_max_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].emb_name = emb_name_list[i]
-
-    # read OptName
-    tmp_offset = get_meta_info_offset(MetaVarType.OptName, table_nums)
-    f.seek(tmp_offset, 0)
-    tmp_bytes = f.read(table_nums * opt_name_max_length)
-    opt_name_list = convert_bytes_to_string_list(tmp_bytes, opt_name_max_length)
-    for i in range(table_nums):
-        sok_var_info_list[i].opt_name = opt_name_list[i]
+    with open(meta_path, "rb") as f:
+        meta = decode_meta_info(f.read())
 
     sok_var_info_dict = {}
-    for i in range(table_nums):
-        sok_var_info_dict[sok_var_info_list[i].emb_name] = sok_var_info_list[i]
-
+    for i, table_name in enumerate(meta["table_name"]):
+        sok_var_info_dict[table_name] = SOK_var_info(
+            meta["opt_name"][i],
+            meta["key_type"][i],
+            meta["emb_type"][i],
+            meta["emb_num"][i],
+            meta["emb_length"][i],
+            table_name,
+        )
     return sok_var_info_dict
 
 
 def write_file_head(path, sok_var_info, var_type, var_name, data_index):
-    f = open(path, "wb")
-    f.write(
-        sok_var_info.emb_name.rjust(table_name_max_length, " ").encode()
-    )  # str save in binaray is utf-8
-    f.write(var_type.to_bytes(integer_length, "big", signed=False))
-    f.write(var_name.rjust(opt_var_name_max_length, " ").encode())  # str save in binaray is utf-8
-    f.write(data_index.to_bytes(integer_length, "big", signed=False))
-    f.close()
+    with open(path, "wb") as f:
+        f.write(encode_file_head(sok_var_info.emb_name, var_type, var_name, data_index))
     return
 
 
 def read_file_head(path):
-    f = open(path, "rb")
-    emb_name = f.read(table_name_max_length).decode().strip()
-    f.seek(table_name_max_length, 0)
-    file_type = FileType(int.from_bytes(f.read(integer_length), "big", signed=False))
-    f.seek(table_name_max_length + integer_length, 0)
-    var_name = f.read(opt_var_name_max_length).decode().strip()
-    f.seek(table_name_max_length + integer_length + opt_var_name_max_length, 0)
-    type_index = int.from_bytes(f.read(integer_length), "big", signed=False)
-
-    f.close()
-    return emb_name, file_type, var_name, type_index
+    emb_name, file_type, var_name, type_index = decode_file_head(read_file_heads([path])[0])
+    return emb_name, FileType(file_type), var_name, type_index
 
 
 def check_optimizer_is_valid(optimizer, dump_vars):
@@ -609,6 +506,8 @@ def save_table_to_filesystem_static(var, optimizer, path, have_states):
                     weight_np.tofile(femb)
                 del tmp_indice
                 del tmp_weight
+        if gpu_id == 0:
+            write_partition_index(key_path, global_gpu_num)
 
     else:
         if gpu_id == target_gpu:
@@ -725,6 +624,8 @@ def save_table_to_filesystem_dynamic(var, optimizer, path, have_states):
                     weight_np.tofile(femb)
                 del tmp_indice
                 del tmp_weight
+        if gpu_id == 0:
+            write_partition_index(key_path, global_gpu_num)
 
     else:
         if gpu_id == target_gpu:
@@ -799,6 +700,11 @@ def check_weight_file_valid(key_path, weight_path, optimizer_state_paths):
             % weight_path,
         )
     key_num = key_file_size / key_data_length
+    if key_num == 0:
+        # the shard of a rank which holds no key of the table
+        if weight_file_size != 0:
+            return False, "The key file(%s) is empty but the weight file is not" % key_path
+        return True, ""
 
     if (weight_file_size / emb_data_length) % key_num != 0:
         return (
@@ -830,7 +736,7 @@ def check_weight_file_valid(key_path, weight_path, optimizer_state_paths):
                     "The effective length of the optimizer state file(%s) is not divisible by key_num "
                     % optimizer_state_path,
                 )
-            if tmp_file_size / emb_data_length / key_num != ev_length:
+            if tmp_file_size / tmp_data_length / key_num != ev_length:
                 return (
                     False,
                     "the optimizer state file(%s)'s ev_length is not equal to weight file"
@@ -840,229 +746,499 @@ def check_weight_file_valid(key_path, weight_path, optimizer_state_paths):
     return True, ""
 
 
-def load_table_to_filesystem_static(var, optimizer, path):
-    global_gpu_num = num_gpus()
-    gpu_id = global_gpu_id()
+def get_table_name(var):
     table_name = var.name
     for i in string.punctuation:
         table_name = table_name.replace(i, "_")
-    key_path = path + "/" + table_name + "-key"
-    weight_path = path + "/" + table_name + "-weight"
-    if not os.path.exists(key_path) or not os.path.exists(weight_path):
-        raise Exception("can't find key or weight to load with table name:", table_name)
-    target_gpu = var.target_gpu
+    return table_name
 
-    optimizer_state_paths = []
-    optimizer_state_names = []
-    optimizer_name = ""
-    if optimizer is not None:
-        optimizer_name = get_sok_optimizer_name(optimizer)
-        slot_names = optimizer.get_slot_names()
-        for slot_name in slot_names:
-            optimizer_state_names.append(slot_name)
-            optimizer_state_paths.append(
-                path + "/" + table_name + "-" + optimizer_name + "-" + slot_name
-            )
 
-    file_valid, error_msg = check_weight_file_valid(key_path, weight_path, optimizer_state_paths)
-    if not file_valid:
-        raise Exception(error_msg)
+def get_shard_path(file_path, shard_id):
+    return file_path + ".shard%d" % shard_id
 
-    _, _, _, key_data_index = read_file_head(key_path)
-    _, _, _, emb_data_index = read_file_head(weight_path)
-    key_tf_dtype = data_type_convert.get_tf_dtype_by_index(key_data_index)
-    key_np_dtype = data_type_convert.get_np_dtype_by_index(key_data_index)
-    emb_tf_dtype = data_type_convert.get_tf_dtype_by_index(emb_data_index)
-    emb_np_dtype = data_type_convert.get_np_dtype_by_index(emb_data_index)
 
-    # is distribute
-    if target_gpu == -1:
-        num_ev = var.shape[0]
-        ev_length = var.shape[1]
+def load_sharded_manifest(path):
+    manifest_path = path + "/" + sharded_manifest_name
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version", 0) > sharded_format_version:
+        raise Exception(
+            "sharded checkpoint version %d is newer than supported version %d"
+            % (manifest.get("version", 0), sharded_format_version)
+        )
+    return manifest
+
+
+def save_sharded_manifest(path, table_names, num_keys, optimizer, with_states=True):
+    """Write the manifest of a sharded dump, num_keys is [num_shards, num_tables] with -1 for the
+    shards that a table doesn't have"""
+    manifest = {
+        "version": sharded_format_version,
+        "num_shards": int(num_keys.shape[0]),
+        "optimizer": get_sok_optimizer_name(optimizer),
+        "slot_names": (
+            list(optimizer.get_slot_names()) if optimizer is not None and with_states else []
+        ),
+        "tables": {},
+    }
+    for i, table_name in enumerate(table_names):
+        manifest["tables"][table_name] = {
+            "shards": [int(s) for s in np.flatnonzero(num_keys[:, i] >= 0)],
+            "num_keys": [int(n) for n in num_keys[:, i] if n >= 0],
+        }
+    write_sharded_manifest(path, manifest)
 
-        with open(key_path, "rb") as fkey:
-            fkey.seek(file_head_length, os.SEEK_SET)
-            indice_np = np.fromfile(fkey, dtype=key_np_dtype)
 
-        with open(weight_path, "rb") as femb:
-            femb.seek(file_head_length, os.SEEK_SET)
-            weight_np = np.fromfile(femb, dtype=emb_np_dtype).reshape((-1, ev_length))
-        mask_np = indice_np % global_gpu_num == gpu_id
-        indice_np = indice_np[mask_np]
-        weight_np = weight_np[mask_np]
+def write_data_file(path, sok_var_info, file_type, var_name, array, sync=False):
+    data_index = data_type_convert.convert_to_int(tf.as_dtype(array.dtype))
+    with open(path, mode="wb") as f:
+        f.write(encode_file_head(sok_var_info.emb_name, file_type, var_name, data_index))
+        array.tofile(f)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
 
-        indice = tf.convert_to_tensor(indice_np, dtype=key_tf_dtype)
-        weight = tf.convert_to_tensor(weight_np, dtype=emb_tf_dtype)
-        try:
-            var.assign(weight)
-        except:
-            raise Exception("weight file(%s)'s weight is not same with sok variable" % weight_path)
-        if len(optimizer_state_paths) > 0:
-            # activate_optimizer_state(optimizer, [var])
-            for i, optimizer_state_path in enumerate(optimizer_state_paths):
-                _, _, _, tmp_data_index = read_file_head(optimizer_state_path)
-                tmp_tf_dtype = data_type_convert.get_tf_dtype_by_index(tmp_data_index)
-                tmp_np_dtype = data_type_convert.get_np_dtype_by_index(tmp_data_index)
-
-                slot_var = optimizer.get_slot(var, optimizer_state_names[i])
-                with open(optimizer_state_path, "rb") as ftmp:
-                    ftmp.seek(file_head_length, os.SEEK_SET)
-                    tmp_state_np = np.fromfile(ftmp, dtype=tmp_np_dtype).reshape((-1, ev_length))
-                tmp_state_np = tmp_state_np[mask_np]
-                tmp_state = tf.convert_to_tensor(tmp_state_np, dtype=tmp_tf_dtype)
-                try:
-                    slot_var.assign(tmp_state)
-                except:
-                    raise Exception(
-                        "state file(%s)'s weight is not same with sok variable"
-                        % optimizer_state_path
-                    )
+
+def map_data_file(path, ev_length=None):
+    """Memory map the data of a weight file behind its file head"""
+    _, _, _, data_index = read_file_head(path)
+    np_dtype = data_type_convert.get_np_dtype_by_index(data_index)
+    data = map_data(path, np_dtype, file_head_length)
+    if ev_length is not None:
+        data = data.reshape((-1, ev_length))
+    return data
+
+
+def get_key_partition(keys, num_partitions):
+    # keep the modulo in the key type, uint64 keys mixed with python int become float64
+    return (keys % keys.dtype.type(num_partitions)).astype(np.int64)
+
+
+def get_partition_index_path(key_path, num_partitions):
+    return key_path + ".partition%d" % num_partitions
+
+
+def build_partition_index(key_path, num_partitions):
+    """
+    Build the index of the row ranges of each partition (``key % num_partitions``) of a key file,
+    as the start row and the partition of every run of consecutive rows in the same partition.
+    The index is saved next to the key file, so it is built only once.
+
+    A key file dumped with another number of gpus interleaves the partitions row by row, then the
+    number of runs approaches the number of keys. The index is dropped once it has more than
+    ``num_keys / min_rows_per_partition_run`` runs, and saved with -1 runs, so the loads mask the
+    keys instead. Returns None in this case.
+    """
+    keys = map_data_file(key_path)
+    num_keys = keys.shape[0]
+    max_num_runs = num_keys // min_rows_per_partition_run
+    run_starts, run_parts = [], []
+    num_runs = 0
+    last_part = -1
+    for begin in range(0, num_keys, load_chunk_rows):
+        part = get_key_partition(np.asarray(keys[begin : begin + load_chunk_rows]), num_partitions)
+        starts = np.flatnonzero(np.diff(part)) + 1
+        if part[0] != last_part:
+            starts = np.concatenate(([0], starts))
+        num_runs += starts.size
+        if num_runs > max_num_runs:
+            num_runs = -1
+            break
+        run_starts.append(starts + begin)
+        run_parts.append(part[starts])
+        last_part = part[-1]
+
+    index_path = get_partition_index_path(key_path, num_partitions)
+    if num_runs < 0:
+        run_index = None
+        index_np = np.array([num_partitions, num_keys, -1])
     else:
-        if gpu_id == target_gpu:
-            num_ev = var.shape[0]
-            ev_length = var.shape[1]
+        run_starts = np.concatenate(run_starts + [np.zeros(0, dtype=np.int64)])
+        run_parts = np.concatenate(run_parts + [np.zeros(0, dtype=np.int64)])
+        run_index = (run_starts, run_parts)
+        index_np = np.concatenate(([num_partitions, num_keys, num_runs], run_starts, run_parts))
+    tmp_index_path = index_path + ".tmp%d" % global_gpu_id()
+    try:
+        index_np.astype(np.int64).tofile(tmp_index_path)
+        os.replace(tmp_index_path, index_path)
+    except OSError:
+        # the index is only a cache, a read-only checkpoint folder is fine
+        pass
+    return run_index
 
-            with open(key_path, "rb") as fkey:
-                fkey.seek(file_head_length, os.SEEK_SET)
-                indice_np = np.fromfile(fkey, dtype=key_np_dtype)
-
-            with open(weight_path, "rb") as femb:
-                femb.seek(file_head_length, os.SEEK_SET)
-                weight_np = np.fromfile(femb, dtype=emb_np_dtype).reshape((-1, ev_length))
-
-            indice = tf.convert_to_tensor(indice_np, dtype=key_tf_dtype)
-            weight = tf.convert_to_tensor(weight_np, dtype=emb_tf_dtype)
-            try:
-                var.assign(weight)
-            except:
-                raise Exception(
-                    "weight file(%s)'s weight is not same with sok variable" % weight_path
-                )
-            if len(optimizer_state_paths) > 0:
-                # activate_optimizer_state(optimizer, [var])
-                for i, optimizer_state_path in enumerate(optimizer_state_paths):
-                    _, _, _, tmp_data_index = read_file_head(optimizer_state_path)
-                    tmp_tf_dtype = data_type_convert.get_tf_dtype_by_index(tmp_data_index)
-                    tmp_np_dtype = data_type_convert.get_np_dtype_by_index(tmp_data_index)
-
-                    slot_var = optimizer.get_slot(var, optimizer_state_names[i])
-                    with open(optimizer_state_path, "rb") as ftmp:
-                        ftmp.seek(file_head_length, os.SEEK_SET)
-                        tmp_state_np = np.fromfile(ftmp, dtype=tmp_np_dtype).reshape(
-                            (-1, ev_length)
-                        )
-                    tmp_state = tf.convert_to_tensor(tmp_state_np, dtype=tmp_tf_dtype)
-                    try:
-                        slot_var.assign(tmp_state)
-                    except:
-                        raise Exception(
-                            "state file(%s)'s weight is not same with sok variable"
-                            % optimizer_state_path
-                        )
 
-    return
+def remove_partition_index(key_path):
+    """Remove the partition indices of an old key file, when the key file is dumped again"""
+    for index_path in glob.glob(glob.escape(key_path) + ".partition*"):
+        os.remove(index_path)
+
+
+def write_partition_index(key_path, num_partitions):
+    remove_partition_index(key_path)
+    build_partition_index(key_path, num_partitions)
+
+
+def load_partition_index(key_path, num_partitions, num_keys):
+    index_path = get_partition_index_path(key_path, num_partitions)
+    if (
+        os.path.exists(index_path)
+        and os.stat(index_path).st_mtime_ns >= os.stat(key_path).st_mtime_ns
+    ):
+        index_np = np.fromfile(index_path, dtype=np.int64)
+        if index_np.size >= 3 and index_np[0] == num_partitions and index_np[1] == num_keys:
+            num_runs = int(index_np[2])
+            if num_runs < 0 and index_np.size == 3:
+                return None
+            if index_np.size == 3 + 2 * num_runs:
+                return index_np[3 : 3 + num_runs], index_np[3 + num_runs :]
+    return build_partition_index(key_path, num_partitions)
 
 
-def load_table_to_filesystem_dynamic(var, optimizer, path):
+def get_partition_rows(key_path, num_keys, num_partitions, partition):
+    """
+    Return the (start, stop) row ranges of a partition of a key file, or the array of its rows
+    when the key file has no partition index
+    """
+    run_index = load_partition_index(key_path, num_partitions, num_keys)
+    if run_index is None:
+        keys = map_data_file(key_path)
+        rows = [
+            np.flatnonzero(
+                get_key_partition(np.asarray(keys[begin : begin + load_chunk_rows]), num_partitions)
+                == partition
+            )
+            + begin
+            for begin in range(0, num_keys, load_chunk_rows)
+        ]
+        return np.concatenate(rows + [np.zeros(0, dtype=np.int64)])
+    run_starts, run_parts = run_index
+    run_stops = np.append(run_starts[1:], num_keys)
+    mask = run_parts == partition
+    return run_starts[mask], run_stops[mask]
+
+
+def take_rows(data, row_ranges):
+    """Copy the rows in the row ranges, or in an array of rows, out of a memory mapped file"""
+    if row_ranges is None:
+        return np.array(data)
+    if isinstance(row_ranges, np.ndarray):
+        return data[row_ranges]
+    starts, stops = row_ranges
+    if starts.size <= max_row_ranges_to_slice:
+        return np.concatenate([data[start:stop] for start, stop in zip(starts, stops)] + [data[:0]])
+    lengths = stops - starts
+    rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return data[rows]
+
+
+def read_table_rows(path, table_name, optimizer_name, slot_names, ev_length, distributed, manifest):
+    """
+    Read the keys, weights and optimizer states of a table that belong to this rank, from either
+    the single file or the sharded layout. The rows of a distributed table are selected by
+    ``key % num_gpus``, a localized table is read entirely. The bfloat16 and int8 weights are
+    dequantized to float32.
+
+    The files are memory mapped, and only the row ranges of this rank are read according to the
+    partition index of the key file, so the I/O and the host memory of every rank scale with its
+    own shard instead of the whole table.
+    """
     global_gpu_num = num_gpus()
     gpu_id = global_gpu_id()
-    table_name = var.name
-    for i in string.punctuation:
-        table_name = table_name.replace(i, "_")
     key_path = path + "/" + table_name + "-key"
     weight_path = path + "/" + table_name + "-weight"
-    if not os.path.exists(key_path) or not os.path.exists(weight_path):
-        raise Exception("can't find key or weight to load with table name:", table_name)
-    target_gpu = var.target_gpu
+    scale_path = path + "/" + table_name + "-scale"
+    state_paths = [
+        path + "/" + table_name + "-" + optimizer_name + "-" + slot_name for slot_name in slot_names
+    ]
 
-    optimizer_state_paths = []
-    optimizer_state_names = []
+    file_groups = []
+    if manifest is None:
+        if not os.path.exists(key_path) or not os.path.exists(weight_path):
+            raise Exception("can't find key or weight to load with table name:", table_name)
+        file_groups.append((key_path, weight_path, scale_path, state_paths))
+        need_mask = distributed
+    else:
+        table_info = manifest["tables"].get(table_name)
+        if table_info is None:
+            raise Exception("can't find table in sharded checkpoint, table name:", table_name)
+        shard_ids = table_info["shards"]
+        # a distributed table dumped with the same number of gpus is already partitioned
+        need_mask = distributed and manifest["num_shards"] != global_gpu_num
+        if distributed and not need_mask:
+            shard_ids = [shard_id for shard_id in shard_ids if shard_id == gpu_id]
+        for shard_id in shard_ids:
+            file_groups.append(
+                (
+                    get_shard_path(key_path, shard_id),
+                    get_shard_path(weight_path, shard_id),
+                    get_shard_path(scale_path, shard_id),
+                    [get_shard_path(state_path, shard_id) for state_path in state_paths],
+                )
+            )
+    if len(file_groups) == 0:
+        raise Exception("can't find shard to load with table name:", table_name)
+
+    indice_list, weight_list, state_lists = [], [], [[] for _ in state_paths]
+    for tmp_key_path, tmp_weight_path, tmp_scale_path, tmp_state_paths in file_groups:
+        file_valid, error_msg = check_weight_file_valid(
+            tmp_key_path, tmp_weight_path, tmp_state_paths
+        )
+        if not file_valid:
+            raise Exception(error_msg)
+        keys = map_data_file(tmp_key_path)
+        row_ranges = None
+        if need_mask:
+            row_ranges = get_partition_rows(tmp_key_path, keys.shape[0], global_gpu_num, gpu_id)
+        indice_list.append(take_rows(keys, row_ranges))
+        weight_np = take_rows(map_data_file(tmp_weight_path, ev_length), row_ranges)
+        weight_type_name = data_type_names[read_file_head(tmp_weight_path)[3]]
+        if weight_type_name in ("bfloat16", "int8"):
+            # the weights of sok.dump(..., quantize=...)
+            scale_np = None
+            if weight_type_name == "int8":
+                if not os.path.exists(tmp_scale_path):
+                    raise Exception("scale file %s is not exist" % tmp_scale_path)
+                scale_np = take_rows(map_data_file(tmp_scale_path, 1), row_ranges)
+            weight_np = dequantize_rows(weight_np, weight_type_name, scale_np)
+        weight_list.append(weight_np)
+        for i, tmp_state_path in enumerate(tmp_state_paths):
+            state_lists[i].append(take_rows(map_data_file(tmp_state_path, ev_length), row_ranges))
+    indice_np = np.concatenate(indice_list)
+    weight_np = np.concatenate(weight_list)
+    state_nps = [np.concatenate(state_list) for state_list in state_lists]
+
+    if need_mask:
+        # keep the rows in key order, so a static table is assigned in its local order
+        order = np.argsort(indice_np, kind="stable")
+        indice_np = indice_np[order]
+        weight_np = weight_np[order]
+        state_nps = [state_np[order] for state_np in state_nps]
+    return indice_np, weight_np, state_nps
+
+
+def get_optimizer_state_names(optimizer):
     optimizer_name = ""
+    optimizer_state_names = []
     if optimizer is not None:
         optimizer_name = get_sok_optimizer_name(optimizer)
+        optimizer_state_names = list(optimizer.get_slot_names())
+    return optimizer_name, optimizer_state_names
+
+
+def get_load_state_names(optimizer, path, table_name, manifest):
+    """
+    Return the optimizer name and the names of the optimizer states to load, no state when the
+    table is dumped without optimizer states, then the optimizer keeps its initial states.
+    """
+    optimizer_name, optimizer_state_names = get_optimizer_state_names(optimizer)
+    if manifest is not None:
+        have_states = len(manifest["slot_names"]) > 0
+    else:
+        have_states = any(
+            os.path.exists(path + "/" + table_name + "-" + optimizer_name + "-" + slot_name)
+            for slot_name in optimizer_state_names
+        )
+    if optimizer_state_names and not have_states:
+        print("[SOK INFO] table %s is dumped without optimizer states" % table_name)
+        optimizer_state_names = []
+    return optimizer_name, optimizer_state_names
+
+
+def load_table_to_filesystem_static(var, optimizer, path, manifest=None):
+    gpu_id = global_gpu_id()
+    table_name = get_table_name(var)
+    target_gpu = var.target_gpu
+    if target_gpu != -1 and gpu_id != target_gpu:
+        return
+    optimizer_name, optimizer_state_names = get_load_state_names(
+        optimizer, path, table_name, manifest
+    )
+
+    indice_np, weight_np, state_nps = read_table_rows(
+        path,
+        table_name,
+        optimizer_name,
+        optimizer_state_names,
+        var.shape[1],
+        target_gpu == -1,
+        manifest,
+    )
+    weight = tf.convert_to_tensor(weight_np.astype(var.dtype.as_numpy_dtype, copy=False))
+    try:
+        var.assign(weight)
+    except:
+        raise Exception("weight file of table %s is not same with sok variable" % table_name)
+    # activate_optimizer_state(optimizer, [var])
+    for i, tmp_state_np in enumerate(state_nps):
+        slot_var = optimizer.get_slot(var, optimizer_state_names[i])
+        tmp_state = tf.convert_to_tensor(tmp_state_np)
+        try:
+            slot_var.assign(tmp_state)
+        except:
+            raise Exception(
+                "state file of table %s slot %s is not same with sok variable"
+                % (table_name, optimizer_state_names[i])
+            )
+    return
+
+
+def load_table_to_filesystem_dynamic(var, optimizer, path, manifest=None):
+    gpu_id = global_gpu_id()
+    table_name = get_table_name(var)
+    target_gpu = var.target_gpu
+    if target_gpu != -1 and gpu_id != target_gpu:
+        return
+    optimizer_name, optimizer_state_names = get_load_state_names(
+        optimizer, path, table_name, manifest
+    )
+
+    indice_np, weight_np, state_nps = read_table_rows(
+        path,
+        table_name,
+        optimizer_name,
+        optimizer_state_names,
+        var.dimension,
+        target_gpu == -1,
+        manifest,
+    )
+    indice = tf.convert_to_tensor(indice_np)
+    weight = tf.convert_to_tensor(weight_np.astype(var.handle_dtype.as_numpy_dtype, copy=False))
+    assign(var, indice, weight)
+    # activate_optimizer_state(optimizer, [var])
+    for i, tmp_state_np in enumerate(state_nps):
+        slot_var = optimizer.get_slot(var, optimizer_state_names[i])
+        tmp_state = tf.convert_to_tensor(tmp_state_np)
+        assign(slot_var, indice, tmp_state)
+
+
+def get_local_table_rows(var, optimizer, have_states, updated_only=False):
+    """
+    Get the keys, weights and optimizer states of a table held by this rank as numpy arrays,
+    the rows of a dynamic table are sorted by key. Return None if the rank doesn't hold the table.
+    With updated_only, only the rows of a dynamic table updated since the last dump are read.
+    """
+    global_gpu_num = num_gpus()
+    gpu_id = global_gpu_id()
+    target_gpu = var.target_gpu
+    if target_gpu != -1 and gpu_id != target_gpu:
+        return None
+    slot_names = []
+    if optimizer != None and have_states[0]:
         slot_names = optimizer.get_slot_names()
+
+    state_nps = []
+    if isinstance(var, DynamicVariable) and updated_only:
+        indice_np = np.sort(optimizer.get_updated_keys(var).numpy())
+        indice = tf.convert_to_tensor(indice_np)
+        weight_np = var.sparse_read(indice).numpy()
+        for slot_name in slot_names:
+            state_nps.append(optimizer.get_slot(var, slot_name).sparse_read(indice).numpy())
+    elif isinstance(var, DynamicVariable):
+        indice, weight = export(var)
+        indice_np = indice.numpy()
+        sort_indice_index = np.argsort(indice_np)
+        indice_np = indice_np[sort_indice_index]
+        weight_np = weight.numpy()[sort_indice_index]
+        for slot_name in slot_names:
+            state_indice, state = export(optimizer.get_slot(var, slot_name))
+            state_nps.append(state.numpy()[np.argsort(state_indice.numpy())])
+    else:
+        num_ev = var.shape[0]
+        if target_gpu == -1:
+            indice_np = np.arange(int(num_ev), dtype=np.int64) * global_gpu_num + gpu_id
+        else:
+            indice_np = np.arange(num_ev, dtype=np.uint64)
+        weight_np = tf.convert_to_tensor(var, var.dtype).numpy()
         for slot_name in slot_names:
-            optimizer_state_names.append(slot_name)
-            optimizer_state_paths.append(
-                path + "/" + table_name + "-" + optimizer_name + "-" + slot_name
+            slot_var = optimizer.get_slot(var, slot_name)
+            state_nps.append(tf.convert_to_tensor(slot_var, dtype=slot_var.dtype).numpy())
+    return indice_np, weight_np, state_nps
+
+
+def get_table_shard_files(path, table_name, optimizer, local_rows, quantize=None):
+    """
+    Return the (path, sok_var_info, file type, var name, data) of the shard files of a table,
+    the weights are converted to the dtype of quantize if it is not None.
+    """
+    gpu_id = global_gpu_id()
+    indice_np, weight_np, state_nps = local_rows
+    scale_np = None
+    if quantize is not None:
+        weight_np, scale_np = quantize_rows(weight_np, quantize)
+        if quantize == "bfloat16":
+            weight_np = weight_np.view(tf.bfloat16.as_numpy_dtype)
+
+    sok_var_info = SOK_var_info()
+    sok_var_info.opt_name = get_sok_optimizer_name(optimizer)
+    sok_var_info.key_type = data_type_convert.convert_to_int(tf.as_dtype(indice_np.dtype))
+    sok_var_info.emb_type = data_type_convert.convert_to_int(tf.as_dtype(weight_np.dtype))
+    sok_var_info.emb_num = indice_np.shape[0]
+    sok_var_info.emb_length = weight_np.shape[1]
+
+    key_path = path + "/" + table_name + "-key"
+    weight_path = path + "/" + table_name + "-weight"
+    shard_files = [
+        (get_shard_path(key_path, gpu_id), sok_var_info, FileType.Key.value, "", indice_np),
+        (get_shard_path(weight_path, gpu_id), sok_var_info, FileType.Emb.value, "", weight_np),
+    ]
+    if scale_np is not None:
+        scale_path = path + "/" + table_name + "-scale"
+        shard_files.append(
+            (get_shard_path(scale_path, gpu_id), sok_var_info, FileType.Scale.value, "", scale_np)
+        )
+    if len(state_nps) > 0:
+        optimizer_name = get_sok_optimizer_name(optimizer)
+        for slot_name, state_np in zip(optimizer.get_slot_names(), state_nps):
+            slot_path = path + "/" + table_name + "-" + optimizer_name + "-" + slot_name
+            shard_files.append(
+                (
+                    get_shard_path(slot_path, gpu_id),
+                    sok_var_info,
+                    FileType.OptState.value,
+                    slot_name,
+                    state_np,
+                )
             )
+    return shard_files
 
-    file_valid, error_msg = check_weight_file_valid(key_path, weight_path, optimizer_state_paths)
-    if not file_valid:
-        raise Exception(error_msg)
 
-    _, _, _, key_data_index = read_file_head(key_path)
-    _, _, _, emb_data_index = read_file_head(weight_path)
-    key_tf_dtype = data_type_convert.get_tf_dtype_by_index(key_data_index)
-    key_np_dtype = data_type_convert.get_np_dtype_by_index(key_data_index)
-    emb_tf_dtype = data_type_convert.get_tf_dtype_by_index(emb_data_index)
-    emb_np_dtype = data_type_convert.get_np_dtype_by_index(emb_data_index)
+def write_shard_file(file_path, sok_var_info, file_type, var_name, array, sync=False):
+    write_data_file(file_path, sok_var_info, file_type, var_name, array, sync)
+    if file_type == FileType.Key.value:
+        remove_partition_index(file_path)
+    if file_type == FileType.Emb.value and array.dtype != np.int8:
+        # the scales of an older int8 dump of the table
+        folder, file_name = os.path.split(file_path)
+        scale_path = os.path.join(folder, file_name.replace("-weight", "-scale", 1))
+        if os.path.exists(scale_path):
+            os.remove(scale_path)
 
-    # is distribute
-    if target_gpu == -1:
-        ev_length = var.shape[1]
-        with open(key_path, "rb") as fkey:
-            fkey.seek(file_head_length, os.SEEK_SET)
-            indice_np = np.fromfile(fkey, dtype=key_np_dtype)
-
-        with open(weight_path, "rb") as femb:
-            femb.seek(file_head_length, os.SEEK_SET)
-            weight_np = np.fromfile(femb, dtype=emb_np_dtype).reshape((-1, ev_length))
-
-        mask_np = indice_np % global_gpu_num == gpu_id
-        indice_np = indice_np[mask_np]
-        weight_np = weight_np[mask_np]
-
-        indice = tf.convert_to_tensor(indice_np, dtype=key_tf_dtype)
-        weight = tf.convert_to_tensor(weight_np, dtype=emb_tf_dtype)
-        assign(var, indice, weight)
-        if len(optimizer_state_paths) > 0:
-            # activate_optimizer_state(optimizer, [var])
-            for i, optimizer_state_path in enumerate(optimizer_state_paths):
-                _, _, _, tmp_data_index = read_file_head(optimizer_state_path)
-                tmp_tf_dtype = data_type_convert.get_tf_dtype_by_index(tmp_data_index)
-                tmp_np_dtype = data_type_convert.get_np_dtype_by_index(tmp_data_index)
-
-                slot_var = optimizer.get_slot(var, optimizer_state_names[i])
-                with open(optimizer_state_path, "rb") as ftmp:
-                    ftmp.seek(file_head_length, os.SEEK_SET)
-                    tmp_state_np = np.fromfile(ftmp, dtype=tmp_np_dtype).reshape((-1, ev_length))
-                tmp_state_np = tmp_state_np[mask_np]
-                tmp_state = tf.convert_to_tensor(tmp_state_np, dtype=tmp_tf_dtype)
-                assign(slot_var, indice, tmp_state)
 
-    else:
-        if gpu_id == target_gpu:
-            ev_length = var.dimension
-            with open(key_path, "rb") as fkey:
-                fkey.seek(file_head_length, os.SEEK_SET)
-                indice_np = np.fromfile(fkey, dtype=key_np_dtype)
-
-            with open(weight_path, "rb") as femb:
-                femb.seek(file_head_length, os.SEEK_SET)
-                weight_np = np.fromfile(femb, dtype=emb_np_dtype).reshape((-1, ev_length))
-
-            indice = tf.convert_to_tensor(indice_np, dtype=key_tf_dtype)
-            weight = tf.convert_to_tensor(weight_np, dtype=emb_tf_dtype)
-            assign(var, indice, weight)
-            if len(optimizer_state_paths) > 0:
-                # activate_optimizer_state(optimizer, [var])
-                for i, optimizer_state_path in enumerate(optimizer_state_paths):
-                    _, _, _, tmp_data_index = read_file_head(optimizer_state_path)
-                    tmp_tf_dtype = data_type_convert.get_tf_dtype_by_index(tmp_data_index)
-                    tmp_np_dtype = data_type_convert.get_np_dtype_by_index(tmp_data_index)
-
-                    slot_var = optimizer.get_slot(var, optimizer_state_names[i])
-                    with open(optimizer_state_path, "rb") as ftmp:
-                        ftmp.seek(file_head_length, os.SEEK_SET)
-                        tmp_state_np = np.fromfile(ftmp, dtype=tmp_np_dtype).reshape(
-                            (-1, ev_length)
-                        )
-                    tmp_state = tf.convert_to_tensor(tmp_state_np, dtype=tmp_tf_dtype)
-                    assign(slot_var, indice, tmp_state)
-
-
-def dump_per_table(var, optimizer, path, have_states):
+def save_table_shard(var, optimizer, path, have_states, updated_only=False, quantize=None):
+    """
+    Write the rows of a table held by this rank into its own shard files, every rank writes in
+    parallel without gathering to rank 0. Return the number of keys written, -1 if the rank
+    doesn't hold the table.
+    """
+    local_rows = get_local_table_rows(var, optimizer, have_states, updated_only)
+    if local_rows is None:
+        return -1
+    table_name = get_table_name(var)
+    for shard_file in get_table_shard_files(path, table_name, optimizer, local_rows, quantize):
+        write_shard_file(*shard_file)
+    return local_rows[0].shape[0]
+
+
+def dump_per_table(
+    var, optimizer, path, have_states, sharded=False, updated_only=False, quantize=None
+):
+    if sharded:
+        if not isinstance(var, (DynamicVariable, DistributedVariable, LocalizedVariable)):
+            raise Exception("dump table type should be sok.DynamicVariable or sok.Variable")
+        return save_table_shard(var, optimizer, path, have_states, updated_only, quantize)
+
     if isinstance(var, DynamicVariable):
         save_table_to_filesystem_dynamic(var, optimizer, path, have_states)
 
@@ -1076,14 +1252,14 @@ def dump_per_table(var, optimizer, path, have_states):
         raise Exception("dump table type should be sok.DynamicVariable or sok.Variable")
 
 
-def load_per_table(var, optimizer, path):
+def load_per_table(var, optimizer, path, manifest=None):
     if isinstance(var, DynamicVariable):
-        load_table_to_filesystem_dynamic(var, optimizer, path)
+        load_table_to_filesystem_dynamic(var, optimizer, path, manifest)
     elif isinstance(var, DistributedVariable):
-        load_table_to_filesystem_static(var, optimizer, path)
+        load_table_to_filesystem_static(var, optimizer, path, manifest)
 
     elif isinstance(var, LocalizedVariable):
-        load_table_to_filesystem_static(var, optimizer, path)
+        load_table_to_filesystem_static(var, optimizer, path, manifest)
     else:
         raise Exception("load table type should be sok.DynamicVariable or sok.Variable")
 
@@ -1099,8 +1275,18 @@ def load_table(path, load_vars, optimizer):
                 "the type of your input optimizer is not tf.optimizers.Optimizer or sok.optimizer.OptimizerWrapper, please checkout your dump optimizer input"
             )
         activate_optimizer_state(optimizer, load_vars)
+    manifest = load_sharded_manifest(path)
     for var in load_vars:
-        load_per_table(var, optimizer, path)
+        load_per_table(var, optimizer, path, manifest)
+    # replay the incremental dumps over the full dump
+    for delta_path in list_delta_segments(path):
+        delta_manifest = load_sharded_manifest(delta_path)
+        if delta_manifest is None:
+            # an interrupted incremental dump, whose keys are in the next one
+            continue
+        for var in load_vars:
+            if get_table_name(var) in delta_manifest["tables"]:
+                load_per_table(var, optimizer, delta_path, delta_manifest)
 
     ar_flag_np = np.arange(1)
     ar_flag = tf.convert_to_tensor(ar_flag_np, dtype=tf.int32)
@@ -1108,7 +1294,7 @@ def load_table(path, load_vars, optimizer):
     return
 
 
-def dump_table(path, dump_vars, optimizer):
+def check_dump_optimizer_type(optimizer):
     if optimizer is not None:
         if (
             (not isinstance(optimizer, tf.keras.optimizers.Optimizer))
@@ -1118,17 +1304,163 @@ def dump_table(path, dump_vars, optimizer):
             raise Exception(
                 "the type of your input optimizer is not tf.optimizers.Optimizer or sok.optimizer.OptimizerWrapper, please checkout your dump optimizer input"
             )
+
+
+def dump_table(
+    path,
+    dump_vars,
+    optimizer,
+    sharded=False,
+    updated_only=False,
+    quantize=None,
+    with_optimizer_states=True,
+):
+    check_dump_optimizer_type(optimizer)
     # have_states: first element is all_var_have_state, second element is all_var_not_have_state
     have_states = check_optimizer_is_valid(optimizer, dump_vars)
-    for var in dump_vars:
-        dump_per_table(var, optimizer, path, have_states)
+    if not with_optimizer_states:
+        have_states = (False, True)
+    gpu_id = global_gpu_id()
+    if gpu_id == 0 and not updated_only:
+        # a full dump replaces the incremental dumps of the old one
+        remove_delta_segments(path)
+    if sharded or updated_only:
+        error = None
+        try:
+            num_keys = [
+                dump_per_table(var, optimizer, path, have_states, True, updated_only, quantize)
+                for var in dump_vars
+            ]
+        except Exception as e:
+            error = e
+        raise_if_any_rank_failed(error, "SOK dump to %s" % path)
+        # the allgather waits for the shards of all ranks, then rank 0 writes the manifest
+        num_keys = allgather(tf.convert_to_tensor(num_keys, dtype=tf.int64)).numpy()
+        if gpu_id == 0:
+            table_names = [get_table_name(var) for var in dump_vars]
+            num_keys = num_keys.reshape((-1, len(dump_vars)))
+            save_sharded_manifest(path, table_names, num_keys, optimizer, with_optimizer_states)
+    else:
+        # a single file dump replaces a sharded dump in the same folder
+        manifest_path = path + "/" + sharded_manifest_name
+        if gpu_id == 0 and os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        for var in dump_vars:
+            if gpu_id == 0 and (optimizer is None or not have_states[0]):
+                # sok.load would read the optimizer states of an older dump of the table
+                remove_optimizer_state_files(path, get_table_name(var))
+            dump_per_table(var, optimizer, path, have_states)
     ar_flag_np = np.arange(1)
     ar_flag = tf.convert_to_tensor(ar_flag_np, dtype=tf.int32)
     _ = allreduce(ar_flag, op="sum")
+    if getattr(optimizer, "track_updated_keys", False):
+        optimizer.reset_updated_keys()
     return
 
 
-def dump(path, dump_vars, optimizer=None):
+def raise_if_any_rank_failed(error, what):
+    """
+    Raise on all ranks if ``error`` is set on any rank. It is a collective call, every rank has
+    to take part even if it failed, or the other ranks hang in their next collective.
+    """
+    num_failed = allreduce(
+        tf.convert_to_tensor([0 if error is None else 1], dtype=tf.int32), op="sum"
+    )
+    num_failed = int(num_failed.numpy()[0])
+    if error is not None:
+        raise Exception("%s failed" % what) from error
+    if num_failed > 0:
+        raise Exception("%s failed on %d other ranks" % (what, num_failed))
+
+
+def remove_optimizer_state_files(path, table_name):
+    """Remove the ``<table>-<optimizer>-<state>`` files of the single file layout of a table"""
+    for state_path in glob.glob(glob.escape(path + "/" + table_name) + "-*-*"):
+        # the table names have no "-" or ".", skip the shard files of the sharded layout
+        if "." not in os.path.basename(state_path):
+            os.remove(state_path)
+
+
+def get_delta_segment_path(path, segment_id):
+    return path + "/" + delta_segment_prefix + "%06d" % segment_id
+
+
+def remove_delta_segments(path):
+    for delta_path in list_delta_segments(path):
+        shutil.rmtree(delta_path)
+
+
+def dump_delta_table(path, dump_vars, optimizer, quantize=None, with_optimizer_states=True):
+    """
+    Dump the rows of sok.DynamicVariable updated since the last dump into a new folder
+    ``delta_<id>`` of a full dump, in the sharded layout. sok.Variable is dumped entirely.
+    """
+    if not getattr(optimizer, "track_updated_keys", False):
+        raise Exception(
+            "incremental dump needs the optimizer wrapped by sok.OptimizerWrapper(optimizer, track_updated_keys=True)"
+        )
+    manifest = load_sharded_manifest(path)
+    for var in dump_vars:
+        table_name = get_table_name(var)
+        if (manifest is None or table_name not in manifest["tables"]) and not os.path.exists(
+            path + "/" + table_name + "-key"
+        ):
+            raise Exception("incremental dump needs a full dump of table first:", table_name)
+    delta_path = get_delta_segment_path(path, len(list_delta_segments(path)))
+    # all ranks list the incremental dumps before the new one is created
+    ar_flag = tf.convert_to_tensor(np.arange(1), dtype=tf.int32)
+    _ = allreduce(ar_flag, op="sum")
+    os.makedirs(delta_path, exist_ok=True)
+    dump_table(
+        delta_path,
+        dump_vars,
+        optimizer,
+        updated_only=True,
+        quantize=quantize,
+        with_optimizer_states=with_optimizer_states,
+    )
+
+
+def check_quantize(quantize, sharded):
+    if quantize is None:
+        return
+    if quantize not in quantized_type_names:
+        raise Exception(
+            "quantize should be one of %s, but got %s" % (quantized_type_names, quantize)
+        )
+    if not sharded:
+        raise Exception("quantize is only supported by the sharded layout, please set sharded=True")
+
+
+def prepare_dump_inputs(path, dump_vars, optimizer):
+    try:
+        os.makedirs(path, exist_ok=True)
+    except:
+        raise Exception("can't build path:", path)
+    is_list = isinstance(dump_vars, list) or isinstance(dump_vars, tuple)
+    if not is_list:
+        dump_vars = [dump_vars]
+    assert isinstance(dump_vars, list) or isinstance(dump_vars, tuple)
+
+    if any(dump_var is None for dump_var in dump_vars):
+        raise Exception("the input of your sok variables have none ,please")
+
+    if isinstance(optimizer, list) or isinstance(optimizer, tuple):
+        if len(optimizer) > 1:
+            raise Exception("Only support dump one optmizer state")
+        optimizer = optimizer[0] if len(optimizer) == 1 else None
+    return dump_vars, optimizer
+
+
+def dump(
+    path,
+    dump_vars,
+    optimizer=None,
+    sharded=False,
+    incremental=False,
+    quantize=None,
+    with_optimizer_states=True,
+):
     """
     Abbreviated as ``sok.dump``.
 
@@ -1148,6 +1480,27 @@ def dump(path, dump_vars, optimizer=None):
                Can be a single or list of sok.Variable and sok.DynamicVariable
     optimizer: SOK.OptimizerWrapper,optional,default is None
                when model train , need to dump optimizer state,input ``sok.OptimizerWrapper``
+    sharded: bool,optional,default is False
+             when True, every rank writes the rows it holds into its own shard files in parallel,
+             named ``<table>-key.shard<rank>`` and so on, instead of gathering them to rank 0.
+             Rank 0 writes a ``sharded_manifest.json`` with the shards and key counts of each
+             table. ``sok.load`` reads both layouts.
+    incremental: bool,optional,default is False
+                 when True, only the rows of sok.DynamicVariable updated since the last dump are
+                 written, into a new ``delta_<id>`` folder of the full dump in ``path``.
+                 The optimizer must be ``sok.OptimizerWrapper(optimizer, track_updated_keys=True)``.
+                 ``sok.load`` replays the incremental dumps over the full dump, and a full dump
+                 removes the incremental dumps of the old one.
+    quantize: string,optional,default is None
+              when set to ``float16``, ``bfloat16`` or ``int8``, the weights are written in this
+              dtype to reduce the size of the checkpoint, int8 weights have a float32 scale per row
+              in ``<table>-scale`` files. It needs the sharded layout or incremental dumps.
+              ``sok.load`` converts the weights back to the dtype of the variables. The int8
+              dtype raises an exception on all ranks if any rank has weights with inf or NaN.
+    with_optimizer_states: bool,optional,default is True
+                           when False, the optimizer states are not written, e.g. for inference,
+                           and ``sok.load`` keeps the initial optimizer states of such tables.
+                           The optimizer is still needed by incremental dumps.
 
     Returns
     -------
@@ -1181,33 +1534,167 @@ def dump(path, dump_vars, optimizer=None):
 
         sok.dump(path,v,optimizer)
     """
-    try:
-        os.makedirs(path, exist_ok=True)
-    except:
-        raise Exception("can't build path:", path)
-    is_list = isinstance(dump_vars, list) or isinstance(dump_vars, tuple)
-    if not is_list:
-        dump_vars = [dump_vars]
-    assert isinstance(dump_vars, list) or isinstance(dump_vars, tuple)
+    dump_vars, optimizer = prepare_dump_inputs(path, dump_vars, optimizer)
+    check_quantize(quantize, sharded or incremental)
+    wait_pending_dump()
+    if incremental:
+        dump_delta_table(path, dump_vars, optimizer, quantize, with_optimizer_states)
+    else:
+        dump_table(path, dump_vars, optimizer, sharded, False, quantize, with_optimizer_states)
+    print("[SOK INFO] SOK dump weight in path:", path, " success!")
+    return
 
-    have_none = False
-    not_sok_variable = False
-    for dump_var in dump_vars:
-        if dump_vars == None:
-            have_none = True
-    if have_none:
-        raise Exception("the input of your sok variables have none ,please")
 
-    if isinstance(optimizer, list) or isinstance(optimizer, tuple):
-        if len(optimizer) > 1:
-            raise Exception("Only support dump one optmizer state")
-        if len(optimizer) == 0:
-            optimizer = None
-        optimizer = optimizer[0]
+_pending_dump = None
 
-    dump_table(path, dump_vars, optimizer)
-    print("[SOK INFO] SOK dump weight in path:", path, " success!")
-    return
+
+def wait_pending_dump():
+    global _pending_dump
+    if _pending_dump is not None:
+        pending_dump, _pending_dump = _pending_dump, None
+        pending_dump.wait()
+
+
+class DumpHandle:
+    """
+    The handle of an asynchronous dump returned by ``sok.dump_async``.
+
+    The files of this rank are written by a thread pool in the background. ``wait`` must be
+    called by all ranks, it waits for the files of all ranks and then writes the manifest of
+    the sharded checkpoint, so the checkpoint can be loaded only after ``wait`` returns.
+    """
+
+    def __init__(self, path, executor, futures, table_names, num_keys, optimizer, with_states=True):
+        self._path = path
+        self._executor = executor
+        self._futures = futures
+        self._table_names = table_names
+        self._num_keys = num_keys
+        self._optimizer = optimizer
+        self._with_states = with_states
+        self._finished = False
+
+    def done(self):
+        """Whether the files of this rank are written, it doesn't mean the checkpoint is complete"""
+        return all(future.done() for future in self._futures)
+
+    def wait(self):
+        """
+        Wait until the checkpoint is durable on all ranks, it is a collective call. If the writer
+        threads of any rank fail, all ranks raise and the manifest is not written.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        error = None
+        try:
+            for future in self._futures:
+                # the exception of the writer thread if any
+                future.result()
+        except Exception as e:
+            error = e
+        finally:
+            self._executor.shutdown()
+        raise_if_any_rank_failed(error, "SOK async dump to %s" % self._path)
+        ar_flag = tf.convert_to_tensor(np.arange(1), dtype=tf.int32)
+        if global_gpu_id() == 0:
+            save_sharded_manifest(
+                self._path,
+                self._table_names,
+                self._num_keys,
+                self._optimizer,
+                self._with_states,
+            )
+        _ = allreduce(ar_flag, op="sum")
+        print("[SOK INFO] SOK async dump weight in path:", self._path, " success!")
+
+
+def dump_async(
+    path,
+    dump_vars,
+    optimizer=None,
+    num_threads=None,
+    quantize=None,
+    with_optimizer_states=True,
+):
+    """
+    Abbreviated as ``sok.dump_async``.
+
+    Dump the embedding tables into one folder asynchronously, in the sharded layout of
+    ``sok.dump(..., sharded=True)``.
+
+    The keys, weights and optimizer states held by this rank are copied to host memory before
+    returning, so the training can update the variables right after. The files are written by
+    a thread pool in the background. Call ``wait`` of the returned handle on all ranks to wait
+    until the checkpoint is complete, a new dump or load waits for the pending dump as well.
+
+    Parameters
+    ----------
+    path: string
+          weight file folder
+    dump_vars: List,Tuple,SOK Variable
+               Can be a single or list of sok.Variable and sok.DynamicVariable
+    optimizer: SOK.OptimizerWrapper,optional,default is None
+               when model train , need to dump optimizer state,input ``sok.OptimizerWrapper``
+    num_threads: int,optional,default is None
+                 the number of threads writing the files, default to the ThreadPoolExecutor
+                 default
+    quantize: string,optional,default is None
+              the dtype of the weights in the files, see ``sok.dump``
+    with_optimizer_states: bool,optional,default is True
+                           whether to write the optimizer states, see ``sok.dump``
+
+    Returns
+    -------
+    handle: DumpHandle
+            the handle to wait for the dump
+
+    Example
+    -------
+    .. code-block:: python
+
+        handle = sok.dump_async(path, sok_vars, optimizer)
+        for i in range(iters):
+            loss = step(sok_vars, indices[i])
+        handle.wait()
+    """
+    global _pending_dump
+    dump_vars, optimizer = prepare_dump_inputs(path, dump_vars, optimizer)
+    check_quantize(quantize, True)
+    wait_pending_dump()
+    check_dump_optimizer_type(optimizer)
+    have_states = check_optimizer_is_valid(optimizer, dump_vars)
+    if not with_optimizer_states:
+        have_states = (False, True)
+
+    # the old manifest is removed first, so an incomplete dump can't be loaded
+    manifest_path = path + "/" + sharded_manifest_name
+    if global_gpu_id() == 0:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        remove_delta_segments(path)
+
+    local_rows_list = [get_local_table_rows(var, optimizer, have_states) for var in dump_vars]
+    if getattr(optimizer, "track_updated_keys", False):
+        optimizer.reset_updated_keys()
+    num_keys = [
+        -1 if local_rows is None else local_rows[0].shape[0] for local_rows in local_rows_list
+    ]
+    num_keys = allgather(tf.convert_to_tensor(num_keys, dtype=tf.int64)).numpy()
+    num_keys = num_keys.reshape((-1, len(dump_vars)))
+
+    executor = ThreadPoolExecutor(max_workers=num_threads)
+    futures = []
+    table_names = [get_table_name(var) for var in dump_vars]
+    for table_name, local_rows in zip(table_names, local_rows_list):
+        if local_rows is None:
+            continue
+        for shard_file in get_table_shard_files(path, table_name, optimizer, local_rows, quantize):
+            futures.append(executor.submit(write_shard_file, *shard_file, True))
+    _pending_dump = DumpHandle(
+        path, executor, futures, table_names, num_keys, optimizer, with_optimizer_states
+    )
+    return _pending_dump
 
 
 def load(path, load_vars, optimizer=None):
@@ -1216,6 +1703,15 @@ def load(path, load_vars, optimizer=None):
 
     Load the embedding tables from sok weight folder.
     The sok table name must be the same with the weight file prefix.
+    Both the single file layout and the sharded layout of ``sok.dump`` are supported, the
+    layout is detected by ``sharded_manifest.json``. The incremental dumps in the ``delta_<id>``
+    folders are replayed in order after the full dump. A distributed table dumped by the same
+    number of gpus is read from the shard of this rank only. Otherwise the files are memory
+    mapped and every rank reads only its own rows, located by the ``<key file>.partition<num_gpus>``
+    index, which is written by ``sok.dump`` or built and saved on the first load. When the keys of
+    the ranks are interleaved in the file, e.g. for a table dumped with another number of gpus,
+    the index is skipped and every rank masks the keys to find its rows. The weights dumped with
+    ``quantize`` are converted back to the dtype of the variables.
 
     Now is only support ``SGD,Adamax,Adadelta,Adagrad,Ftrl,Adam`` optimizers.
 
@@ -1284,6 +1780,7 @@ def load(path, load_vars, optimizer=None):
             optimizer = None
         optimizer = optimizer[0]
 
+    wait_pending_dump()
     load_table(path, load_vars, optimizer)
     print("[SOK INFO] SOK load weight from path:", path, " success!")
     return
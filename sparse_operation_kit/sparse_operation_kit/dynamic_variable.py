@@ -461,6 +461,76 @@ def _SparseReadGrad(op, grad):
     return (SOK_IndexedSlices()(grad, indices, variable_shape), None)
 
 
+def group_by_op_attrs(variables, indices_list=None):
+    """
+    This function should not be used by user directly.
+
+    Group the positions of the variables by the key type and dtype attributes of their ops.
+    """
+    groups = {}
+    for i, var in enumerate(variables):
+        key_type = var.key_type if indices_list is None else indices_list[i].dtype
+        groups.setdefault((key_type, var.handle_dtype), []).append(i)
+    return groups.values()
+
+
+def group_to_static(variables, indices_list):
+    """
+    This function should not be used by user directly.
+
+    Fused-version of ``DynamicVariable.to_static`` over many variables, the rows of all the
+    variables with the same key type and dtype are read by one op instead of one op per variable.
+    """
+    for var in variables:
+        if var.is_static() or var.indices is not None:
+            raise RuntimeError("to_static() must be called in dynamic mode.")
+        variable_accessed(var)
+    indices_list = [
+        tf.cast(indices, tf.int64) if indices.dtype == tf.int32 else indices
+        for indices in indices_list
+    ]
+    assign_ops = []
+    for group in group_by_op_attrs(variables, indices_list):
+        buffers = dynamic_variable_ops.dummy_var_sparse_read_grouped(
+            [variables[i]._dummy_handle for i in group],
+            [indices_list[i] for i in group],
+            dtype=variables[group[0]].handle_dtype,
+        )
+        for i, buffer in zip(group, buffers):
+            var = variables[i]
+            var._indices = indices_list[i]
+            var._handle = var._tf_handle
+            assign_ops.append(var.assign(buffer))
+    return assign_ops
+
+
+def group_to_dynamic(variables):
+    """
+    This function should not be used by user directly.
+
+    Fused-version of ``DynamicVariable.to_dynamic`` over many variables, the rows of all the
+    variables with the same key type and dtype are written back by one op.
+    """
+    for var in variables:
+        if not var.is_static():
+            raise RuntimeError("to_dynamic() must be called in static mode.")
+    buffers = [var.read_value() for var in variables]
+    indices_list = [var.indices for var in variables]
+    for var in variables:
+        var._indices = None
+        var._handle = var._dummy_handle
+    scatter_ops = []
+    for group in group_by_op_attrs(variables, indices_list):
+        scatter_ops.append(
+            dynamic_variable_ops.dummy_var_scatter_update_grouped(
+                [variables[i]._dummy_handle for i in group],
+                [indices_list[i] for i in group],
+                [ops.convert_to_tensor(buffers[i], variables[i].dtype) for i in group],
+            )
+        )
+    return scatter_ops
+
+
 def export(var):
     """
     Abbreviated as ``sok.export``.
@@ -37,17 +37,17 @@ from sparse_operation_kit.distributed_variable import DistributedVariable
 from sparse_operation_kit.distributed_variable import LocalizedVariable
 
 from sparse_operation_kit.dynamic_variable import DynamicVariable
-import importlib
 
+# checked once here instead of on every lookup
 try:
     from tensorflow.python.ops import kv_variable_ops
 except:
-    pass
+    kv_variable_ops = None
 
 try:
     from tensorflow.python.ops import resource_variable_ops
 except:
-    pass
+    resource_variable_ops = None
 
 
 def group_lookup(params, indices, dtype=None, name=None):
@@ -139,14 +139,12 @@ def isDynamicVariable(variable):
 
 
 def isEmbeddingVariable(variable):
-    return importlib.find_loader("tensorflow.python.ops.kv_variable_ops") and isinstance(
-        variable, kv_variable_ops.EmbeddingVariable
-    )
+    return kv_variable_ops is not None and isinstance(variable, kv_variable_ops.EmbeddingVariable)
 
 
 def isResourceVariable(variable):
     return (
-        importlib.find_loader("tensorflow.python.ops.resource_variable_ops")
+        resource_variable_ops is not None
         and isinstance(variable, resource_variable_ops.ResourceVariable)
         and not isEmbeddingVariable(variable)
         and not isDynamicVariable(variable)
@@ -360,7 +358,7 @@ def _PostprocessingBackward(op, *top_grads):
         "id_in_local_rank",
         "num_gpus",
         "Tindices",
-        "use_sp_weight"
+        "use_sp_weight",
         # "Toffsets",
     ]
     kwargs = {}
@@ -387,13 +385,16 @@ def to_list(any_obj):
         return any_obj
 
 
-def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
+def lookup_sparse_kwargs(params, combiners, use_sp_weight):
+    """
+    This function should not be used by user directly.
+
+    Validate the params of a lookup and return the attributes of its ops.
+    """
     shard, dimensions = [], []
     for param in params:
         shard.append(param.target_gpu)
-        if importlib.find_loader("tensorflow.python.ops.kv_variable_ops") and isinstance(
-            param, kv_variable_ops.EmbeddingVariable
-        ):
+        if isEmbeddingVariable(param):
             dimensions.append(param.shape[0])
         else:
             dimensions.append(param.shape[1])
@@ -404,10 +405,26 @@ def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
                 "Distributed/Localized/Dynamic Variable cannot be used in the same lookup currently"
             )
 
+    return {
+        "combiners": combiners,
+        "shard": shard,
+        "dimensions": dimensions,
+        "rank": rank(),
+        "num_ranks": num_ranks(),
+        "id_in_local_rank": id_in_rank(),
+        "use_sp_weight": use_sp_weight,
+    }
+
+
+def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None, kwargs=None):
+    if kwargs is None:
+        kwargs = lookup_sparse_kwargs(params, combiners, len(sp_weights) > 0)
+    use_sp_weight = kwargs["use_sp_weight"]
+    global_gpu_num = num_gpus()
+
     keys = []
     row_lengths = []
     sp_weight_value = []
-    use_sp_weight = False if len(sp_weights) == 0 else True
     # first collect keys from Ragged tensors
     # keys means lookup key
     # every element in row_lengths meas number of lookup keys in a table for a sample
@@ -434,24 +451,15 @@ def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
     hotness_kwargs = {
         "num_lookups": len(params),
     }
-    kwargs = {
-        "combiners": combiners,
-        "shard": shard,
-        "dimensions": dimensions,
-        "rank": rank(),
-        "num_ranks": num_ranks(),
-        "id_in_local_rank": id_in_rank(),
-        "use_sp_weight": use_sp_weight,
-    }
 
     # Step1
     # copy all the key and row length in one buffer
     key_send_buffer, row_length_send_buffer, sp_weight_send_buffer = _preprocessing_forward(
-        keys, row_lengths, sp_weight_value, num_gpus=num_gpus(), **kwargs
+        keys, row_lengths, sp_weight_value, num_gpus=global_gpu_num, **kwargs
     )
 
     # Step2
-    if num_gpus() > 1:
+    if global_gpu_num > 1:
         key_recv_buffer = allgather(key_send_buffer)
         row_length_recv_buffer = allgather(row_length_send_buffer)
         if use_sp_weight:
@@ -463,7 +471,7 @@ def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
         row_length_recv_buffer = row_length_send_buffer
         sp_weight_recv_buffer = sp_weight_send_buffer
 
-    hotness = _hotness_calculate(row_length_recv_buffer, num_gpus=num_gpus(), **hotness_kwargs)
+    hotness = _hotness_calculate(row_length_recv_buffer, num_gpus=global_gpu_num, **hotness_kwargs)
     # Step3
     if isinstance(params[0], DynamicVariable) and key_recv_buffer.dtype != params[0].key_type:
         key_recv_buffer = tf.cast(key_recv_buffer, params[0].key_type)
@@ -473,7 +481,7 @@ def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
         row_length_recv_buffer,
         hotness,
         sp_weight_recv_buffer,
-        num_gpus=num_gpus(),
+        num_gpus=global_gpu_num,
         **kwargs
     )
 
@@ -485,7 +493,7 @@ def lookup_sparse_impl(params, sp_ids, sp_weights=None, combiners=None):
         sp_sum = tf.concat(sp_sum, 0)
 
     # Step4
-    if num_gpus() > 1:
+    if global_gpu_num > 1:
         splits = []
         for i, emb_vec in enumerate(emb_vec_buffer):
             size = tf.expand_dims(tf.size(emb_vec), 0)
@@ -571,70 +579,110 @@ def lookup_sparse(params, sp_ids, sp_weights=None, combiners=None):
         print(embeddings[0])
         print(embeddings[1])
     """
-    # `is_list` determines whether to return a list or a tensor in the end
-    #
+    return LookupPlan(params, combiners)(sp_ids, sp_weights)
 
-    # check every gpu have lookup
 
-    is_list = isinstance(sp_ids, list) or isinstance(sp_ids, tuple) or isinstance(sp_weights, tuple)
+class LookupPlan(object):
+    """
+    Abbreviated as ``sok.LookupPlan``.
 
-    params = to_list(params)
-    sp_ids = to_list(sp_ids)
-    num_tables = len(params)
+    A ``sok.lookup_sparse`` on fixed ``params`` and ``combiners``. The params are validated and
+    grouped, and the attributes of the lookup ops are computed once when the plan is created,
+    instead of on every call of ``sok.lookup_sparse``, which saves the Python overhead of every
+    step in eager mode or with small batches.
 
-    # check combiners
-    if combiners == None:
-        combiners_numpy = np.chararray(num_tables, itemsize=4)
-        combiners_numpy[:] = "mean"
-        combiners = combiners_numpy.tolist()
-    else:
-        combiners = to_list(combiners)
-    if sp_weights == None:
-        sp_weights = [] * len(params)
-    else:
-        if len(sp_ids) != len(sp_weights):
-            raise RuntimeError("sp_ids length is not equal sp_weights")
-        sp_weights = to_list(sp_weights)
+    Parameters
+    ----------
+    params: list, tuple
+            a list or tuple of trainable *sok.Variable*.
+    combiners: list, tuple,optional
+            a list or tuple of string to specify the combiner of each lookup,for now only suupport "mean" "sum".
+            if don't specify , all the combiners are "mean".
 
-    gpu_flag = [0] * num_gpus()
-    all_gpu_allocate = False
-    for param in params:
-        tmp_target_gpu = param.target_gpu
-        if tmp_target_gpu == -1:
-            all_gpu_allocate = True
-            break
-        if isinstance(tmp_target_gpu, int):
-            tmp_target_gpu = [tmp_target_gpu]
-        for tmp_gpu_id in tmp_target_gpu:
-            gpu_flag[tmp_gpu_id] += 1
-
-    if all_gpu_allocate == False:
-        for tmp_gpu_flag in gpu_flag:
-            if tmp_gpu_flag == 0:
-                raise Exception("every gpu must have table!")
-
-    # group same type of variable
-    assert len(params) == len(sp_ids)
-
-    emb_vec = [None for _ in range(len(params))]
-    variable_type_check_func = allSupportedVariableCheckFunc()
-    for check_func in variable_type_check_func:
-        selected_idx = [i for i in range(len(params)) if check_func(params[i])]
-
-        if len(selected_idx) > 0:
-            selected_params = [params[i] for i in selected_idx]
+    Example
+    -------
+    .. code-block:: python
+
+        plan = sok.LookupPlan([v1, v2], combiners=["sum", "sum"])
+        for indices1, indices2 in dataset:
+            embeddings = plan([indices1, indices2])
+    """
+
+    def __init__(self, params, combiners=None):
+        params = to_list(params)
+        num_tables = len(params)
+
+        # check combiners
+        if combiners == None:
+            combiners_numpy = np.chararray(num_tables, itemsize=4)
+            combiners_numpy[:] = "mean"
+            combiners = combiners_numpy.tolist()
+        else:
+            combiners = to_list(combiners)
+
+        gpu_flag = [0] * num_gpus()
+        all_gpu_allocate = False
+        for param in params:
+            tmp_target_gpu = param.target_gpu
+            if tmp_target_gpu == -1:
+                all_gpu_allocate = True
+                break
+            if isinstance(tmp_target_gpu, int):
+                tmp_target_gpu = [tmp_target_gpu]
+            for tmp_gpu_id in tmp_target_gpu:
+                gpu_flag[tmp_gpu_id] += 1
+
+        if all_gpu_allocate == False:
+            for tmp_gpu_flag in gpu_flag:
+                if tmp_gpu_flag == 0:
+                    raise Exception("every gpu must have table!")
+
+        # group same type of variable, with the op attributes of lookups with and without weights
+        self._groups = []
+        variable_type_check_func = allSupportedVariableCheckFunc()
+        for check_func in variable_type_check_func:
+            selected_idx = [i for i in range(len(params)) if check_func(params[i])]
+
+            if len(selected_idx) > 0:
+                selected_params = [params[i] for i in selected_idx]
+                selected_combiners = [combiners[i] for i in selected_idx]
+                kwargs = lookup_sparse_kwargs(selected_params, selected_combiners, False)
+                # the attributes with weights only differ in use_sp_weight, no need to validate
+                # the params again
+                kwargs = [kwargs, dict(kwargs, use_sp_weight=True)]
+                self._groups.append((selected_idx, selected_params, kwargs))
+        self._num_tables = num_tables
+
+    def __call__(self, sp_ids, sp_weights=None):
+        """
+        Perform the lookup, see ``sok.lookup_sparse`` for sp_ids, sp_weights and the returns.
+        """
+        # `is_list` determines whether to return a list or a tensor in the end
+        is_list = (
+            isinstance(sp_ids, list) or isinstance(sp_ids, tuple) or isinstance(sp_weights, tuple)
+        )
+
+        sp_ids = to_list(sp_ids)
+        if sp_weights == None:
+            sp_weights = []
+        else:
+            if len(sp_ids) != len(sp_weights):
+                raise RuntimeError("sp_ids length is not equal sp_weights")
+            sp_weights = to_list(sp_weights)
+        assert self._num_tables == len(sp_ids)
+        use_sp_weight = len(sp_weights) > 0
+
+        emb_vec = [None for _ in range(self._num_tables)]
+        for selected_idx, selected_params, kwargs in self._groups:
             selected_sp_ids = [sp_ids[i] for i in selected_idx]
-            selected_sp_weights = (
-                [] if len(sp_weights) == 0 else [sp_weights[i] for i in selected_idx]
-            )
-            selected_combiners = [combiners[i] for i in selected_idx]
+            selected_sp_weights = [sp_weights[i] for i in selected_idx] if use_sp_weight else []
 
             selected_emb_vec = lookup_sparse_impl(
-                selected_params, selected_sp_ids, selected_sp_weights, selected_combiners
+                selected_params, selected_sp_ids, selected_sp_weights, kwargs=kwargs[use_sp_weight]
             )
             for ii, i in enumerate(selected_idx):
                 emb_vec[i] = selected_emb_vec[ii]
-    assert None not in emb_vec
-    if not is_list:
-        emb_vec = emb_vec[0]
-    return emb_vec
+        assert None not in emb_vec
+        if not is_list:
+            emb_vec = emb_vec[0]
+        return emb_vec
@@ -17,11 +17,12 @@
 import tensorflow as tf
 from tensorflow.python.framework import ops
 from sparse_operation_kit import tf_version
-from sparse_operation_kit.dynamic_variable import DynamicVariable
+from sparse_operation_kit.dynamic_variable import DynamicVariable, export, assign
+from sparse_operation_kit.dynamic_variable import group_to_static, group_to_dynamic
 from sparse_operation_kit.utils import SOK_IndexedSlices
 
 
-def OptimizerWrapper(optimizer):
+def OptimizerWrapper(optimizer, track_updated_keys=False, phase_timing=False):
     """
     Abbreviated as ``sok.OptimizerWrapper``.
 
@@ -32,6 +33,14 @@ def OptimizerWrapper(optimizer):
     ----------
     optimizer: tensorflow optimizer
         The original tensorflow optimizer.
+    track_updated_keys: bool
+        Whether to track the keys of sok.DynamicVariable updated since the last dump, which is
+        required by ``sok.dump(..., incremental=True)``. It costs one upsert of the unique keys
+        into a 1-dimension sok.DynamicVariable per step. Default value is False.
+    phase_timing: bool
+        Whether to accumulate the host time spent by the phases of ``apply_gradients``, which
+        are read by ``get_phase_times()``. Only supported by tf.keras optimizers. Default value
+        is False.
 
     Example
     -------
@@ -64,18 +73,102 @@ def OptimizerWrapper(optimizer):
     # a specific code path for dl framework tf2.11.0
     try:
         if isinstance(optimizer, tf.keras.optimizers.legacy.Optimizer):
-            return OptimizerWrapperV2(optimizer)
+            return OptimizerWrapperV2(optimizer, track_updated_keys, phase_timing)
     except:
         pass
 
     if isinstance(optimizer, tf.keras.optimizers.Optimizer):
-        return OptimizerWrapperV2(optimizer)
+        return OptimizerWrapperV2(optimizer, track_updated_keys, phase_timing)
     else:
-        return OptimizerWrapperV1(optimizer)
+        if phase_timing:
+            raise NotImplementedError("phase_timing is only supported by tf.keras optimizers")
+        return OptimizerWrapperV1(optimizer, track_updated_keys)
 
 
-class OptimizerWrapperV1(object):
-    def __init__(self, optimizer):
+def unique_grouped(indices_list):
+    """
+    Deduplicate the indices of several variables like ``tf.unique`` of each indices, but with two
+    unique ops for all the indices of the same dtype instead of one per variable, every unique op
+    on GPU waits for its output size on the host.
+    """
+    results = [None] * len(indices_list)
+    groups = {}
+    for i, indices in enumerate(indices_list):
+        if indices.dtype in (tf.int32, tf.int64):
+            groups.setdefault(indices.dtype, []).append(i)
+        else:
+            results[i] = tf.unique(indices)
+    for group in groups.values():
+        if len(group) == 1:
+            results[group[0]] = tf.unique(indices_list[group[0]])
+            continue
+        # unique keys of all the variables, then unique (variable, key) pairs, whose first
+        # occurrences are in the order of the variables
+        num_vars = len(group)
+        sizes = tf.stack([tf.size(indices_list[i]) for i in group])
+        owners = tf.repeat(tf.range(num_vars, dtype=tf.int64), sizes)
+        keys, key_idx = tf.unique(tf.concat([indices_list[i] for i in group], 0), out_idx=tf.int64)
+        num_keys = tf.size(keys, out_type=tf.int64)
+        pairs, pair_idx = tf.unique(owners * num_keys + key_idx, out_idx=tf.int64)
+        pair_owners = pairs // num_keys
+        counts = tf.math.unsorted_segment_sum(tf.ones_like(pair_owners), pair_owners, num_vars)
+        starts = tf.cumsum(counts, exclusive=True)
+        local_idx = tf.cast(pair_idx - tf.gather(starts, owners), tf.int32)
+        uniques = tf.split(tf.gather(keys, pairs % num_keys), counts, num=num_vars)
+        idxs = tf.split(local_idx, sizes, num=num_vars)
+        for i, unique, idx in zip(group, uniques, idxs):
+            results[i] = (unique, idx)
+    return results
+
+
+class UpdatedKeysTracker(object):
+    """
+    Track the keys of sok.DynamicVariable updated since the last dump. Every update writes the
+    current dump epoch into a 1-dimension sok.DynamicVariable at the updated keys, and a dump
+    starts a new epoch, so no key needs to be removed.
+    """
+
+    def _init_updated_keys_tracker(self, track_updated_keys):
+        self._track_updated_keys = track_updated_keys
+        self._update_trackers = {}
+        self._update_epoch = tf.Variable(1.0, name="update_epoch", trainable=False)
+
+    @property
+    def track_updated_keys(self):
+        return self._track_updated_keys
+
+    def _track_updated_keys_op(self, var, unique):
+        key = self._var_key(var)
+        if key not in self._update_trackers:
+            tmp_config = var.config_dict if var.backend_type != "hbm" else {}
+            self._update_trackers[key] = DynamicVariable(
+                dimension=1,
+                initializer="0",
+                var_type=var.backend_type,
+                key_type=var.key_type,
+                mode=var.mode,
+                name="DynamicUpdateTracker",
+                trainable=False,
+                **tmp_config
+            )
+        epochs = tf.fill([tf.size(unique), 1], self._update_epoch.read_value())
+        return assign(self._update_trackers[key], unique, epochs)
+
+    def get_updated_keys(self, var):
+        """Return the keys of a sok.DynamicVariable updated since the last dump"""
+        key = self._var_key(var)
+        if key not in self._update_trackers:
+            return tf.zeros([0], dtype=var.key_type)
+        indices, epochs = export(self._update_trackers[key])
+        return tf.boolean_mask(indices, epochs[:, 0] >= self._update_epoch.read_value())
+
+    def reset_updated_keys(self):
+        """Start a new epoch after a dump"""
+        self._update_epoch.assign_add(1.0)
+
+
+class OptimizerWrapperV1(UpdatedKeysTracker):
+    def __init__(self, optimizer, track_updated_keys=False):
         self._optimizer = optimizer
         # slots
         unused = tf.Variable([0.0], dtype=tf.float32, name="unused", trainable=False)
@@ -96,6 +189,7 @@ class OptimizerWrapperV1(object):
         self._non_slot_dict = {}
         for name, v in self._optimizer._non_slot_dict.items():
             self._non_slot_dict[name] = tf.Variable(v)
+        self._init_updated_keys_tracker(track_updated_keys)
 
     def _var_key(self, var):
         if hasattr(var, "op"):
@@ -147,6 +241,7 @@ class OptimizerWrapperV1(object):
     def apply_gradients(self, grads_and_vars, global_step=None, name=None):
         # 1. Create slots and do sparse_read
         to_static_ops = []
+        track_ops = []
         grad_list, var_list = [], []
         for g, v in grads_and_vars:
             if g is not None:
@@ -155,6 +250,8 @@ class OptimizerWrapperV1(object):
                 # TODO: Check multi-thread safety of DET
                 # with tf.control_dependencies([g.values]):
                 to_static_ops.append(v.to_static(unique))
+                if self._track_updated_keys:
+                    track_ops.append(self._track_updated_keys_op(v, unique))
                 var_list.append(v)
                 key = self._var_key(v)
                 for slot_name in self._initial_vals:
@@ -209,11 +306,13 @@ class OptimizerWrapperV1(object):
                     slot = self._optimizer._slots[name][key]
                     to_dynamic_ops.append(slot.to_dynamic())
 
-        return tf.group(to_dynamic_ops)
+        return tf.group(to_dynamic_ops + track_ops)
+
 
+class OptimizerWrapperV2(UpdatedKeysTracker):
+    phase_names = ["unique_and_to_static", "apply_gradients", "to_dynamic"]
 
-class OptimizerWrapperV2(object):
-    def __init__(self, optimizer):
+    def __init__(self, optimizer, track_updated_keys=False, phase_timing=False):
         self._optimizer = optimizer
         # slots
         if tf.__version__[0] == "1":
@@ -232,11 +331,39 @@ class OptimizerWrapperV2(object):
         for i, name in enumerate(names):
             self._initial_vals[name] = slots[i]
         self._iterations = tf.Variable(0)
+        self._init_updated_keys_tracker(track_updated_keys)
+        self._phase_timing = phase_timing
+        if phase_timing:
+            self._phase_times = tf.Variable(
+                [0.0] * len(self.phase_names), dtype=tf.float64, trainable=False
+            )
+            self._phase_steps = tf.Variable(0, dtype=tf.int64, trainable=False)
 
     @property
     def lr(self):
         return self._optimizer.lr
 
+    def _phase_timestamp(self, control_inputs):
+        with tf.control_dependencies(control_inputs):
+            return tf.timestamp()
+
+    def get_phase_times(self):
+        """
+        Return the average seconds per step spent by each phase of ``apply_gradients``, measured
+        by host timestamps between the ops of the phases, so the GPU kernels still running at the
+        end of a phase are counted in the next phase.
+        """
+        if not self._phase_timing:
+            raise RuntimeError("get_phase_times() needs OptimizerWrapper(..., phase_timing=True)")
+        steps = max(int(self._phase_steps.numpy()), 1)
+        phase_times = self._phase_times.numpy() / steps
+        return dict(zip(self.phase_names, phase_times.tolist()))
+
+    def reset_phase_times(self):
+        if self._phase_timing:
+            self._phase_times.assign(tf.zeros_like(self._phase_times))
+            self._phase_steps.assign(0)
+
     def _create_slots(self, vars):
         for tmp_var in vars:
             if isinstance(tmp_var, DynamicVariable):
@@ -288,48 +415,36 @@ class OptimizerWrapperV2(object):
         return self._optimizer._slots
 
     def apply_gradients(self, grads_and_vars, global_step=None, name=None):
+        grads_and_vars = [(g, v) for g, v in grads_and_vars if g is not None]
+        if len(grads_and_vars) == 0:
+            return tf.no_op()
+        if self._phase_timing:
+            timestamps = [self._phase_timestamp([g.values for g, _ in grads_and_vars])]
+
         # 1. Create slots and do sparse_read
-        to_static_ops = []
+        track_ops = []
         grad_list, var_list = [], []
-        for g, v in grads_and_vars:
-            if g is not None:
-                unique, indices = tf.unique(g.indices)
+        with tf.name_scope("SOKToStatic"):
+            uniques = unique_grouped([g.indices for g, _ in grads_and_vars])
+            # the variables and slots are switched to static mode together, by one read op per
+            # key type instead of one per variable and slot
+            static_vars, static_indices = [], []
+            for (g, v), (unique, indices) in zip(grads_and_vars, uniques):
                 grad_list.append(SOK_IndexedSlices()(g.values, indices, g.dense_shape))
-                # TODO: Check multi-thread safety of DET
-                # with tf.control_dependencies([g.values]):
-                to_static_ops.append(v.to_static(unique))
+                static_vars.append(v)
+                static_indices.append(unique)
+                if self._track_updated_keys:
+                    track_ops.append(self._track_updated_keys_op(v, unique))
                 var_list.append(v)
+                self._create_slots_dynamic(v)
                 key = self._var_key(v)
-                if key not in self._optimizer._slots:
-                    self._optimizer._slots[key] = {}
                 for slot_name in self._initial_vals:
-                    if slot_name not in self._optimizer._slots[key]:
-                        if v.backend_type == "hbm":
-                            slot = DynamicVariable(
-                                dimension=v.dimension,
-                                initializer=self._initial_vals[slot_name],
-                                name="DynamicSlot",
-                                trainable=False,
-                            )
-                        else:
-                            tmp_config = v.config_dict
-                            tmp_initializer = v.initializer_str
-                            slot = DynamicVariable(
-                                dimension=v.dimension,
-                                initializer=self._initial_vals[slot_name],
-                                var_type=v.backend_type,
-                                name="DynamicSlot",
-                                trainable=False,
-                                **tmp_config
-                            )
-
-                        self._optimizer._slots[key][slot_name] = slot
-                    else:
-                        slot = self._optimizer._slots[key][slot_name]
-                    to_static_ops.append(slot.to_static(unique))
-
-        if len(grad_list) == 0:
-            return
+                    static_vars.append(self._optimizer._slots[key][slot_name])
+                    static_indices.append(unique)
+            # TODO: Check multi-thread safety of DET
+            to_static_ops = group_to_static(static_vars, static_indices)
+        if self._phase_timing:
+            timestamps.append(self._phase_timestamp(to_static_ops))
 
         # 2. Switch iterations
         iterations = self._optimizer._iterations
@@ -338,20 +453,21 @@ class OptimizerWrapperV2(object):
         # 3. Call tf-optimizer
         with tf.control_dependencies(to_static_ops):
             train_op = self._optimizer.apply_gradients(zip(grad_list, var_list), name=name)
+        if self._phase_timing:
+            timestamps.append(self._phase_timestamp([train_op]))
 
         # 4. Switch iterations
         self._optimizer._iterations = iterations
 
         # 5. Write buffer back to dynamic variables
-        to_dynamic_ops = []
-        with tf.control_dependencies([train_op]):
-            for v in var_list:
-                key = self._var_key(v)
-                to_dynamic_ops.append(v.to_dynamic())
-                for name in self._initial_vals:
-                    slot = self._optimizer._slots[key][name]
-                    to_dynamic_ops.append(slot.to_dynamic())
-        return tf.group(to_dynamic_ops)
+        with tf.control_dependencies([train_op]), tf.name_scope("SOKToDynamic"):
+            to_dynamic_ops = group_to_dynamic(static_vars)
+        if self._phase_timing:
+            timestamps.append(self._phase_timestamp(to_dynamic_ops))
+            timestamps = tf.stack(timestamps)
+            track_ops.append(self._phase_times.assign_add(timestamps[1:] - timestamps[:-1]))
+            track_ops.append(self._phase_steps.assign_add(1))
+        return tf.group(to_dynamic_ops + track_ops)
 
 
 class SGD(object):
@@ -22,3 +22,8 @@ horovodrun -np ${task_num} python dump_load_localized_dynamic.py
 horovodrun -np ${task_num} python dump_load_localized_static.py
 
 
+horovodrun -np ${task_num} python dump_load_sharded_distribute_dynamic.py
+horovodrun -np ${task_num} python dump_load_sharded_distribute_static.py
+horovodrun -np ${task_num} python dump_load_async_distribute_dynamic.py
+horovodrun -np ${task_num} python dump_load_incremental_distribute_dynamic.py
+horovodrun -np ${task_num} python dump_load_quantize_distribute_dynamic.py
@@ -0,0 +1,162 @@
+"""
+ Copyright (c) 2022, NVIDIA CORPORATION.
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import numpy as np
+import tensorflow as tf
+import horovod.tensorflow as hvd
+
+import sparse_operation_kit as sok
+
+
+def export_sorted(var):
+    ex_indices, ex_values = sok.export(var)
+    order = np.argsort(ex_indices.numpy())
+    return ex_indices.numpy()[order], ex_values.numpy()[order]
+
+
+def zero_values(var):
+    ex_indices, ex_values = sok.export(var)
+    sok.assign(var, ex_indices, tf.zeros(ex_values.shape))
+
+
+if __name__ == "__main__":
+    hvd.init()
+    gpus = tf.config.experimental.list_physical_devices("GPU")
+    for gpu in gpus:
+        tf.config.experimental.set_memory_growth(gpu, True)
+    if gpus:
+        tf.config.experimental.set_visible_devices(gpus[hvd.local_rank()], "GPU")
+    sok.init()
+
+    rows = [8192 * 5, 8192]
+    cols = [128, 4]
+    hotness = [10, 3]
+    combiners = ["mean", "sum"]
+    batch_size = 8192
+    initial_vals = [13, 17]
+    # the error of a row is at most half a step of its dtype around the largest value of the row
+    quantize_tolerances = {"float16": 1e-3, "bfloat16": 8e-3, "int8": 8e-3}
+
+    optimizer = tf.optimizers.SGD(learning_rate=1.0, momentum=0.9)
+    sok_optimizer = sok.OptimizerWrapper(optimizer)
+    sok_vars = [
+        sok.DynamicVariable(dimension=cols[i], initializer=str(initial_vals[i]))
+        for i in range(len(cols))
+    ]
+
+    def step(params, indices):
+        with tf.GradientTape() as tape:
+            embeddings = sok.lookup_sparse(params, indices, combiners=combiners)
+            loss = 0
+            for i in range(len(embeddings)):
+                loss = loss + tf.reduce_sum(embeddings[i])
+        grads = tape.gradient(loss, params)
+        sok_optimizer.apply_gradients(zip(grads, params))
+        loss = hvd.allreduce(loss, op=hvd.Sum)
+        return loss
+
+    indices = []
+    left = batch_size // hvd.size() * hvd.rank()
+    right = batch_size // hvd.size() * (hvd.rank() + 1)
+    for i in range(len(rows)):
+        offsets = np.random.randint(1, hotness[i] + 1, batch_size)
+        offsets = tf.convert_to_tensor(offsets, dtype=tf.int64)
+        offsets = hvd.broadcast(offsets, root_rank=0)
+        values = np.random.randint(0, rows[i], tf.reduce_sum(offsets))
+        values = tf.convert_to_tensor(values, dtype=tf.int64)
+        values = hvd.broadcast(values, root_rank=0)
+        indices.append(tf.RaggedTensor.from_row_lengths(values, offsets)[left:right])
+    _ = step(sok_vars, indices)
+
+    slot_vars = [optimizer.get_slot(sok_var, "momentum") for sok_var in sok_vars]
+    var_nps_raw = [export_sorted(sok_var) for sok_var in sok_vars]
+    slot_nps_raw = [export_sorted(slot_var) for slot_var in slot_vars]
+
+    for quantize, tolerance in quantize_tolerances.items():
+        path = "./weight_quantize_" + quantize
+        sok.dump(path, sok_vars, sok_optimizer, sharded=True, quantize=quantize)
+        for var in sok_vars + slot_vars:
+            zero_values(var)
+        sok.load(path, sok_vars, sok_optimizer)
+
+        # the weights are close to the raw weights, the optimizer states are not quantized
+        for i, sok_var in enumerate(sok_vars):
+            index_new, value_new = export_sorted(sok_var)
+            index_raw, value_raw = var_nps_raw[i]
+            assert (index_new == index_raw).all()
+            error = np.abs(value_new - value_raw)
+            assert (error <= tolerance * np.abs(value_raw).max(axis=1, keepdims=True)).all()
+            index_new, value_new = export_sorted(slot_vars[i])
+            assert (index_new == slot_nps_raw[i][0]).all()
+            assert (np.abs(value_new - slot_nps_raw[i][1]) < 1e-5).all()
+        print("[SOK INFO] dump load quantize %s distribute dynamic test successfully" % quantize)
+
+    # an inference export has no optimizer state, and loading keeps the optimizer states
+    path = "./weight_quantize_inference"
+    sok.dump(
+        path, sok_vars, sok_optimizer, sharded=True, quantize="int8", with_optimizer_states=False
+    )
+    for slot_var in slot_vars:
+        zero_values(slot_var)
+    sok.load(path, sok_vars, sok_optimizer)
+    for slot_var in slot_vars:
+        assert (export_sorted(slot_var)[1] == 0).all()
+    print("[SOK INFO] dump load quantize inference distribute dynamic test successfully")
+
+    # a single file dump without optimizer states removes the states of an older dump
+    path = "./weight_inference"
+    sok.dump(path, sok_vars, sok_optimizer)
+    sok.dump(path, sok_vars, sok_optimizer, with_optimizer_states=False)
+    for slot_var in slot_vars:
+        zero_values(slot_var)
+    sok.load(path, sok_vars, sok_optimizer)
+    for slot_var in slot_vars:
+        assert (export_sorted(slot_var)[1] == 0).all()
+    print("[SOK INFO] dump load inference distribute dynamic test successfully")
+
+    # int8 has no scale for the rows with inf or NaN, every rank holds such rows
+    for sok_var in sok_vars:
+        ex_indices, ex_values = sok.export(sok_var)
+        ex_values = ex_values.numpy()
+        ex_values[::2, 0] = np.inf
+        ex_values[1::2, 0] = np.nan
+        sok.assign(sok_var, ex_indices, tf.convert_to_tensor(ex_values))
+    try:
+        sok.dump("./weight_quantize_nan", sok_vars, sharded=True, quantize="int8")
+    except Exception as e:
+        assert isinstance(e.__cause__, ValueError) and "inf or NaN" in str(e.__cause__)
+    else:
+        raise AssertionError("int8 quantization of inf and NaN rows should raise")
+    print("[SOK INFO] dump quantize int8 inf and NaN distribute dynamic test successfully")
+
+    # a non-finite row on a single rank fails the dump on all ranks instead of hanging the others
+    for sok_var in sok_vars:
+        zero_values(sok_var)
+    if hvd.rank() == 0:
+        ex_indices, ex_values = sok.export(sok_vars[0])
+        ex_values = ex_values.numpy()
+        ex_values[0, 0] = np.nan
+        sok.assign(sok_vars[0], ex_indices, tf.convert_to_tensor(ex_values))
+    try:
+        sok.dump("./weight_quantize_nan_rank0", sok_vars, sharded=True, quantize="int8")
+    except Exception as e:
+        if hvd.rank() == 0:
+            assert isinstance(e.__cause__, ValueError)
+        else:
+            assert "failed on 1 other ranks" in str(e)
+    else:
+        raise AssertionError("int8 quantization of a NaN row on rank 0 should raise on all ranks")
+    print("[SOK INFO] dump quantize int8 NaN on one rank distribute dynamic test successfully")
@@ -0,0 +1,306 @@
+"""
+ Copyright (c) 2023, NVIDIA CORPORATION.
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+from multiprocessing import Pool
+
+# import the codec module alone, importing the sparse_operation_kit package loads TensorFlow
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../sparse_operation_kit/")
+)
+from checkpoint_format import (
+    file_head_length,
+    sharded_manifest_name,
+    data_type_names,
+    encode_file_head,
+    get_storage_dtype,
+    get_shard_id,
+    get_table_files,
+    list_delta_segments,
+    map_data,
+    dequantize_rows,
+)
+
+CHUNK_ROWS = 1 << 20
+
+
+def get_sok_tables(path, table_names=None):
+    """
+    Find the key and weight files of the tables of a SOK checkpoint directory, the files of the
+    full dump are followed by the files of its incremental dumps.
+    Returns:
+        a dict from table name to (key sources, weight sources, scale sources), a source is
+        (path, data offset in bytes, dtype name). The scale sources are aligned with the weight
+        sources, the scale file of an int8 weight file or None.
+    """
+    tables = {}
+    for checkpoint in [path] + list_delta_segments(path):
+        # an interrupted incremental dump has no manifest
+        if checkpoint != path and not os.path.exists(
+            os.path.join(checkpoint, sharded_manifest_name)
+        ):
+            continue
+        for table_name, files in get_table_files(checkpoint).items():
+            if table_names and table_name not in table_names:
+                continue
+            if checkpoint != path and table_name not in tables:
+                continue
+            key_sources, weight_sources, scale_sources = tables.setdefault(table_name, ([], [], []))
+            for file_path, _, data_index in files["key"]:
+                key_sources.append((file_path, file_head_length, data_type_names[data_index]))
+            scales = {
+                get_shard_id(file_path): (file_path, file_head_length, data_type_names[data_index])
+                for file_path, _, data_index in files["scale"]
+            }
+            for file_path, _, data_index in files["weight"]:
+                weight_sources.append((file_path, file_head_length, data_type_names[data_index]))
+                scale_source = None
+                if data_type_names[data_index] == "int8":
+                    scale_source = scales.get(get_shard_id(file_path))
+                    if scale_source is None:
+                        raise ValueError("The scale file of {} is missing".format(file_path))
+                scale_sources.append(scale_source)
+    return tables
+
+
+def get_hps_tables(path, table_names=None, emb_dtype="float32"):
+    """
+    Find the HPS sparse model folders in path, whose names are the table names.
+    Returns:
+        a dict from table name to (key sources, weight sources, scale sources) like
+        ``get_sok_tables``
+    """
+    tables = {}
+    for name in sorted(os.listdir(path)):
+        folder = os.path.join(path, name)
+        if not os.path.exists(folder + "/key") or not os.path.exists(folder + "/emb_vector"):
+            continue
+        if table_names and name not in table_names:
+            continue
+        tables[name] = (
+            [(folder + "/key", 0, "int64")],
+            [(folder + "/emb_vector", 0, emb_dtype)],
+            [None],
+        )
+    return tables
+
+
+def get_num_rows(sources, num_columns):
+    num_rows = []
+    for file_path, offset, dtype in sources:
+        num_bytes = os.stat(file_path).st_size - offset
+        row_bytes = num_columns * get_storage_dtype(dtype).itemsize
+        if num_bytes % row_bytes != 0:
+            raise ValueError("The size of {} is not a multiple of the row size".format(file_path))
+        num_rows.append(num_bytes // row_bytes)
+    return num_rows
+
+
+def read_rows(sources, num_columns, rows, scale_sources=None):
+    """
+    Read the rows of the concatenation of the sources, rows are sorted. With scale_sources, the
+    scale file of every int8 source or None, the rows are read as float32 and the bfloat16 and
+    int8 sources are dequantized. Otherwise they are read as they are stored.
+    """
+    if scale_sources is not None:
+        data = np.zeros((rows.size, num_columns), dtype=np.float32)
+    else:
+        data = np.zeros((rows.size, num_columns), dtype=get_storage_dtype(sources[0][2]))
+    begin = 0
+    for i, (file_path, offset, dtype) in enumerate(sources):
+        source = map_data(file_path, dtype, offset).reshape((-1, num_columns))
+        end = begin + source.shape[0]
+        lower, upper = np.searchsorted(rows, [begin, end])
+        if upper > lower:
+            local_rows = rows[lower:upper] - begin
+            if local_rows[-1] - local_rows[0] + 1 == local_rows.size:
+                source_data = source[local_rows[0] : local_rows[-1] + 1]
+            else:
+                source_data = source[local_rows]
+            if scale_sources is not None and dtype in ("bfloat16", "int8"):
+                scales = None
+                if dtype == "int8":
+                    scales = read_rows([scale_sources[i]], 1, local_rows)
+                source_data = dequantize_rows(source_data, dtype, scales)
+            data[lower:upper] = source_data
+        begin = end
+    return data
+
+
+def create_output(path, head, num_bytes):
+    with open(path, "wb") as f:
+        f.write(head)
+        f.truncate(len(head) + num_bytes)
+
+
+def convert_chunk(task):
+    """Copy the rows of a chunk of a table into the pre-sized output files"""
+    key_sources, weight_sources, scale_sources, dimension, start, rows, outputs = task
+    for sources, scales, num_columns, (out_path, offset, dtype) in zip(
+        [key_sources, weight_sources], [None, scale_sources], [1, dimension], outputs
+    ):
+        data = read_rows(sources, num_columns, rows, scales)
+        dtype = np.dtype(dtype)
+        out = np.memmap(
+            out_path,
+            dtype=dtype,
+            mode="r+",
+            offset=offset + start * num_columns * dtype.itemsize,
+            shape=(rows.size, num_columns),
+        )
+        out[:] = data.astype(dtype)
+        out.flush()
+        del out
+    return rows.size
+
+
+def plan_table(table_name, key_sources, weight_sources, dedup):
+    """
+    Get the embedding dimension of a table and the rows to convert, keeping the last occurrence of
+    every key when dedup, so the incremental dumps override the full dump.
+    """
+    num_keys = sum(get_num_rows(key_sources, 1))
+    num_weights = sum(
+        (os.stat(path).st_size - offset) // get_storage_dtype(dtype).itemsize
+        for path, offset, dtype in weight_sources
+    )
+    if num_weights % num_keys != 0:
+        raise ValueError("The weight files of {} don't match its key files".format(table_name))
+    dimension = num_weights // num_keys
+    if sum(get_num_rows(weight_sources, dimension)) != num_keys:
+        raise ValueError("The weight files of {} don't match its key files".format(table_name))
+    if dedup:
+        keys = read_rows(key_sources, 1, np.arange(num_keys))[:, 0]
+        _, last = np.unique(keys[::-1], return_index=True)
+        rows = np.sort(num_keys - 1 - last)
+    else:
+        rows = np.arange(num_keys)
+    return dimension, rows
+
+
+def convert(tables, dst, to_hps, dedup, key_dtype, weight_dtype, num_workers, chunk_rows):
+    """Convert the tables found by get_sok_tables or get_hps_tables"""
+    os.makedirs(dst, exist_ok=True)
+    tasks = []
+    for table_name, (key_sources, weight_sources, scale_sources) in tables.items():
+        if sum(get_num_rows(key_sources, 1)) == 0:
+            print("Table {}: skipped, it has no keys".format(table_name))
+            continue
+        # the incremental dumps repeat keys of the full dump
+        checkpoints = set(os.path.dirname(path) for path, _, _ in key_sources)
+        dimension, rows = plan_table(
+            table_name, key_sources, weight_sources, dedup or len(checkpoints) > 1
+        )
+        print(
+            "Table {}: {} keys, dimension {}, {} duplicated keys removed".format(
+                table_name,
+                rows.size,
+                dimension,
+                sum(get_num_rows(key_sources, 1)) - rows.size,
+            )
+        )
+        if to_hps:
+            os.makedirs(os.path.join(dst, table_name), exist_ok=True)
+            key_path = os.path.join(dst, table_name, "key")
+            weight_path = os.path.join(dst, table_name, "emb_vector")
+            key_head, weight_head = b"", b""
+        else:
+            key_path = os.path.join(dst, table_name + "-key")
+            weight_path = os.path.join(dst, table_name + "-weight")
+            key_head = encode_file_head(table_name, 0, "", data_type_names.index(key_dtype))
+            weight_head = encode_file_head(table_name, 1, "", data_type_names.index(weight_dtype))
+        create_output(key_path, key_head, rows.size * np.dtype(key_dtype).itemsize)
+        create_output(
+            weight_path, weight_head, rows.size * dimension * np.dtype(weight_dtype).itemsize
+        )
+        outputs = [
+            (key_path, len(key_head), key_dtype),
+            (weight_path, len(weight_head), weight_dtype),
+        ]
+        for start in range(0, rows.size, chunk_rows):
+            chunk = rows[start : start + chunk_rows]
+            tasks.append(
+                (key_sources, weight_sources, scale_sources, dimension, start, chunk, outputs)
+            )
+
+    with Pool(num_workers) as pool:
+        for _ in pool.imap_unordered(convert_chunk, tasks):
+            pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert a checkpoint directory written by sok.dump into HPS sparse model "
+        "folders, or back, without loading TensorFlow."
+    )
+    parser.add_argument("direction", choices=["sok2hps", "hps2sok"])
+    parser.add_argument("src", type=str, help="path to the checkpoint or HPS model directory")
+    parser.add_argument("dst", type=str, help="path to the output directory")
+    parser.add_argument("--tables", nargs="*", default=None, help="tables to convert (optional)")
+    parser.add_argument("--dedup", action="store_true", help="keep the last row of every key")
+    parser.add_argument(
+        "--emb_dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16"],
+        help="dtype of the emb_vector files of HPS, HPS loads float32 embedding vectors",
+    )
+    parser.add_argument(
+        "--key_dtype",
+        type=str,
+        default="int64",
+        choices=["int32", "int64", "uint32", "uint64"],
+        help="dtype of the key files written by hps2sok",
+    )
+    parser.add_argument(
+        "--weight_dtype",
+        type=str,
+        default="float32",
+        choices=["float16", "float32", "float64"],
+        help="dtype of the weight files written by hps2sok",
+    )
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk_rows", type=int, default=CHUNK_ROWS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.direction == "sok2hps":
+        tables = get_sok_tables(args.src, args.tables)
+        key_dtype, weight_dtype = "int64", args.emb_dtype
+    else:
+        tables = get_hps_tables(args.src, args.tables, args.emb_dtype)
+        key_dtype, weight_dtype = args.key_dtype, args.weight_dtype
+        if os.path.exists(os.path.join(args.dst, sharded_manifest_name)):
+            print("Remove the sharded dump in {} first".format(args.dst))
+            sys.exit(1)
+    if not tables:
+        print("No table found in " + args.src)
+        sys.exit(1)
+    convert(
+        tables,
+        args.dst,
+        args.direction == "sok2hps",
+        args.dedup,
+        key_dtype,
+        weight_dtype,
+        args.num_workers,
+        args.chunk_rows,
+    )
@@ -0,0 +1,99 @@
+"""
+ Copyright (c) 2023, NVIDIA CORPORATION.
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# import the codec module alone, importing the sparse_operation_kit package loads TensorFlow
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../sparse_operation_kit/")
+)
+from checkpoint_format import inspect_checkpoint, list_delta_segments
+
+
+def format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024:
+            return "{:.2f} {}".format(num_bytes, unit)
+        num_bytes /= 1024
+    return "{:.2f} TB".format(num_bytes)
+
+
+def print_tables(path, tables):
+    print("Checkpoint: " + path)
+    print(
+        "%-32s %14s %8s %8s %6s %-24s %12s"
+        % ("table", "keys", "key", "weight", "dim", "optimizer states", "size")
+    )
+    for table in tables:
+        states = ",".join(
+            "%s:%s" % (name, dtype) for name, dtype in table["optimizer_states"].items()
+        )
+        if table["optimizer"] is not None:
+            states = table["optimizer"] + "(" + states + ")"
+        print(
+            "%-32s %14d %8s %8s %6s %-24s %12s"
+            % (
+                table["table_name"],
+                table["num_keys"],
+                table["key_dtype"],
+                table["weight_dtype"],
+                table["dimension"],
+                states or "-",
+                format_bytes(table["num_bytes"]),
+            )
+        )
+        for error in table["errors"]:
+            print("    ERROR: " + error)
+    print(
+        "Tables: %d, keys: %d, size: %s"
+        % (
+            len(tables),
+            sum(table["num_keys"] for table in tables),
+            format_bytes(sum(table["num_bytes"] for table in tables)),
+        )
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="List the tables of a checkpoint directory written by sok.dump, without "
+        "loading TensorFlow."
+    )
+    parser.add_argument("path", type=str, help="path to the checkpoint directory")
+    parser.add_argument(
+        "--json", action="store_true", help="print the summary of the tables as JSON"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.isdir(args.path):
+        print("Checkpoint directory doesn't exist: " + args.path)
+        sys.exit(1)
+
+    checkpoints = [args.path] + list_delta_segments(args.path)
+    summaries = {path: inspect_checkpoint(path) for path in checkpoints}
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for path in checkpoints:
+            print_tables(path, summaries[path])
+    if any(table["errors"] for tables in summaries.values() for table in tables):
+        sys.exit(1)
@@ -0,0 +1,296 @@
+"""
+ Copyright (c) 2023, NVIDIA CORPORATION.
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from multiprocessing import Pool
+
+# import the codec module alone, importing the sparse_operation_kit package loads TensorFlow
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../sparse_operation_kit/")
+)
+from checkpoint_format import (
+    file_head_length,
+    sharded_manifest_name,
+    sharded_format_version,
+    data_type_names,
+    get_storage_dtype,
+    get_table_files,
+    list_delta_segments,
+    map_data,
+    write_sharded_manifest,
+)
+from convert_checkpoint import read_rows, create_output
+
+CHUNK_ROWS = 1 << 20
+
+
+def load_manifest(path):
+    manifest_path = os.path.join(path, sharded_manifest_name)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def get_tables(path, table_names=None):
+    """
+    Find the files of the tables of a SOK checkpoint directory, the files of the full dump are
+    followed by the files of its incremental dumps.
+    Returns:
+        a dict from table name to a dict with keys ``optimizer``, ``shards``, the shard ids of the
+        full dump, ``num_shards``, the number of shards of the full dump or None for the single
+        file layout, and ``files``, a dict from ``key``, ``weight``, ``scale`` or a state name to
+        sources. A source is (path, data offset in bytes, dtype name).
+    """
+    tables = {}
+    for checkpoint in [path] + list_delta_segments(path):
+        manifest = load_manifest(checkpoint)
+        # an interrupted incremental dump has no manifest
+        if checkpoint != path and manifest is None:
+            continue
+        for table_name, files in get_table_files(checkpoint).items():
+            if table_names and table_name not in table_names:
+                continue
+            if checkpoint != path and table_name not in tables:
+                continue
+            if checkpoint == path:
+                shards = manifest["tables"][table_name]["shards"] if manifest else [0]
+                tables[table_name] = {
+                    "optimizer": files["optimizer"],
+                    "shards": shards,
+                    "num_shards": manifest["num_shards"] if manifest else None,
+                    "files": {},
+                }
+            groups = [("key", files["key"]), ("weight", files["weight"])]
+            if files["scale"]:
+                groups.append(("scale", files["scale"]))
+            groups += sorted(files["optimizer_state"].items())
+            for name, group in groups:
+                sources = tables[table_name]["files"].setdefault(name, [])
+                for file_path, _, data_index in group:
+                    sources.append((file_path, file_head_length, data_type_names[data_index]))
+    return tables
+
+
+def get_num_columns(name, dimension):
+    return 1 if name in ("key", "scale") else dimension
+
+
+def is_localized(table):
+    # every rank dumps a shard of a distributed table, even an empty one, only the target_gpu
+    # dumps a localized table. A checkpoint of one gpu or in the single file layout doesn't tell.
+    return table["num_shards"] is not None and table["num_shards"] > 1 and len(table["shards"]) == 1
+
+
+def get_num_keys(table):
+    key_sources = table["files"]["key"]
+    num_bytes = sum(os.stat(path).st_size - offset for path, offset, _ in key_sources)
+    return num_bytes // get_storage_dtype(key_sources[0][2]).itemsize
+
+
+def plan_table(table_name, table, num_shards, placement):
+    """
+    Get the embedding dimension of a table and the rows of every output shard. The rows of a
+    distributed table go to shard ``key % num_shards`` in key order, the rows of a localized table
+    go to the shard of its placement in their order. The last occurrence of every key is kept when
+    the table has incremental dumps.
+    Returns:
+        the dimension and a list of rows per shard, None for the shards without the table
+    """
+    sizes = {}
+    for name, sources in table["files"].items():
+        # the files are copied as they are, e.g. the int8 weights of the full dump can't be
+        # merged with the float32 weights of an incremental dump
+        if len(set(dtype for _, _, dtype in sources)) > 1:
+            raise ValueError("The {} files of {} have different dtypes".format(name, table_name))
+        sizes[name] = sum(os.stat(path).st_size - offset for path, offset, _ in sources)
+        sizes[name] //= get_storage_dtype(sources[0][2]).itemsize
+    num_keys = sizes["key"]
+    if num_keys == 0 or sizes["weight"] % num_keys != 0:
+        raise ValueError("The weight files of {} don't match its key files".format(table_name))
+    dimension = sizes["weight"] // num_keys
+    for name, size in sizes.items():
+        if size != num_keys * get_num_columns(name, dimension):
+            raise ValueError(
+                "The {} files of {} don't match its key files".format(name, table_name)
+            )
+
+    keys = read_rows(table["files"]["key"], 1, np.arange(num_keys))[:, 0]
+    num_checkpoints = len(set(os.path.dirname(path) for path, _, _ in table["files"]["key"]))
+    if num_checkpoints > 1:
+        _, last = np.unique(keys[::-1], return_index=True)
+        rows = np.sort(num_keys - 1 - last)
+    else:
+        rows = np.arange(num_keys)
+
+    shard_rows = [None] * num_shards
+    if placement is not None:
+        shard_rows[placement] = rows
+    else:
+        keys = keys[rows]
+        parts = (keys % keys.dtype.type(num_shards)).astype(np.int64)
+        order = np.lexsort((keys, parts))
+        bounds = np.searchsorted(parts[order], np.arange(num_shards + 1))
+        for shard_id in range(num_shards):
+            shard_rows[shard_id] = rows[order[bounds[shard_id] : bounds[shard_id + 1]]]
+    return dimension, shard_rows
+
+
+def read_head(path):
+    with open(path, "rb") as f:
+        return f.read(file_head_length)
+
+
+def reshard_chunk(task):
+    """Copy the rows of a chunk of a shard into the pre-sized output files"""
+    table_files, dimension, start, rows, outputs = task
+    # the rows of a shard are in key order, read them in file order
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    for name, sources in table_files.items():
+        num_columns = get_num_columns(name, dimension)
+        out_path, offset, dtype = outputs[name]
+        data = np.empty((rows.size, num_columns), dtype=get_storage_dtype(dtype))
+        data[order] = read_rows(sources, num_columns, sorted_rows)
+        out = np.memmap(
+            out_path,
+            dtype=data.dtype,
+            mode="r+",
+            offset=offset + start * num_columns * data.dtype.itemsize,
+            shape=data.shape,
+        )
+        out[:] = data
+        out.flush()
+        del out
+    return rows.size
+
+
+def reshard(tables, dst, num_shards, placements, num_workers, chunk_rows):
+    """Rewrite the tables found by get_tables into the sharded layout of num_shards gpus"""
+    os.makedirs(dst, exist_ok=True)
+    manifest = {
+        "version": sharded_format_version,
+        "num_shards": num_shards,
+        "optimizer": "",
+        "slot_names": [],
+        "tables": {},
+    }
+    tasks = []
+    for table_name, table in tables.items():
+        if get_num_keys(table) == 0:
+            print("Table {}: skipped, it has no keys".format(table_name))
+            continue
+        placement = placements.get(table_name)
+        if placement is None and is_localized(table):
+            placement = table["shards"][0] % num_shards
+        dimension, shard_rows = plan_table(table_name, table, num_shards, placement)
+        slot_names = [name for name in table["files"] if name not in ("key", "weight", "scale")]
+        if table["optimizer"] is not None:
+            manifest["optimizer"] = table["optimizer"]
+            manifest["slot_names"] = slot_names
+        manifest["tables"][table_name] = {"shards": [], "num_keys": []}
+        print(
+            "Table {}: {}, dimension {}, {} keys per shard".format(
+                table_name,
+                (
+                    "localized on shard {}".format(placement)
+                    if placement is not None
+                    else "distributed"
+                ),
+                dimension,
+                [rows.size for rows in shard_rows if rows is not None],
+            )
+        )
+
+        for shard_id, rows in enumerate(shard_rows):
+            if rows is None:
+                continue
+            manifest["tables"][table_name]["shards"].append(shard_id)
+            manifest["tables"][table_name]["num_keys"].append(int(rows.size))
+            outputs = {}
+            for name, sources in table["files"].items():
+                if name in ("key", "weight", "scale"):
+                    file_name = "{}-{}.shard{}".format(table_name, name, shard_id)
+                else:
+                    file_name = "{}-{}-{}.shard{}".format(
+                        table_name, table["optimizer"], name, shard_id
+                    )
+                out_path = os.path.join(dst, file_name)
+                dtype = sources[0][2]
+                num_columns = get_num_columns(name, dimension)
+                head = read_head(sources[0][0])
+                num_bytes = rows.size * num_columns * get_storage_dtype(dtype).itemsize
+                create_output(out_path, head, num_bytes)
+                outputs[name] = (out_path, len(head), dtype)
+            for start in range(0, rows.size, chunk_rows):
+                chunk = rows[start : start + chunk_rows]
+                tasks.append((table["files"], dimension, start, chunk, outputs))
+
+    with Pool(num_workers) as pool:
+        for _ in pool.imap_unordered(reshard_chunk, tasks):
+            pass
+    # the manifest is written last, so an interrupted run can't be loaded
+    write_sharded_manifest(dst, manifest)
+
+
+def parse_placements(placements):
+    result = {}
+    for placement in placements or []:
+        table_name, _, shard_id = placement.rpartition("=")
+        if not table_name or not shard_id.isdigit():
+            raise ValueError("--localized expects TABLE=GPU, got " + placement)
+        result[table_name] = int(shard_id)
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Rewrite a checkpoint directory written by sok.dump into the sharded layout "
+        "of another number of GPUs, without loading TensorFlow."
+    )
+    parser.add_argument("src", type=str, help="path to the checkpoint directory")
+    parser.add_argument("dst", type=str, help="path to the output directory")
+    parser.add_argument("--num_gpus", type=int, required=True, help="number of GPUs to load on")
+    parser.add_argument(
+        "--localized",
+        nargs="*",
+        default=None,
+        help="TABLE=GPU, the target_gpu of a localized table (optional)",
+    )
+    parser.add_argument("--tables", nargs="*", default=None, help="tables to reshard (optional)")
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk_rows", type=int, default=CHUNK_ROWS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    placements = parse_placements(args.localized)
+    if any(shard_id >= args.num_gpus for shard_id in placements.values()):
+        print("The target_gpu of a localized table must be less than --num_gpus")
+        sys.exit(1)
+    if os.path.realpath(args.src) == os.path.realpath(args.dst):
+        print("The output directory must not be the checkpoint directory")
+        sys.exit(1)
+    tables = get_tables(args.src, args.tables)
+    if not tables:
+        print("No table found in " + args.src)
+        sys.exit(1)
+    reshard(tables, args.dst, args.num_gpus, placements, args.num_workers, args.chunk_rows)
@@ -21,13 +21,17 @@
 #include <core23/logger.hpp>
 #include <filesystem>
 #include <fstream>
+#include <functional>
 #include <hps/database_backend.hpp>
 #include <hps/hash_map_backend.hpp>
 #include <hps/hier_parameter_server_base.hpp>
 #include <hps/mp_hash_map_backend.hpp>
+#include <hps/negative_lookup_cache.hpp>
 #include <hps/redis_backend.hpp>
 #include <hps/rocksdb_backend.hpp>
 #include <memory>
+#include <numeric>
+#include <thread>
 #include <vector>
 
 using namespace HugeCTR;
@@ -249,6 +253,192 @@ void db_backend_dump_test(DatabaseType_t database_type) {
   }
 }
 
+template <typename Key>
+std::unique_ptr<DatabaseBackendBase<Key>> make_volatile_db(
+    const DatabaseType_t database_type,
+    const std::function<void(VolatileBackendParams&)>& configure) {
+  switch (database_type) {
+    case DatabaseType_t::HashMap: {
+      HashMapBackendParams params;
+      configure(params);
+      return std::make_unique<HashMapBackend<Key>>(params);
+    } break;
+
+    case DatabaseType_t::MultiProcessHashMap: {
+      MultiProcessHashMapBackendParams params;
+      params.allocation_rate = 1024L * 1024;
+      params.shared_memory_size = 256L * 1024 * 1024;
+      params.shared_memory_name = "hctr_mp_hash_map_database_test";
+      configure(params);
+      return std::make_unique<MultiProcessHashMapBackend<Key>>(params);
+    } break;
+
+    default:
+      HCTR_DIE("Unsupported database type!");
+      return nullptr;
+  }
+}
+
+template <typename Key>
+void db_backend_overflow_test(const DatabaseType_t database_type,
+                              const DatabaseOverflowPolicy_t overflow_policy) {
+  constexpr size_t overflow_margin{100};
+  std::unique_ptr<DatabaseBackendBase<Key>> db{
+      make_volatile_db<Key>(database_type, [&](VolatileBackendParams& params) {
+        params.max_batch_size = 16;
+        params.num_partitions = 1;
+        params.overflow_margin = overflow_margin;
+        params.overflow_policy = overflow_policy;
+        params.overflow_resolution_target = 0.5;
+      })};
+
+  const std::string& tag{HierParameterServerBase::make_tag_name("overflow", "test")};
+
+  // Keep inserting new keys, while keys [0, 10) are queried after every insert.
+  std::vector<Key> keys(10);
+  std::vector<double> values(keys.size());
+  const std::vector<Key> hot_keys{0, 1, 2, 3, 4, 5, 6, 7, 8, 9};
+
+  Key k{0};
+  while (k < 1000) {
+    for (size_t i{0}; i < keys.size(); ++i, ++k) {
+      keys[i] = k;
+      values[i] = k * k;
+    }
+    db->insert(tag, keys.size(), keys.data(), reinterpret_cast<char*>(values.data()),
+               sizeof(double), sizeof(double));
+    EXPECT_LE(db->size(tag), overflow_margin + keys.size());
+
+    db->fetch(tag, hot_keys.size(), hot_keys.data(), reinterpret_cast<char*>(values.data()),
+              sizeof(double), [&](size_t index) {});
+  }
+
+  // CLOCK never evicts entries that were queried since the hand passed them last.
+  if (overflow_policy == DatabaseOverflowPolicy_t::EvictClock) {
+    db->fetch(tag, hot_keys.size(), hot_keys.data(), reinterpret_cast<char*>(values.data()),
+              sizeof(double), [&](size_t index) { FAIL(); });
+  }
+
+  // Whatever survived must still be intact.
+  std::vector<Key> all_keys(static_cast<size_t>(k));
+  std::iota(all_keys.begin(), all_keys.end(), 0);
+  std::vector<double> all_values(all_keys.size());
+  std::vector<bool> missing(all_keys.size());
+  const size_t num_hits{db->fetch(tag, all_keys.size(), all_keys.data(),
+                                  reinterpret_cast<char*>(all_values.data()), sizeof(double),
+                                  [&](size_t index) { missing[index] = true; })};
+  EXPECT_EQ(num_hits, db->size(tag));
+  for (size_t i{0}; i < all_keys.size(); ++i) {
+    if (!missing[i]) {
+      EXPECT_DOUBLE_EQ(all_values[i], all_keys[i] * all_keys[i]);
+    }
+  }
+}
+
+template <typename Key>
+void db_backend_background_overflow_test(const DatabaseOverflowPolicy_t overflow_policy) {
+  HashMapBackendParams params;
+  params.max_batch_size = 16;
+  params.num_partitions = 1;
+  params.overflow_margin = 1000;
+  params.overflow_policy = overflow_policy;
+  params.overflow_resolution_target = 0.5;
+  params.background_overflow_resolution = true;
+  params.overflow_soft_watermark = 0.9;
+  std::unique_ptr<DatabaseBackendBase<Key>> db{std::make_unique<HashMapBackend<Key>>(params)};
+
+  const std::string& tag{HierParameterServerBase::make_tag_name("background_overflow", "test")};
+
+  // Cross the soft watermark, but stay below the overflow margin.
+  std::vector<Key> keys(950);
+  std::iota(keys.begin(), keys.end(), 0);
+  std::vector<double> values(keys.size());
+  std::transform(keys.begin(), keys.end(), values.begin(),
+                 [](const Key k) -> double { return k * k; });
+  db->insert(tag, keys.size(), keys.data(), reinterpret_cast<char*>(values.data()), sizeof(double),
+             sizeof(double));
+
+  // The background thread should trim the partition down to the resolution target.
+  const size_t resolution_margin{params.overflow_resolution_margin()};
+  for (size_t i{0}; i < 500 && db->size(tag) > resolution_margin; ++i) {
+    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+  }
+  EXPECT_EQ(db->size(tag), resolution_margin);
+
+  // Whatever survived must still be intact.
+  std::vector<bool> missing(keys.size());
+  const size_t num_hits{db->fetch(tag, keys.size(), keys.data(),
+                                  reinterpret_cast<char*>(values.data()), sizeof(double),
+                                  [&](size_t index) { missing[index] = true; })};
+  EXPECT_EQ(num_hits, resolution_margin);
+  for (size_t i{0}; i < keys.size(); ++i) {
+    if (!missing[i]) {
+      EXPECT_DOUBLE_EQ(values[i], keys[i] * keys[i]);
+    }
+  }
+}
+
+template <typename Key>
+void negative_lookup_cache_test() {
+  std::chrono::steady_clock::time_point now{};
+
+  const std::string tag{"tbl"};
+  NegativeLookupCache<Key> cache(8, std::chrono::milliseconds{200}, [&]() { return now; });
+
+  std::vector<Key> keys(10);
+  std::iota(keys.begin(), keys.end(), 0);
+  std::vector<size_t> indices(keys.size());
+
+  // Nothing known yet.
+  std::iota(indices.begin(), indices.end(), 0);
+  EXPECT_EQ(cache.filter(tag, indices, keys.data(), [](size_t) { FAIL(); }), 0);
+  EXPECT_EQ(indices.size(), keys.size());
+
+  // Capacity is respected.
+  cache.insert(tag, cache.generation(tag), indices.size(), indices.data(), keys.data());
+  EXPECT_EQ(cache.size(tag), 8);
+
+  std::vector<size_t> hits;
+  EXPECT_EQ(cache.filter(tag, indices, keys.data(), [&](size_t i) { hits.emplace_back(i); }), 8);
+  EXPECT_EQ(hits.size(), 8);
+  EXPECT_EQ(indices, std::vector<size_t>({8, 9}));
+  EXPECT_EQ(cache.num_hits(), 8);
+  EXPECT_EQ(cache.num_misses(), 12);
+
+  // Updated keys are forgotten.
+  cache.erase(tag, 2, keys.data());
+  indices.resize(keys.size());
+  std::iota(indices.begin(), indices.end(), 0);
+  EXPECT_EQ(cache.filter(tag, indices, keys.data(), [](size_t) {}), 6);
+  EXPECT_EQ(indices, std::vector<size_t>({0, 1, 8, 9}));
+
+  // Keys are not remembered if keys were forgotten since the lookup started.
+  uint64_t generation{cache.generation(tag)};
+  cache.erase(tag, 1, &keys[0]);
+  cache.insert(tag, generation, 2, indices.data(), keys.data());
+  EXPECT_EQ(cache.size(tag), 6);
+
+  // Other tables are not affected.
+  indices.resize(keys.size());
+  std::iota(indices.begin(), indices.end(), 0);
+  EXPECT_EQ(cache.filter("other", indices, keys.data(), [](size_t) { FAIL(); }), 0);
+
+  // Entries expire, and make room for new ones.
+  cache.insert(tag, cache.generation(tag), 2, indices.data(), keys.data());
+  EXPECT_EQ(cache.size(tag), 8);
+  now += std::chrono::milliseconds{300};
+  EXPECT_EQ(cache.filter(tag, indices, keys.data(), [](size_t) { FAIL(); }), 0);
+  cache.insert(tag, cache.generation(tag), 2, &indices[8], keys.data());
+  EXPECT_EQ(cache.size(tag), 2);
+
+  // Reloaded tables are forgotten, including lookups that are still running.
+  generation = cache.generation(tag);
+  cache.clear({tag});
+  EXPECT_EQ(cache.size(tag), 0);
+  cache.insert(tag, generation, 2, indices.data(), keys.data());
+  EXPECT_EQ(cache.size(tag), 0);
+}
+
 }  // namespace
 
 TEST(db_backend_insert_fetch_test, HashMap) {
@@ -276,3 +466,68 @@ TEST(db_backend_dump_load, RedisCluster) {
   db_backend_dump_test<long long>(DatabaseType_t::RedisCluster);
 }
 TEST(db_backend_dump_load, RocksDB) { db_backend_dump_test<long long>(DatabaseType_t::RocksDB); }
+
+TEST(db_backend_overflow, HashMap_EvictRandom) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictRandom);
+}
+TEST(db_backend_overflow, HashMap_EvictLeastUsed) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictLeastUsed);
+}
+TEST(db_backend_overflow, HashMap_EvictOldest) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictOldest);
+}
+TEST(db_backend_overflow, HashMap_EvictSampledLeastUsed) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictSampledLeastUsed);
+}
+TEST(db_backend_overflow, HashMap_EvictSampledOldest) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictSampledOldest);
+}
+TEST(db_backend_overflow, HashMap_EvictClock) {
+  db_backend_overflow_test<long long>(DatabaseType_t::HashMap,
+                                      DatabaseOverflowPolicy_t::EvictClock);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictRandom) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictRandom);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictLeastUsed) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictLeastUsed);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictOldest) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictOldest);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictSampledLeastUsed) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictSampledLeastUsed);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictSampledOldest) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictSampledOldest);
+}
+TEST(db_backend_overflow, MultiProcessHashMap_EvictClock) {
+  db_backend_overflow_test<long long>(DatabaseType_t::MultiProcessHashMap,
+                                      DatabaseOverflowPolicy_t::EvictClock);
+}
+
+TEST(db_backend_background_overflow, HashMap_EvictRandom) {
+  db_backend_background_overflow_test<long long>(DatabaseOverflowPolicy_t::EvictRandom);
+}
+TEST(db_backend_background_overflow, HashMap_EvictLeastUsed) {
+  db_backend_background_overflow_test<long long>(DatabaseOverflowPolicy_t::EvictLeastUsed);
+}
+TEST(db_backend_background_overflow, HashMap_EvictSampledOldest) {
+  db_backend_background_overflow_test<long long>(DatabaseOverflowPolicy_t::EvictSampledOldest);
+}
+TEST(db_backend_background_overflow, HashMap_EvictClock) {
+  db_backend_background_overflow_test<long long>(DatabaseOverflowPolicy_t::EvictClock);
+}
+
+TEST(negative_lookup_cache, uint) { negative_lookup_cache_test<unsigned int>(); }
+TEST(negative_lookup_cache, longlong) { negative_lookup_cache_test<long long>(); }
@@ -14,7 +14,9 @@
  * limitations under the License.
  */
 
+#include <algorithm>
 #include <argparse/argparse.hpp>
+#include <atomic>
 #include <core/memory.hpp>
 #include <core23/logger.hpp>
 #include <hps/hash_map_backend.hpp>
@@ -26,6 +28,7 @@
 #include <random>
 #include <sstream>
 #include <string>
+#include <thread>
 #include <unordered_map>
 #include <vector>
 
@@ -61,6 +64,11 @@ int main(int argc, char** argv) {
       .default_value(false)
       .implicit_value(true);
 
+  args.add_argument("--test_overflow_fetch")
+      .help("Enables measuring fetch latency while inserts keep the database overflowing.")
+      .default_value(false)
+      .implicit_value(true);
+
   args.add_argument("--seed")
       .help("Seed for the random number generator.")
       .default_value<uint64_t>(4711)
@@ -87,6 +95,36 @@ int main(int argc, char** argv) {
       .default_value<size_t>(8L * 1024 * 1024)
       .scan<'u', size_t>();
 
+  // Overflow parameters (HashMap and Redis).
+  args.add_argument("--overflow_margin")
+      .help("Maximum number of values per partition.")
+      .default_value<size_t>(std::numeric_limits<size_t>::max())
+      .scan<'u', size_t>();
+
+  args.add_argument("--overflow_policy")
+      .help("Policy to apply when a partition overflows.")
+      .default_value<std::string>("evict_random");
+
+  args.add_argument("--overflow_background")
+      .help("Resolve overflows in a background thread (HashMap only).")
+      .default_value(false)
+      .implicit_value(true);
+
+  args.add_argument("--overflow_soft_watermark")
+      .help("Fraction of the overflow margin at which background overflow resolution starts.")
+      .default_value<double>(0.9)
+      .scan<'g', double>();
+
+  args.add_argument("--overflow_duration")
+      .help("Duration of the overflow fetch test in seconds.")
+      .default_value<size_t>(30)
+      .scan<'u', size_t>();
+
+  args.add_argument("--overflow_query_amount")
+      .help("Amount of values to query per fetch during the overflow fetch test.")
+      .default_value<size_t>(1024)
+      .scan<'u', size_t>();
+
   // Redis parameters.
   args.add_argument("--re_address")
       .help("Redis server address.")
@@ -164,12 +202,20 @@ int main(int argc, char** argv) {
   const auto no_test_insert_evict = args.get<bool>("--no_test_insert_evict");
   const auto no_test_upsert = args.get<bool>("--no_test_upsert");
   const auto no_test_fetch = args.get<bool>("--no_test_fetch");
+  const auto test_overflow_fetch = args.get<bool>("--test_overflow_fetch");
   const auto seed = args.get<uint64_t>("--seed");
   // HM parameters.
   const auto hm_parts = args.get<size_t>("--hm_parts");
   const auto hm_alloc_rate = args.get<size_t>("--hm_alloc_rate");
   const auto hm_sm_size = args.get<size_t>("--hm_sm_size");
   const auto hm_batch_size = args.get<size_t>("--hm_batch_size");
+  // Overflow parameters.
+  const auto overflow_margin = args.get<size_t>("--overflow_margin");
+  const auto overflow_policy_name = args.get<std::string>("--overflow_policy");
+  const auto overflow_background = args.get<bool>("--overflow_background");
+  const auto overflow_soft_watermark = args.get<double>("--overflow_soft_watermark");
+  const auto overflow_duration = args.get<size_t>("--overflow_duration");
+  const auto overflow_query_amount = args.get<size_t>("--overflow_query_amount");
   // Redis parameters.
   const auto re_address = args.get<std::string>("--re_address");
   const auto re_parts = args.get<size_t>("--re_parts");
@@ -191,6 +237,7 @@ int main(int argc, char** argv) {
             << "  no_test_insert_evict = " << no_test_insert_evict << std::endl
             << "  no_test_upsert       = " << no_test_upsert << std::endl
             << "  no_test_fetch        = " << no_test_fetch << std::endl
+            << "  test_overflow_fetch  = " << test_overflow_fetch << std::endl
             << "  seed                 = " << seed << std::endl
             << "  -----------------------------" << std::endl
             << "  broker = " << kafka_broker << std::endl
@@ -204,6 +251,13 @@ int main(int argc, char** argv) {
             << "  hm_sm_size     = " << hm_sm_size << std::endl
             << "  hm_batch_size  = " << hm_batch_size << std::endl
             << std::endl
+            << "  overflow_margin       = " << overflow_margin << std::endl
+            << "  overflow_policy       = " << overflow_policy_name << std::endl
+            << "  overflow_background   = " << overflow_background << std::endl
+            << "  overflow_soft_wmark   = " << overflow_soft_watermark << std::endl
+            << "  overflow_duration     = " << overflow_duration << " s" << std::endl
+            << "  overflow_query_amount = " << overflow_query_amount << std::endl
+            << std::endl
             << "  re_address     = " << re_address << std::endl
             << "  re_parts       = " << re_parts << std::endl
             << "  re_connections = " << re_connections << std::endl
@@ -222,12 +276,33 @@ int main(int argc, char** argv) {
 
   const std::string tag_name = HierParameterServerBase::make_tag_name(model_name, table_name);
 
+  DatabaseOverflowPolicy_t overflow_policy = DatabaseOverflowPolicy_t::EvictRandom;
+  {
+    bool found = false;
+    for (const DatabaseOverflowPolicy_t policy :
+         {DatabaseOverflowPolicy_t::EvictRandom, DatabaseOverflowPolicy_t::EvictLeastUsed,
+          DatabaseOverflowPolicy_t::EvictOldest, DatabaseOverflowPolicy_t::EvictSampledLeastUsed,
+          DatabaseOverflowPolicy_t::EvictSampledOldest, DatabaseOverflowPolicy_t::EvictClock}) {
+      if (overflow_policy_name == hctr_enum_to_c_str(policy)) {
+        overflow_policy = policy;
+        found = true;
+      }
+    }
+    if (!found) {
+      HCTR_DIE("Unsupported overflow_policy!");
+    }
+  }
+
   std::unique_ptr<DatabaseBackendBase<Key>> db;
   if (db_type == "hashmap") {
     HashMapBackendParams params;
     params.max_batch_size = hm_batch_size;
     params.num_partitions = hm_parts;
     params.allocation_rate = hm_alloc_rate;
+    params.overflow_margin = overflow_margin;
+    params.overflow_policy = overflow_policy;
+    params.background_overflow_resolution = overflow_background;
+    params.overflow_soft_watermark = overflow_soft_watermark;
     db = std::make_unique<HashMapBackend<Key>>(params);
   } else if (db_type == "mp_hashmap") {
     MultiProcessHashMapBackendParams params;
@@ -235,6 +310,8 @@ int main(int argc, char** argv) {
     params.num_partitions = hm_parts;
     params.allocation_rate = hm_alloc_rate;
     params.shared_memory_size = hm_sm_size;
+    params.overflow_margin = overflow_margin;
+    params.overflow_policy = overflow_policy;
     db = std::make_unique<MultiProcessHashMapBackend<Key>>(params);
 #ifdef HCTR_USE_REDIS
   } else if (db_type == "redis") {
@@ -243,6 +320,8 @@ int main(int argc, char** argv) {
     params.num_partitions = re_parts;
     params.address = re_address;
     params.num_node_connections = re_connections;
+    params.overflow_margin = overflow_margin;
+    params.overflow_policy = overflow_policy;
     db = std::make_unique<RedisClusterBackend<Key>>(params);
 #endif  // HCTR_USE_REDIS
 #ifdef HCTR_USE_ROCKS_DB
@@ -380,6 +459,79 @@ int main(int argc, char** argv) {
         }
       }
     }
+
+    // Fetch latency while a writer keeps inserting new keys, so that the database is permanently
+    // resolving overflows.
+    if (test_overflow_fetch) {
+      HCTR_LOG_S(INFO, WORLD) << "Measuring fetch latency during sustained overflow..."
+                              << std::endl;
+
+      std::atomic<bool> stop_writer{false};
+      std::atomic<Key> num_keys{static_cast<Key>(fill_amount)};
+      std::atomic<size_t> num_inserts{0};
+
+      std::thread writer([&]() {
+        std::vector<Key> w_keys(fill_burst);
+        try {
+          while (!stop_writer) {
+            const Key first_key = num_keys;
+            for (size_t j = 0; j < w_keys.size(); ++j) {
+              w_keys[j] = first_key + static_cast<Key>(j);
+            }
+            db->insert(tag_name, w_keys.size(), w_keys.data(),
+                       reinterpret_cast<const char*>(in_values.data()), emb_size * sizeof(float),
+                       emb_size * sizeof(float));
+            num_keys += static_cast<Key>(w_keys.size());
+            num_inserts += w_keys.size();
+          }
+        } catch (const std::exception& error) {
+          HCTR_LOG_S(ERROR, WORLD) << "Writer error: " << error.what() << std::endl;
+        }
+      });
+
+      // Query the most recently inserted keys, which are likely to be still present.
+      const size_t window = std::min(db->capacity(tag_name), fill_amount);
+      std::vector<Key> q_keys(overflow_query_amount);
+      std::vector<float, AlignedAllocator<float>> q_values(q_keys.size() * emb_size);
+      std::vector<double> latencies;
+      size_t num_hits = 0;
+
+      const auto end = std::chrono::high_resolution_clock::now() +
+                       std::chrono::seconds(static_cast<long long>(overflow_duration));
+      do {
+        const Key last_key = num_keys;
+        std::uniform_int_distribution<Key> key_dist(
+            std::max<Key>(last_key - static_cast<Key>(window), 0), last_key - 1);
+        for (size_t j = 0; j < q_keys.size(); ++j) {
+          q_keys[j] = key_dist(gen);
+        }
+
+        const auto t0 = std::chrono::high_resolution_clock::now();
+        num_hits += db->fetch(tag_name, q_keys.size(), q_keys.data(),
+                              reinterpret_cast<char*>(q_values.data()), emb_size * sizeof(float),
+                              [&](const size_t) {});
+        const auto t1 = std::chrono::high_resolution_clock::now();
+        latencies.emplace_back(std::chrono::duration<double, std::micro>(t1 - t0).count());
+      } while (std::chrono::high_resolution_clock::now() < end);
+
+      stop_writer = true;
+      writer.join();
+
+      std::sort(latencies.begin(), latencies.end());
+      const auto percentile = [&](const double p) {
+        return latencies[std::min(static_cast<size_t>(p * static_cast<double>(latencies.size())),
+                                  latencies.size() - 1)];
+      };
+      HCTR_LOG_S(INFO, WORLD) << "Overflow fetch test (" << overflow_policy_name
+                              << "): DB size = " << db->size(tag_name)
+                              << ", inserts = " << num_inserts << ", fetches = " << latencies.size()
+                              << ", hit rate = " << std::fixed << std::setprecision(3)
+                              << (static_cast<double>(num_hits) /
+                                  static_cast<double>(latencies.size() * q_keys.size()))
+                              << ", p50 = " << percentile(0.5) << " us, p99 = " << percentile(0.99)
+                              << " us, p99.9 = " << percentile(0.999)
+                              << " us, max = " << latencies.back() << " us" << std::endl;
+    }
   } catch (const DatabaseBackendError& error) {
     HCTR_LOG_S(ERROR, WORLD) << "Partition #" << error.partition() << ": " << error.what()
                              << std::endl;
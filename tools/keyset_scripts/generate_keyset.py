@@ -17,46 +17,244 @@
 import sys
 import os
 import argparse
+import concurrent.futures
 import logging
 import numpy as np
-import cudf
 import glob
 
+try:
+    import cudf
+except ImportError:
+    cudf = None
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
 logging.basicConfig(format="%(asctime)s %(message)s")
 logging.root.setLevel(logging.NOTSET)
 
 CRITEO_CAT_POS = [c for c in range(14, 40)]
 
+# Header of the frequency sorted keyset, followed by the per-slot statistics, the keys sorted by
+# descending frequency and their int64 frequency counts
+SORTED_KEYSET_MAGIC = 0x5445534B59454B48  # "HKEYKSET"
+SORTED_KEYSET_VERSION = 1
+SORTED_KEYSET_HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "<u8"),
+        ("version", "<i8"),
+        ("key_size", "<i8"),
+        ("num_slots", "<i8"),
+        ("num_keys", "<i8"),
+        ("total_count", "<i8"),
+    ]
+)
+# The number of hottest keys needed to cover these fractions of all lookups is stored in the header
+SORTED_KEYSET_COVERAGES = np.array([0.5, 0.8, 0.9, 0.95, 0.99, 1.0])
+
+
+def merge_sorted_keys(keys_a, counts_a, keys_b, counts_b):
+    """Merge two sorted unique key arrays and sum up the frequency counts of common keys"""
+    if keys_a.size < keys_b.size:
+        keys_a, counts_a, keys_b, counts_b = keys_b, counts_b, keys_a, counts_a
+    # binary search the smaller run in the larger one, no sort of the concatenated runs is needed
+    pos = np.searchsorted(keys_a, keys_b)
+    found = pos < keys_a.size
+    found[found] = keys_a[pos[found]] == keys_b[found]
+    counts_a = counts_a.copy()
+    np.add.at(counts_a, pos[found], counts_b[found])
+    new = ~found
+    return np.insert(keys_a, pos[new], keys_b[new]), np.insert(counts_a, pos[new], counts_b[new])
+
+
+def merge_sorted_keysets(keysets):
+    """Merge a list of (keys, counts) pairs of sorted unique keys pairwise, like a merge sort, so
+    every key is merged O(log(len(keysets))) times instead of once per merged pair"""
+    if not keysets:
+        return np.zeros(shape=(0,), dtype=np.int64), np.zeros(shape=(0,), dtype=np.int64)
+    while len(keysets) > 1:
+        merged = [
+            merge_sorted_keys(*keysets[i], *keysets[i + 1]) for i in range(0, len(keysets) - 1, 2)
+        ]
+        if len(keysets) % 2:
+            merged.append(keysets[-1])
+        keysets = merged
+    return keysets[0]
+
+
+def push_sorted_keyset(keysets, keys, counts):
+    """Add a (keys, counts) pair of sorted unique keys to a stack of pending runs. A run is merged
+    into the one below it while that one is at most twice as large, so the stack holds at most
+    log2(#keys) runs and its memory stays close to the size of the union of the keys"""
+    keysets.append((keys, counts))
+    while len(keysets) > 1 and keysets[-2][0].size <= 2 * keysets[-1][0].size:
+        keys_b, counts_b = keysets.pop()
+        keys_a, counts_a = keysets.pop()
+        keysets.append(merge_sorted_keys(keys_a, counts_a, keys_b, counts_b))
+
+
+def sort_keys_by_frequency(all_keysets):
+    """Return the keys of all slots, their counts and slot ids sorted by descending frequency"""
+    keys = np.concatenate([keys for keys, _ in all_keysets])
+    counts = np.concatenate([counts for _, counts in all_keysets])
+    slot_ids = np.concatenate(
+        [np.full(keys.size, i, dtype=np.int64) for i, (keys, _) in enumerate(all_keysets)]
+    )
+    # ties are broken by the key order
+    order = np.argsort(-counts, kind="stable")
+    return keys[order], counts[order], slot_ids[order]
+
+
+def write_frequency_sorted_keyset(path, all_keysets, int32_keyset=False):
+    keys, counts, _ = sort_keys_by_frequency(all_keysets)
+    key_dtype = np.int32 if int32_keyset else np.int64
+    header = np.zeros(shape=(1,), dtype=SORTED_KEYSET_HEADER_DTYPE)
+    header["magic"] = SORTED_KEYSET_MAGIC
+    header["version"] = SORTED_KEYSET_VERSION
+    header["key_size"] = np.dtype(key_dtype).itemsize
+    header["num_slots"] = len(all_keysets)
+    header["num_keys"] = keys.size
+    header["total_count"] = counts.sum()
+    slot_num_keys = np.array([k.size for k, _ in all_keysets], dtype=np.int64)
+    slot_total_counts = np.array([c.sum() for _, c in all_keysets], dtype=np.int64)
+    cum_counts = np.cumsum(counts)
+    num_hot_keys = np.searchsorted(
+        cum_counts, np.ceil(SORTED_KEYSET_COVERAGES * counts.sum()), side="left"
+    )
+    num_hot_keys = np.minimum(num_hot_keys + 1, keys.size).astype(np.int64)
+    with open(path, "wb") as f:
+        header.tofile(f)
+        slot_num_keys.tofile(f)
+        slot_total_counts.tofile(f)
+        SORTED_KEYSET_COVERAGES.astype("<f8").tofile(f)
+        num_hot_keys.tofile(f)
+        keys.astype(key_dtype).tofile(f)
+        counts.tofile(f)
+
+
+def read_frequency_sorted_keyset(path):
+    """Read a keyset written by write_frequency_sorted_keyset
+    Returns:
+        header: dict of the header fields and the per-slot statistics
+        keys: np.ndarray, keys sorted by descending frequency
+        counts: np.ndarray, frequency counts of the keys
+    """
+    with open(path, "rb") as f:
+        header = np.fromfile(f, dtype=SORTED_KEYSET_HEADER_DTYPE, count=1)[0]
+        if header["magic"] != SORTED_KEYSET_MAGIC:
+            raise ValueError("{} is not a frequency sorted keyset".format(path))
+        num_slots = int(header["num_slots"])
+        num_keys = int(header["num_keys"])
+        header = {name: int(header[name]) for name in SORTED_KEYSET_HEADER_DTYPE.names}
+        header["slot_num_keys"] = np.fromfile(f, dtype="<i8", count=num_slots)
+        header["slot_total_counts"] = np.fromfile(f, dtype="<i8", count=num_slots)
+        header["coverages"] = np.fromfile(f, dtype="<f8", count=SORTED_KEYSET_COVERAGES.size)
+        header["num_hot_keys"] = np.fromfile(f, dtype="<i8", count=SORTED_KEYSET_COVERAGES.size)
+        key_dtype = np.int32 if header["key_size"] == 4 else np.int64
+        keys = np.fromfile(f, dtype=key_dtype, count=num_keys)
+        counts = np.fromfile(f, dtype="<i8", count=num_keys)
+    return header, keys, counts
+
+
+def select_hot_keys(keys, counts, coverage):
+    """Return the smallest prefix of the frequency sorted keys covering the fraction of lookups"""
+    if keys.size == 0:
+        return keys
+    cum_counts = np.cumsum(counts)
+    num_hot_keys = np.searchsorted(cum_counts, np.ceil(coverage * cum_counts[-1]), side="left") + 1
+    return keys[: min(num_hot_keys, keys.size)]
+
 
 def generate_keyset_for_single_file(file, cat_features_pos, cum_slot_size_array):
+    """Return the sorted unique keys and their frequency counts of each slot in a parquet file"""
     df = cudf.read_parquet(file)
     keysets = []
     for i in range(len(cat_features_pos)):
-        unique_keys = df.iloc[:, cat_features_pos[i]].unique() + cum_slot_size_array[i]
-        keysets.append(set(unique_keys.to_pandas()))
-        del unique_keys
+        # nulls are dropped by value_counts
+        value_counts = df.iloc[:, cat_features_pos[i]].value_counts().sort_index()
+        keys = value_counts.index.to_numpy().astype(np.int64) + cum_slot_size_array[i]
+        keysets.append((keys, value_counts.to_numpy().astype(np.int64)))
+        del value_counts
     return keysets
 
 
+def generate_keyset_for_single_file_cpu(file, cat_features_pos, cum_slot_size_array, batch_size):
+    """CPU version of generate_keyset_for_single_file, the file is streamed by record batches"""
+    parquet_file = pq.ParquetFile(file)
+    names = parquet_file.schema_arrow.names
+    columns = [names[pos] for pos in cat_features_pos]
+    batch_keysets = [[] for _ in cat_features_pos]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        for i in range(len(columns)):
+            # nulls would be cast to arbitrary keys, drop them like value_counts does
+            column = batch.column(i).drop_null().to_numpy(zero_copy_only=False).astype(np.int64)
+            keys, counts = np.unique(column, return_counts=True)
+            push_sorted_keyset(
+                batch_keysets[i], keys + cum_slot_size_array[i], counts.astype(np.int64)
+            )
+    return [merge_sorted_keysets(keysets) for keysets in batch_keysets]
+
+
 def generate_keyset(
-    src_dir_path, dst_dir_path, cat_features_pos, slot_size_array, int32_keyset=False
+    src_dir_path,
+    dst_dir_path,
+    cat_features_pos,
+    slot_size_array,
+    int32_keyset=False,
+    use_cpu=False,
+    num_workers=None,
+    batch_size=1 << 20,
+    frequency_path=None,
+    sorted_keyset_path=None,
+    hot_keyset_path=None,
+    hot_key_coverage=1.0,
 ):
-    filelist = []
-    all_keysets = []
-    for _ in range(len(cat_features_pos)):
-        all_keysets.append(set())
-    cum_slot_size_array = np.cumsum(np.array([0] + slot_size_array[:-1]))
-    for file in glob.glob(src_dir_path + "/*.parquet"):
-        filelist.append(file)
-    for file in filelist:
-        cur_keysets = generate_keyset_for_single_file(file, cat_features_pos, cum_slot_size_array)
-        for i in range(len(all_keysets)):
-            all_keysets[i] = all_keysets[i].union(cur_keysets[i])
-    with open(dst_dir_path, "wb") as f:
-        int_size = 4 if int32_keyset else 8
-        for all_keys in all_keysets:
-            for k in all_keys:
-                f.write(int(k).to_bytes(int_size, "little", signed=True))
+    file_keysets = [[] for _ in cat_features_pos]
+    cum_slot_size_array = np.cumsum(np.array([0] + slot_size_array[:-1], dtype=np.int64))
+    filelist = glob.glob(src_dir_path + "/*.parquet")
+
+    def merge(cur_keysets):
+        # fold each file into the running keysets as soon as it is done
+        for i in range(len(file_keysets)):
+            push_sorted_keyset(file_keysets[i], *cur_keysets[i])
+
+    if use_cpu:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(
+                    generate_keyset_for_single_file_cpu,
+                    file,
+                    cat_features_pos,
+                    cum_slot_size_array,
+                    batch_size,
+                )
+                for file in filelist
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                merge(future.result())
+    else:
+        for file in filelist:
+            merge(generate_keyset_for_single_file(file, cat_features_pos, cum_slot_size_array))
+    all_keysets = [merge_sorted_keysets(keysets) for keysets in file_keysets]
+
+    keyset_dtype = np.int32 if int32_keyset else np.int64
+    np.concatenate([keys for keys, _ in all_keysets]).astype(keyset_dtype).tofile(dst_dir_path)
+    if frequency_path:
+        np.concatenate([counts for _, counts in all_keysets]).tofile(frequency_path)
+        logging.info("Saved the frequency counts of the keyset to {}".format(frequency_path))
+    if sorted_keyset_path:
+        write_frequency_sorted_keyset(sorted_keyset_path, all_keysets, int32_keyset)
+        logging.info("Saved the frequency sorted keyset to {}".format(sorted_keyset_path))
+    if hot_keyset_path:
+        keys, counts, _ = sort_keys_by_frequency(all_keysets)
+        hot_keys = select_hot_keys(keys, counts, hot_key_coverage)
+        hot_keys.astype(keyset_dtype).tofile(hot_keyset_path)
+        logging.info(
+            "Saved {} of {} keys covering {:.2%} of the lookups to {}".format(
+                hot_keys.size, keys.size, hot_key_coverage, hot_keyset_path
+            )
+        )
     logging.info("Extracted keyset from {}".format(src_dir_path))
 
 
@@ -68,6 +266,13 @@ if __name__ == "__main__":
     arg_parser.add_argument("--cat_features_pos", nargs="*", type=int, required=False)
     arg_parser.add_argument("--slot_size_array", nargs="*", type=int, required=False)
     arg_parser.add_argument("--int32_keyset", type=bool, required=False, default=False)
+    arg_parser.add_argument("--use_cpu", action="store_true", required=False)
+    arg_parser.add_argument("--num_workers", type=int, required=False, default=None)
+    arg_parser.add_argument("--batch_size", type=int, required=False, default=1 << 20)
+    arg_parser.add_argument("--frequency_path", type=str, required=False, default=None)
+    arg_parser.add_argument("--sorted_keyset_path", type=str, required=False, default=None)
+    arg_parser.add_argument("--hot_keyset_path", type=str, required=False, default=None)
+    arg_parser.add_argument("--hot_key_coverage", type=float, required=False, default=1.0)
 
     args = arg_parser.parse_args()
 
@@ -83,4 +288,25 @@ if __name__ == "__main__":
     if len(cat_features_pos) != len(slot_size_array):
         sys.exit("ERROR: the cat_features_pos and slot_size_array do not have the same dimension")
 
-    generate_keyset(src_dir_path, keyset_path, cat_features_pos, slot_size_array, int32_keyset)
+    if not 0.0 < args.hot_key_coverage <= 1.0:
+        sys.exit("ERROR: the hot_key_coverage should be in (0, 1]")
+
+    if args.use_cpu and pq is None:
+        sys.exit("ERROR: pyarrow is required by --use_cpu")
+    if not args.use_cpu and cudf is None:
+        sys.exit("ERROR: cudf is not available, please use --use_cpu")
+
+    generate_keyset(
+        src_dir_path,
+        keyset_path,
+        cat_features_pos,
+        slot_size_array,
+        int32_keyset,
+        args.use_cpu,
+        args.num_workers,
+        args.batch_size,
+        args.frequency_path,
+        args.sorted_keyset_path,
+        args.hot_keyset_path,
+        args.hot_key_coverage,
+    )
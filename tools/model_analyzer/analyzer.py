@@ -14,49 +14,156 @@
  limitations under the License.
 """
 
+
+import argparse
 import tqdm
-import sys
-import struct
+import numpy as np
 from os.path import getsize
 from os.path import exists
 
-
-def usage():
-    print("Usage: python analyzer.py <path to directory>")
-    print("Directory must contain 'key' and 'slot_id' files created using LocalizedSlotEmbedding.")
-    quit()
-
-
-if len(sys.argv) != 2:
-    usage()
-
-dir = sys.argv[1]
-if not exists(dir + "/key") or not exists(dir + "/slot_id"):
-    usage()
-
-print("Running analysis on model files in directory: " + dir)
-
-keysize = getsize(dir + "/key")
-slotsize = getsize(dir + "/slot_id")
-
-keyfile = open(dir + "/key", "rb")
-slotfile = open(dir + "/slot_id", "rb")
-
-slot_set = [set()]
-
-readsize = 0
-while readsize < slotsize:
-    slotval = struct.unpack("q", slotfile.read(8))[0]
-    keyval = struct.unpack("q", keyfile.read(8))[0]
-
-    while len(slot_set) < slotval + 1:
-        slot_set.append(set())
-
-    slot_set[slotval].add(keyval)
-    readsize += 8
-
-print("Analysis complete. Total keys: " + str(int(keysize / 8)))
-print("Number of slots: " + str(len(slot_set)))
-print("Vocabulary size (unique keys) per slot:")
-for x in range(len(slot_set)):
-    print("Slot " + str(x) + ": " + str(len(slot_set[x])))
+CHUNK_SIZE = 1 << 24
+
+
+def analyze(dir, chunk_size=CHUNK_SIZE):
+    """Scan the key and slot_id files of a sparse model in chunks
+    Returns:
+        num_keys: the number of keys in the model files
+        slot_keys: list of np.ndarray, the sorted unique keys of each slot
+        slot_counts: np.ndarray, the number of keys of each slot
+    """
+    num_keys = getsize(dir + "/key") // 8
+    num_slot_ids = getsize(dir + "/slot_id") // 8
+    if num_keys != num_slot_ids:
+        raise ValueError(
+            "The key file has {} keys but the slot_id file has {} slot ids".format(
+                num_keys, num_slot_ids
+            )
+        )
+    if getsize(dir + "/key") == 0:
+        # np.memmap cannot map an empty file
+        return 0, [], np.zeros(0, dtype=np.int64)
+
+    keys = np.memmap(dir + "/key", dtype=np.int64, mode="r")
+    slot_ids = np.memmap(dir + "/slot_id", dtype=np.int64, mode="r")
+
+    slot_chunks = []
+    slot_counts = np.zeros(0, dtype=np.int64)
+    for begin in tqdm.tqdm(range(0, keys.size, chunk_size), unit="chunk"):
+        key_chunk = np.asarray(keys[begin : begin + chunk_size])
+        slot_chunk = np.asarray(slot_ids[begin : begin + chunk_size])
+        if slot_chunk.min() < 0:
+            raise ValueError("Negative slot id found in " + dir + "/slot_id")
+        counts = np.bincount(slot_chunk)
+        if counts.size > slot_counts.size:
+            slot_counts = np.pad(slot_counts, (0, counts.size - slot_counts.size))
+            slot_chunks += [[] for _ in range(counts.size - len(slot_chunks))]
+        slot_counts[: counts.size] += counts
+
+        # unique (slot, key) pairs of the chunk, grouped by slot
+        order = np.lexsort((key_chunk, slot_chunk))
+        key_chunk, slot_chunk = key_chunk[order], slot_chunk[order]
+        is_unique = np.ones(key_chunk.size, dtype=bool)
+        is_unique[1:] = (key_chunk[1:] != key_chunk[:-1]) | (slot_chunk[1:] != slot_chunk[:-1])
+        key_chunk, slot_chunk = key_chunk[is_unique], slot_chunk[is_unique]
+        bounds = np.searchsorted(slot_chunk, np.arange(counts.size + 1))
+        for slot in np.flatnonzero(counts):
+            slot_chunks[slot].append(key_chunk[bounds[slot] : bounds[slot + 1]])
+
+    slot_keys = []
+    for chunks in slot_chunks:
+        slot_keys.append(np.unique(np.concatenate(chunks)) if chunks else np.zeros(0, np.int64))
+    return keys.size, slot_keys, slot_counts
+
+
+def estimate_memory(slot_vocab_sizes, num_unique_keys, embedding_vec_size, num_gpus):
+    """Estimate the bytes of the keys and embedding vectors on the most loaded GPU
+    Returns:
+        distributed: bytes per GPU with DistributedSlotEmbedding, whose keys are spread evenly
+        localized: bytes on the most loaded GPU with LocalizedSlotEmbedding, whose slots are
+                   assigned round-robin to the GPUs
+    """
+    bytes_per_key = 8 + embedding_vec_size * 4
+    distributed = int(np.ceil(num_unique_keys / num_gpus)) * bytes_per_key
+    gpu_vocab_sizes = np.bincount(
+        np.arange(len(slot_vocab_sizes)) % num_gpus, weights=slot_vocab_sizes, minlength=num_gpus
+    )
+    localized = int(gpu_vocab_sizes.max()) * bytes_per_key
+    return distributed, localized
+
+
+def format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024:
+            return "{:.2f} {}".format(num_bytes, unit)
+        num_bytes /= 1024
+    return "{:.2f} TB".format(num_bytes)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Directory must contain 'key' and 'slot_id' files created using "
+        "LocalizedSlotEmbedding."
+    )
+    parser.add_argument("dir", type=str, help="path to the sparse model directory")
+    parser.add_argument(
+        "--num_gpus",
+        type=int,
+        default=1,
+        help="number of GPUs used to estimate the per-GPU memory",
+    )
+    parser.add_argument(
+        "--embedding_vec_size",
+        type=int,
+        default=None,
+        help="embedding vector size, inferred from the emb_vector file by default",
+    )
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    dir = args.dir
+    if not exists(dir + "/key") or not exists(dir + "/slot_id"):
+        print(
+            "Directory must contain 'key' and 'slot_id' files created using LocalizedSlotEmbedding."
+        )
+        quit()
+
+    print("Running analysis on model files in directory: " + dir)
+    num_keys, slot_keys, slot_counts = analyze(dir, args.chunk_size)
+
+    print("Analysis complete. Total keys: " + str(num_keys))
+    print("Number of slots: " + str(len(slot_keys)))
+    print("Vocabulary size (unique keys) per slot:")
+    for x in range(len(slot_keys)):
+        print("Slot " + str(x) + ": " + str(len(slot_keys[x])))
+
+    print("Per-slot statistics:")
+    print("%-8s %14s %14s %22s %22s" % ("slot", "unique keys", "duplicates", "min key", "max key"))
+    for x, keys in enumerate(slot_keys):
+        if keys.size == 0:
+            continue
+        print(
+            "%-8d %14d %14d %22d %22d"
+            % (x, keys.size, slot_counts[x] - keys.size, keys[0], keys[-1])
+        )
+
+    num_unique_keys = np.unique(np.concatenate(slot_keys)).size if slot_keys else 0
+    slot_vocab_sizes = np.array([keys.size for keys in slot_keys], dtype=np.int64)
+    print("Unique keys of all slots: " + str(num_unique_keys))
+    print("Keys shared by several slots: " + str(int(slot_vocab_sizes.sum()) - num_unique_keys))
+
+    embedding_vec_size = args.embedding_vec_size
+    if embedding_vec_size is None and exists(dir + "/emb_vector") and num_keys > 0:
+        embedding_vec_size = getsize(dir + "/emb_vector") // (num_keys * 4)
+    if embedding_vec_size:
+        distributed, localized = estimate_memory(
+            slot_vocab_sizes, num_unique_keys, embedding_vec_size, args.num_gpus
+        )
+        print(
+            "Estimated memory per GPU of keys and embedding vectors (embedding_vec_size={}, "
+            "num_gpus={}):".format(embedding_vec_size, args.num_gpus)
+        )
+        print("DistributedSlotEmbedding: " + format_bytes(distributed))
+        print("LocalizedSlotEmbedding: " + format_bytes(localized))
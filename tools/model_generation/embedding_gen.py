@@ -18,47 +18,152 @@ import numpy as np
 import math
 import time
 import argparse
+import os
+from multiprocessing import Pool
 
-parser = argparse.ArgumentParser(description="Per generate embedding weights")
 
-parser.add_argument(
-    "--embedding-size",
-    type=str,
-    default="39884406-39043-17289-7420-20263-3-7120-1543-63-38532951-2953546-403346-10-2208-11938-155-4-976-14-39979771-25641295-39664984-585935-12972-108-36",
-)
-parser.add_argument("--dim", type=int, default=128)
-parser.add_argument("--output", type=str)
-args = parser.parse_args()
+def record_dtype(dim):
+    """Interleaved record of the key, the table id and the embedding vector"""
+    return np.dtype([("key", "<i8"), ("table", "<i8"), ("vector", "<f4", (dim,))])
 
-embedding_size = np.fromstring(args.embedding_size, dtype=int, sep="-")
-total_embedding_size = sum(embedding_size)
 
-print("Embedding size: ", embedding_size)
-print("Write model file to ", args.output)
+def make_tasks(embedding_size, chunk_rows):
+    """Partition the rows of all tables into (table, table size, first row, number of rows)"""
+    tasks = []
+    offsets = np.concatenate(([0], np.cumsum(embedding_size)))
+    for i, n in enumerate(embedding_size):
+        for start in range(0, n, chunk_rows):
+            tasks.append((i, int(n), int(offsets[i] + start), int(min(chunk_rows, n - start))))
+    return tasks
+
+
+def output_files(fmt, output, dim, total_embedding_size, write_slot_id):
+    """(filename, dtype, shape) of the output files"""
+    if fmt == "interleaved":
+        return [(output, record_dtype(dim), (total_embedding_size,))]
+    files = [
+        (os.path.join(output, "key"), np.dtype(np.int64), (total_embedding_size,)),
+        (os.path.join(output, "emb_vector"), np.dtype(np.float32), (total_embedding_size, dim)),
+    ]
+    if write_slot_id:
+        files.append((os.path.join(output, "slot_id"), np.dtype(np.int64), (total_embedding_size,)))
+    return files
+
+
+# memory maps of the output files, opened once by each worker
+worker_config = None
+worker_maps = None
+
+
+def init_worker(config):
+    global worker_config, worker_maps
+    fmt, output, dim, total_embedding_size, _, write_slot_id = config
+    worker_config = config
+    # the pages written through the shared mappings are flushed once by the main process
+    worker_maps = [
+        np.memmap(filename, dtype=dtype, mode="r+", shape=shape)
+        for filename, dtype, shape in output_files(
+            fmt, output, dim, total_embedding_size, write_slot_id
+        )
+    ]
+
+
+def generate_chunk(task):
+    fmt, _, dim, _, seed, write_slot_id = worker_config
+    i, n, start, s = task
+    # seeded by the first row so the weights do not depend on the number of workers
+    rng = np.random.default_rng([seed, start])
+    bound = math.sqrt(1 / n)
+    vectors = rng.uniform(low=-bound, high=bound, size=(s, dim)).astype(np.float32)
+    keys = np.arange(start, start + s, dtype=np.int64)
+    if fmt == "interleaved":
+        chunk = worker_maps[0][start : start + s]
+        chunk["key"] = keys
+        chunk["table"] = i
+        chunk["vector"] = vectors
+    else:
+        worker_maps[0][start : start + s] = keys
+        worker_maps[1][start : start + s] = vectors
+        if write_slot_id:
+            worker_maps[2][start : start + s] = i
+    return s
+
 
-with open(args.output, "wb") as f:
+def create_output(fmt, output, dim, total_embedding_size, write_slot_id):
+    """Pre-size the output files so the workers can write at their offsets"""
+    if fmt != "interleaved":
+        os.makedirs(output, exist_ok=True)
+    for filename, dtype, shape in output_files(
+        fmt, output, dim, total_embedding_size, write_slot_id
+    ):
+        with open(filename, "wb") as f:
+            f.truncate(dtype.itemsize * int(np.prod(shape)))
+
+
+def flush_output(fmt, output, dim, total_embedding_size, write_slot_id):
+    """Write back the pages the workers dirtied in the shared page cache, once per file"""
+    for filename, _, _ in output_files(fmt, output, dim, total_embedding_size, write_slot_id):
+        fd = os.open(filename, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per generate embedding weights")
+
+    parser.add_argument(
+        "--embedding-size",
+        type=str,
+        default="39884406-39043-17289-7420-20263-3-7120-1543-63-38532951-2953546-403346-10-2208-11938-155-4-976-14-39979771-25641295-39664984-585935-12972-108-36",
+    )
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--output", type=str)
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["interleaved", "hugectr"],
+        default="interleaved",
+        help="interleaved (key, table id, vector) records, or a HugeCTR sparse model folder",
+    )
+    parser.add_argument(
+        "--slot-id",
+        action="store_true",
+        help="also write the slot_id file of the HugeCTR sparse model folder",
+    )
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=1 << 16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    embedding_size = np.fromstring(args.embedding_size, dtype=int, sep="-")
+    total_embedding_size = int(sum(embedding_size))
+
+    print("Embedding size: ", embedding_size)
+    print("Write model file to ", args.output)
+
+    create_output(args.format, args.output, args.dim, total_embedding_size, args.slot_id)
+    config = (
+        args.format,
+        args.output,
+        args.dim,
+        total_embedding_size,
+        args.seed,
+        args.slot_id,
+    )
+    tasks = make_tasks(embedding_size, args.chunk_rows)
+
+    start_time = time.time()
     m = 0
-    for i, n in enumerate(embedding_size):
-        rest = n
-        while rest > 0:
-            s = min(rest, 2048)
-            c1 = np.arange(start=m, stop=m + s)
-            c2 = np.repeat(a=i, repeats=s)
-            c3 = np.random.uniform(
-                low=-math.sqrt(1 / n), high=math.sqrt(1 / n), size=(s, args.dim)
-            ).astype(np.float32)
-            u1 = np.frombuffer(c1.tobytes(), dtype=np.uint8).reshape((s, 8))
-            u2 = np.frombuffer(c2.tobytes(), dtype=np.uint8).reshape((s, 8))
-            u3 = np.frombuffer(c3.tobytes(), dtype=np.uint8).reshape((s, 4 * args.dim))
-            u = np.concatenate((u1, u2, u3), axis=1)
-            f.write(u.tobytes())
+    with Pool(args.num_workers, initializer=init_worker, initargs=(config,)) as pool:
+        for j, s in enumerate(pool.imap_unordered(generate_chunk, tasks)):
             m += s
-            rest -= s
-            print(
-                "Writing {:.2f}% for column {}({}) and {:.2f}% in total".format(
-                    (n - rest) / n * 100, i, n, m / total_embedding_size * 100
-                ),
-                end="\r",
-            )
-
-        print()
+            if j % 64 == 0 or m == total_embedding_size:
+                print(
+                    "Writing {:.2f}% in total".format(m / total_embedding_size * 100),
+                    end="\r",
+                )
+    print()
+    flush_output(args.format, args.output, args.dim, total_embedding_size, args.slot_id)
+    print("Generated {} rows in {:.2f}s".format(total_embedding_size, time.time() - start_time))